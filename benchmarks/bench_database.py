@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк пути начисления награды за сообщение в группе
+Сравнивает старый подход (новое соединение на каждый вызов) с пулом соединений
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import tempfile
+import importlib.util
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+# database.py в корне перекрывает пакет database/, поэтому загружаем модуль по пути
+spec = importlib.util.spec_from_file_location("gasjk_database", os.path.join(ROOT, "database", "database.py"))
+gasjk_database = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(gasjk_database)
+Database = gasjk_database.Database
+
+MESSAGES = 2000
+USERS = 50
+REWARD = 0.1
+
+
+class LegacyDatabase(Database):
+    """Поведение до пула: соединение открывается и закрывается на каждый вызов"""
+
+    def update_user_balance(self, user_id: int, amount: float) -> bool:
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE users SET gasjk_balance = gasjk_balance + ?, last_activity = CURRENT_TIMESTAMP
+                WHERE user_id = ?
+            ''', (amount, user_id))
+            conn.commit()
+            return cursor.rowcount > 0
+
+    def increment_messages(self, user_id: int) -> bool:
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE users SET messages_count = messages_count + 1, last_activity = CURRENT_TIMESTAMP
+                WHERE user_id = ?
+            ''', (user_id,))
+            conn.commit()
+            return cursor.rowcount > 0
+
+    def add_transaction(self, from_user_id: int, to_user_id: int, amount: float, transaction_type: str) -> int:
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO transactions (from_user_id, to_user_id, amount, transaction_type)
+                VALUES (?, ?, ?, ?)
+            ''', (from_user_id, to_user_id, amount, transaction_type))
+            conn.commit()
+            return cursor.lastrowid
+
+    def get_user(self, user_id: int):
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT * FROM users WHERE user_id = ?', (user_id,))
+            row = cursor.fetchone()
+            columns = [description[0] for description in cursor.description]
+            return dict(zip(columns, row)) if row else None
+
+
+def run(db: Database) -> float:
+    """Прогон пути handle_group_message, возвращает сообщений в секунду"""
+    for user_id in range(1, USERS + 1):
+        db.add_user(user_id, f"user_{user_id}", "Test", "User")
+
+    started = time.perf_counter()
+    for i in range(MESSAGES):
+        user_id = i % USERS + 1
+        db.add_user(user_id, f"user_{user_id}", "Test", "User")
+        db.update_user_balance(user_id, REWARD)
+        db.increment_messages(user_id)
+        db.add_transaction(0, user_id, REWARD, 'message_reward')
+        db.get_user(user_id)
+    elapsed = time.perf_counter() - started
+    return MESSAGES / elapsed
+
+
+def main():
+    print(f"🏁 Бенчмарк: {MESSAGES} сообщений, {USERS} пользователей\n")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy = LegacyDatabase(os.path.join(tmp, 'legacy', 'bench.db'))
+        before = run(legacy)
+        legacy.close()
+        print(f"⏳ До (соединение на вызов): {before:,.0f} сообщений/с")
+
+        pooled = Database(os.path.join(tmp, 'pooled', 'bench.db'))
+        after = run(pooled)
+        pooled.close()
+        print(f"⚡ После (пул + WAL):        {after:,.0f} сообщений/с")
+
+    print(f"\n📈 Ускорение: x{after / before:.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк списочных запросов: словари dict(zip(columns, row)) против моделей со __slots__
+Измеряет время запроса и пиковый объем памяти под результат
+"""
+
+import os
+import sys
+import time
+import tempfile
+import tracemalloc
+import importlib.util
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+# database.py в корне перекрывает пакет database/, поэтому загружаем модуль по пути
+spec = importlib.util.spec_from_file_location("gasjk_database", os.path.join(ROOT, "database", "database.py"))
+gasjk_database = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(gasjk_database)
+Database = gasjk_database.Database
+
+TRANSACTIONS = 5000
+ADS = 5000
+REPEATS = 50
+
+
+class DictDatabase(Database):
+    """Чтение до моделей: словарь на каждую строку"""
+
+    def get_user_transactions(self, user_id: int, limit: int = 10):
+        with self.pool.read() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT * FROM transactions
+                WHERE from_user_id = ? OR to_user_id = ?
+                ORDER BY created_at DESC LIMIT ?
+            ''', (user_id, user_id, limit))
+            rows = cursor.fetchall()
+            columns = [description[0] for description in cursor.description]
+            return [dict(zip(columns, row)) for row in rows]
+
+    def get_couchsurfing_ads(self, country=None, city=None, settlement=None, status='active'):
+        with self.pool.read() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT * FROM couchsurfing_ads WHERE status = ? ORDER BY created_at DESC', (status,))
+            rows = cursor.fetchall()
+            columns = [description[0] for description in cursor.description]
+            return [dict(zip(columns, row)) for row in rows]
+
+
+def fill(db: Database):
+    db.add_user(1, "user_1", "Test", "User")
+    with db.pool.write() as conn:
+        conn.executemany('''
+            INSERT INTO transactions (from_user_id, to_user_id, amount, transaction_type)
+            VALUES (0, 1, ?, 'message_reward')
+        ''', [(0.1,)] * TRANSACTIONS)
+        conn.executemany('''
+            INSERT INTO couchsurfing_ads (user_id, country, city, settlement, start_date, end_date, description)
+            VALUES (1, 'Россия', 'Москва', '', '2030-01-01', '2030-12-31', ?)
+        ''', [(f"Объявление {i}",) for i in range(ADS)])
+
+
+def measure(call):
+    """Среднее время вызова (мс) и пик памяти под результат (КБ)"""
+    call()
+    started = time.perf_counter()
+    for _ in range(REPEATS):
+        call()
+    elapsed = (time.perf_counter() - started) / REPEATS * 1000
+
+    tracemalloc.start()
+    result = call()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return elapsed, peak / 1024
+
+
+def main():
+    print(f"🏁 Бенчмарк: {TRANSACTIONS} транзакций, {ADS} объявлений, {REPEATS} повторов\n")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DictDatabase(os.path.join(tmp, 'bench.db'))
+        fill(db)
+        endpoints = [
+            ('get_user_transactions', lambda impl: impl.get_user_transactions(db, 1, TRANSACTIONS)),
+            ('get_couchsurfing_ads', lambda impl: impl.get_couchsurfing_ads(db)),
+        ]
+        for name, call in endpoints:
+            before_ms, before_kb = measure(lambda: call(DictDatabase))
+            after_ms, after_kb = measure(lambda: call(Database))
+            print(f"📋 {name}")
+            print(f"   ⏳ Словари: {before_ms:7.2f} мс, {before_kb:8,.0f} КБ")
+            print(f"   ⚡ Модели:  {after_ms:7.2f} мс, {after_kb:8,.0f} КБ")
+            print(f"   📈 Время x{before_ms / after_ms:.2f}, память x{before_kb / after_kb:.2f}\n")
+
+        # Только построение строк, без выполнения запроса
+        with db.pool.read() as conn:
+            cursor = conn.execute('SELECT * FROM transactions')
+            rows = cursor.fetchall()
+            columns = tuple(d[0] for d in cursor.description)
+        build = gasjk_database.Transaction.builder(columns)
+        before_ms, _ = measure(lambda: [dict(zip(columns, row)) for row in rows])
+        after_ms, _ = measure(lambda: [build(row) for row in rows])
+        print(f"🧱 Построение {len(rows)} строк: словари {before_ms:.2f} мс, модели {after_ms:.2f} мс "
+              f"(x{before_ms / after_ms:.2f})")
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Микробенчмарк проверки повторов: прежний поиск подстрок по каждому смещению
+против RepeatDetector (серии и подсчет n-грамм за один проход) на худшем входе,
+а также подсчет кандидатов через str.count против одного прохода на сериях
+вида "ЖЖЖЖ ", где почти каждая n-грамма повторяется
+"""
+
+import os
+import sys
+import time
+from collections import Counter
+from operator import itemgetter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from utils.repeat_detector import RepeatDetector
+
+SIZES = [250, 500, 1000, 2000, 4000]
+REPEATS = 5
+
+
+def quadratic_repeats(message: str) -> bool:
+    """Прежний MessageValidator._has_repeating_chars"""
+    if len(message) < 5:
+        return False
+    for i in range(len(message) - 2):
+        if message[i] == message[i+1] == message[i+2]:
+            return True
+    for pattern_length in range(2, 5):
+        for i in range(len(message) - pattern_length * 2):
+            pattern = message[i:i+pattern_length]
+            if pattern in message[i+pattern_length:]:
+                return True
+    return False
+
+
+def worst_case(size: int) -> str:
+    """Текст без повторов: ни одна проверка не завершается досрочно"""
+    return ''.join(chr(0x4e00 + i) for i in range(size))
+
+
+def counted_ngrams(text: str, sizes=(2, 3, 4), min_repeats: int = 3) -> float:
+    """Прежний подсчет n-грамм RepeatDetector: Counter с перекрытиями и str.count для кандидатов"""
+    length = len(text)
+    best = 0.0
+    for n in sizes:
+        overlapping = Counter(zip(*(text[k:] for k in range(n))))
+        candidates = sorted((item for item in overlapping.items() if item[1] >= min_repeats),
+                            key=itemgetter(1), reverse=True)
+        for gram, upper in candidates:
+            if upper * n / length <= best:
+                break
+            count = text.count(''.join(gram))
+            if count >= min_repeats:
+                best = max(best, count * n / length)
+    return best
+
+
+def adversarial(size: int) -> str:
+    """Серии "ЖЖЖЖ " из разных символов: тысячи n-грамм-кандидатов с малым покрытием"""
+    return ''.join(chr(0x4e00 + i) * 4 + ' ' for i in range(size // 5))
+
+
+def measure(call, text: str) -> float:
+    """Лучшее время вызова (мс)"""
+    best = float('inf')
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        call(text)
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main():
+    detector = RepeatDetector()
+    print(f"🏁 Бенчмарк проверки повторов, текст без повторов, {REPEATS} повторов\n")
+    print(f"{'символов':>9} | {'подстроки, мс':>14} | {'детектор, мс':>13} | {'мкс/символ':>10}")
+    for size in SIZES:
+        text = worst_case(size)
+        assert not quadratic_repeats(text) and not detector.is_repetitive(text)
+        before_ms = measure(quadratic_repeats, text)
+        after_ms = measure(detector.is_repetitive, text)
+        print(f"{size:>9} | {before_ms:>14.2f} | {after_ms:>13.2f} | {after_ms * 1000 / size:>10.2f}")
+    print("\n📈 Время детектора на символ не растет с длиной текста, время подстрок - растет линейно")
+
+    print("\n🏁 Серии вида \"ЖЖЖЖ \": подсчет кандидатов через str.count против одного прохода\n")
+    print(f"{'символов':>9} | {'str.count, мс':>14} | {'детектор, мс':>13} | {'мкс/символ':>10}")
+    for size in SIZES + [16000]:
+        text = adversarial(size)
+        before_ms = measure(counted_ngrams, text)
+        after_ms = measure(detector.scan, text)
+        print(f"{size:>9} | {before_ms:>14.2f} | {after_ms:>13.2f} | {after_ms * 1000 / size:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
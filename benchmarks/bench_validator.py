@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк MessageValidator: поиск ключевых слов (проверка каждого слова через `in`
+против одного прохода автомата Aho-Corasick), validate_message, validate_many
+и кэш вердиктов при рейде
+"""
+
+import os
+import sys
+import time
+import random
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from utils.message_validator import MessageValidator
+
+MESSAGES = 20000
+REPEATS = 3
+
+# Фразы, похожие на сообщения группового чата
+PHRASES = [
+    'привет всем', 'как дела?', 'сегодня иду в кафе', 'кто завтра на работу', 'спасибо большое',
+    'это очень интересно', 'вчера смотрю фильм, хорошо', 'где встречаемся вечером', 'пока, до встречи',
+    'рад всех видеть', 'купить билет на поезд', 'у меня плохо с деньгами', 'ну да', 'ага', 'ок',
+    'а что по планам на выходные', 'слушаю новый альбом', 'в университет еду', 'быстро не получится',
+    'hello everyone', 'how is it going?', 'going home now', 'thanks a lot', 'see you tomorrow',
+    'this window is broken', 'I like this song', 'working from the office today', 'good morning',
+    'what time is the meeting', 'which cafe is better', 'buy now, win a prize', 'work from home offer',
+]
+
+
+def make_corpus(count: int, seed: int = 42):
+    """Сообщения из 1-4 фраз со случайной пунктуацией и регистром"""
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(count):
+        parts = [rng.choice(PHRASES) for _ in range(rng.randint(1, 4))]
+        text = rng.choice([', ', '. ', ' ']).join(parts)
+        if rng.random() < 0.3:
+            text = text.capitalize()
+        corpus.append(text)
+    return corpus
+
+
+def substring_scan(validator: MessageValidator, message: str):
+    """Прежний способ: отдельная проверка `word in text` для каждого слова каждого списка"""
+    message_lower = message.lower()
+    hits = {}
+    hits['spam'] = {word for words in validator.spam_words.values() for word in words if word in message_lower}
+    hits['meaningful'] = {word for categories in validator.meaningful_words.values()
+                          for words in categories.values() for word in words if word in message_lower}
+    hits['question'] = {word for word in validator.question_indicators if word in message_lower}
+    for category, words in validator.message_categories.items():
+        hits[category] = {word for word in words if word in message_lower}
+    return hits
+
+
+def measure(call, corpus):
+    """Лучшее время обработки корпуса (мс)"""
+    best = float('inf')
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        for message in corpus:
+            call(message)
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main():
+    # Без кэша вердиктов: повторы в корпусе не должны искажать замеры проверок
+    validator = MessageValidator(cache_size=0)
+    corpus = make_corpus(MESSAGES)
+    print(f"🏁 Бенчмарк: {MESSAGES} сообщений, {sum(map(len, corpus)) / MESSAGES:.0f} символов в среднем\n")
+
+    before_ms = measure(lambda message: substring_scan(validator, message), corpus)
+    after_ms = measure(validator.keywords.find, corpus)
+    print("🔎 Поиск ключевых слов по всем спискам")
+    print(f"   ⏳ Подстроки: {before_ms:8.1f} мс ({MESSAGES / before_ms * 1000:,.0f} сообщений/с)")
+    print(f"   ⚡ Автомат:   {after_ms:8.1f} мс ({MESSAGES / after_ms * 1000:,.0f} сообщений/с)")
+    print(f"   📈 x{before_ms / after_ms:.2f}\n")
+
+    # Ложные срабатывания подстрок: 'win' в 'window', 'hi' в 'this' и т.п.
+    false_hits = sum(
+        len(substring_scan(validator, message)[group] - hits[group])
+        for message in corpus
+        for hits in (validator.keywords.find(message),)
+        for group in hits
+    )
+    print(f"🚫 Совпадений внутри других слов отброшено: {false_hits}")
+
+    full_ms = measure(validator.validate_message, corpus)
+    print(f"✅ validate_message целиком: {full_ms:.1f} мс ({MESSAGES / full_ms * 1000:,.0f} сообщений/с)")
+
+    # Пакетная проверка: корпус с повторами и без них
+    unique = list(dict.fromkeys(corpus))
+    for name, batch in (("с повторами", corpus), ("без повторов", unique)):
+        single_ms = measure(lambda _: [validator.validate_message(m) for m in batch], [None])
+        batch_ms = measure(lambda _: validator.validate_many(batch), [None])
+        print(f"📦 validate_many, {len(batch)} сообщений {name}: {batch_ms:.1f} мс "
+              f"против {single_ms:.1f} мс по одному (x{single_ms / batch_ms:.2f})")
+
+    # Рейд: один и тот же длинный текст много раз подряд
+    raid = ["Заработок без вложений, бонус на первый депозит, пиши в личку! " * 14] * 2000
+    uncached = MessageValidator(cache_size=0)
+    cold_ms = measure(lambda _: [uncached.validate_message(m) for m in raid], [None])
+    cached = MessageValidator()
+    warm_ms = measure(lambda _: [cached.validate_message(m) for m in raid], [None])
+    print(f"🛡 Рейд из {len(raid)} копий ({len(raid[0])} символов): без кэша {cold_ms:.1f} мс, "
+          f"с кэшем {warm_ms:.1f} мс (x{cold_ms / warm_ms:.1f}, попаданий {cached.verdicts.stats()['hit_rate']:.0%})")
+
+
+if __name__ == '__main__':
+    main()
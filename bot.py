@@ -1,15 +1,21 @@
+import asyncio
 import logging
 import random
-import re
 import datetime
 import pytz
 import time
-import sqlite3
 from telegram import Update
 from telegram.ext import (
     Application, CommandHandler, MessageHandler, filters, ContextTypes, JobQueue
 )
-from database import Database
+from storage.async_database import AsyncDatabase
+from storage.backup import DatabaseBackup
+from storage.chat_database import ChatDatabase
+from storage.memory import InMemoryChatRepository
+from storage.timeseries import TimeSeriesStore
+from storage.cache import LRUCache
+from utils.normalized_message import NormalizedMessage, content_key
+from utils.duplicate_detector import DuplicateDetector
 from config import *
 
 # Настройка логирования
@@ -27,9 +33,22 @@ daily_threshold_achieved = {}  # {threshold: True}
 user_boosts = {}  # {user_id: timestamp_end}
 
 class ChatBot:
-    def __init__(self, application):
-        self.db = Database()
-        self.moscow_tz = pytz.timezone('Europe/Moscow')
+    def __init__(self, application=None):
+        # Хранилище: SQLite или память процесса (для локальной отладки, данные не сохраняются)
+        if STORAGE_BACKEND == 'memory':
+            self.db = InMemoryChatRepository(TIMEZONE)
+        else:
+            self.db = ChatDatabase(timezone=TIMEZONE)
+        self.adb = AsyncDatabase(self.db)
+        self.backups = [DatabaseBackup(pool, BACKUP_DIR, name, BACKUP_KEEP)
+                        for name, pool in self.db.backup_sources()]
+        # Поминутная статистика сообщений, начисленных очков и отклоненных сообщений
+        self.activity = TimeSeriesStore(['messages', 'rewards', 'rejected'], ACTIVITY_SERIES_PATH)
+        # Почти повторы недавних сообщений пользователя или чата очков не приносят
+        self.duplicates = DuplicateDetector(DUPLICATE_USER_WINDOW, DUPLICATE_CHAT_WINDOW, ttl=DUPLICATE_TTL)
+        # Вердикты фильтра по хэшу текста: одинаковый спам проверяется один раз
+        self.verdicts = LRUCache(VERDICT_CACHE_SIZE, VERDICT_CACHE_TTL)
+        self.moscow_tz = pytz.timezone(TIMEZONE)
         self.application = application
         
     async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -88,19 +107,23 @@ class ChatBot:
     async def stats_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработчик команды /stats"""
         user_id = update.effective_user.id
-        stats = self.db.get_user_stats(user_id)
+        stats = await self.adb.get_user_stats(user_id)
         
         if not stats:
             await update.message.reply_text("Ты еще не заработал очков. Начни общаться в чате!")
             return
         
+        # Места в рейтингах берутся из памяти, без запроса к базе
+        week_rank = self.db.get_user_rank(user_id, 'week')
+        month_rank = self.db.get_user_rank(user_id, 'month')
+        
         stats_text = f"""
 📊 *Статистика пользователя @{stats['username']}*
 
 🏆 *Общие очки:* {stats['total_points']}
 📅 *За сегодня:* {stats['today_points']}
-📈 *За неделю:* {stats['week_points']}
-📊 *За месяц:* {stats['month_points']}
+📈 *За неделю:* {stats['week_points']}{f' (место #{week_rank})' if week_rank else ''}
+📊 *За месяц:* {stats['month_points']}{f' (место #{month_rank})' if month_rank else ''}
 
 📅 *Дата регистрации:* {stats['created_at'][:10]}
         """
@@ -114,7 +137,7 @@ class ChatBot:
     
     async def week_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         try:
-            top_users = self.db.get_weekly_top(TOP_USERS_LIMIT)
+            top_users = await self.adb.get_weekly_top(TOP_USERS_LIMIT)
             if not top_users:
                 await update.message.reply_text("Пока нет данных за эту неделю. Будь первым!")
                 return
@@ -130,7 +153,7 @@ class ChatBot:
     
     async def month_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         try:
-            top_users = self.db.get_monthly_top(TOP_USERS_LIMIT)
+            top_users = await self.adb.get_monthly_top(TOP_USERS_LIMIT)
             if not top_users:
                 await update.message.reply_text("Пока нет данных за этот месяц. Будь первым!")
                 return
@@ -139,7 +162,7 @@ class ChatBot:
                 emoji = "🥇" if i == 1 else "🥈" if i == 2 else "🥉" if i == 3 else "🏅"
                 safe_username = self.escape_markdown(username or f'user_{i}')
                 text += f"{emoji} {i}. @{safe_username} - {points} очков\n"
-            monthly_winners = self.db.get_monthly_winners()
+            monthly_winners = await self.adb.get_monthly_winners()
             if monthly_winners:
                 text += "\n📜 Победители предыдущих месяцев:\n"
                 for username, points, month_start in monthly_winners[:MONTHLY_WINNERS_HISTORY_LIMIT]:
@@ -151,11 +174,25 @@ class ChatBot:
             logger.error(f"Ошибка в month_command: {e}")
             await update.message.reply_text("Произошла ошибка при формировании топа месяца.")
     
-    def is_meaningful_message(self, text: str) -> bool:
-        """Проверка, является ли сообщение осмысленным (защита от спама)"""
-        # Убираем эмодзи и специальные символы
-        clean_text = re.sub(r'[^\w\s]', '', text.lower())
-        words = clean_text.split()
+    def is_meaningful_message(self, text) -> bool:
+        """Проверка, является ли сообщение осмысленным (защита от спама)
+
+        text - строка или NormalizedMessage, разобранный один раз на сообщение.
+        Вердикт кэшируется по исходному тексту без пробелов по краям: кроме
+        слов он зависит только от того, состоит ли текст из одних цифр.
+        """
+        message = NormalizedMessage.of(text)
+        key = content_key(message, message.digits_only)
+        verdict = self.verdicts.get(key)
+        if verdict is None:
+            verdict = self._check_meaningful(message)
+            self.verdicts.put(key, verdict)
+        return verdict
+    
+    def _check_meaningful(self, message: NormalizedMessage) -> bool:
+        """Проверки фильтра сообщений без кэша"""
+        # Слова без эмодзи и специальных символов
+        words = message.clean_words
         
         # Проверяем количество слов
         if len(words) < MIN_WORDS_FOR_POINTS:
@@ -167,7 +204,7 @@ class ChatBot:
                 return False
         
         # Проверяем на цифры (если сообщение состоит только из цифр)
-        if re.match(r'^[\d\s]+$', text):
+        if message.digits_only:
             return False
         
         # Проверяем на повторяющиеся слова (флуд)
@@ -205,7 +242,7 @@ class ChatBot:
             return
         
         user = update.effective_user
-        # Проверка на mute
+        # Проверка на mute (реестр в памяти, без запроса к базе)
         mute_left = self.db.is_muted(user.id)
         if mute_left > 0:
             mins = mute_left // 60
@@ -213,10 +250,11 @@ class ChatBot:
             await update.message.reply_text(f"Вы в муте ещё {mins} мин {secs} сек.")
             return
         
-        message_text = update.message.text
+        message = NormalizedMessage(update.message.text)
+        self.activity.record('messages')
         
         # Добавляем пользователя в базу данных
-        self.db.add_user(
+        await self.adb.add_user(
             user_id=user.id,
             username=user.username or f"user_{user.id}",
             first_name=user.first_name or "",
@@ -224,7 +262,13 @@ class ChatBot:
         )
         
         # Проверяем, является ли сообщение осмысленным
-        if not self.is_meaningful_message(message_text):
+        if not self.is_meaningful_message(message):
+            self.activity.record('rejected')
+            return
+        
+        # Проверяем, не копия ли это недавнего сообщения
+        if self.duplicates.check(user.id, update.effective_chat.id, message.clean_words):
+            self.activity.record('rejected')
             return
         
         # Определяем вероятность начисления очков
@@ -232,12 +276,11 @@ class ChatBot:
         
         # Проверяем, начислять ли очки
         if random.random() < probability:
-            self.db.add_points(user.id, POINTS_PER_MESSAGE)
-            
-            # Получаем текущие очки пользователя за день
-            stats = self.db.get_user_stats(user.id)
-            if stats:
-                current_daily_points = stats['today_points']
+            # add_points сразу возвращает новые суммы за день/неделю/месяц
+            totals = await self.adb.add_points(user.id, POINTS_PER_MESSAGE)
+            if totals:
+                self.activity.record('rewards', POINTS_PER_MESSAGE)
+                current_daily_points = totals['today_points']
                 
                 # Проверяем достижения
                 for threshold in POINTS_THRESHOLDS + [10000]:
@@ -258,10 +301,21 @@ class ChatBot:
                                 user_boosts[user.id] = time.time() + 30*60
                             break
     
+    async def activity_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Обработчик команды /activity (только для администратора)"""
+        if not ADMIN_ID or update.effective_user.id != ADMIN_ID:
+            return
+        summary = self.activity.summary({'messages': '💬 Сообщения', 'rewards': '🎯 Очки',
+                                         'rejected': '🚫 Отклонено'})
+        cache = self.verdicts.stats()
+        await update.message.reply_text(f"📈 Активность чата\n\n{summary}\n\n"
+                                        f"🗃 Кэш фильтра: {cache['hits']} попаданий, {cache['misses']} промахов "
+                                        f"({cache['hit_rate']:.0%})")
+    
     async def daily_report(self, context: ContextTypes.DEFAULT_TYPE):
         """Ежедневный отчет в 22:00"""
         try:
-            top_users = self.db.get_daily_top(TOP_USERS_LIMIT)
+            top_users = await self.adb.get_daily_top(TOP_USERS_LIMIT)
             
             if not top_users:
                 report_text = f"📊 *Ежедневный отчет*\n\nСегодня пока нет активных пользователей. Будь первым!"
@@ -305,11 +359,30 @@ class ChatBot:
         user_boosts.clear()
         logger.info("Достижения, пороги и бусты за день сброшены")
     
+    async def clear_expired_mutes(self, context: ContextTypes.DEFAULT_TYPE):
+        """Удаление истекших мутов из базы"""
+        try:
+            removed = await self.adb.clear_expired_mutes()
+            if removed:
+                logger.info(f"Removed {removed} expired mutes")
+        except Exception as e:
+            logger.error(f"Ошибка при удалении истекших мутов: {e}")
+    
+    async def backup_database(self, context: ContextTypes.DEFAULT_TYPE):
+        """Резервное копирование базы без остановки бота"""
+        for backup in self.backups:
+            try:
+                result = await self.adb.run(backup.run, timeout=None)
+                logger.info(f"Backup {result.path} done in {result.seconds:.1f}s, "
+                            f"{result.size / 1024 / 1024:.1f} MB, removed {len(result.removed)} old snapshots")
+            except Exception as e:
+                logger.error(f"Ошибка резервного копирования: {e}")
+    
     async def check_monthly_winner(self, context: ContextTypes.DEFAULT_TYPE):
         """Проверка и сохранение победителя месяца"""
         try:
             # Получаем победителя предыдущего месяца
-            winner = self.db.get_previous_month_winner()
+            winner = await self.adb.get_previous_month_winner()
             if winner:
                 user_id, username, points = winner
                 
@@ -318,7 +391,7 @@ class ChatBot:
                 month_start = previous_month.replace(day=1).isoformat()[:10]
                 
                 # Сохраняем победителя
-                self.db.save_monthly_winner(user_id, username, points, month_start)
+                await self.adb.save_monthly_winner(user_id, username, points, month_start)
                 
                 # Отправляем уведомление о победителе месяца
                 winner_text = f"""
@@ -347,24 +420,15 @@ class ChatBot:
                 await update.message.reply_text("Количество должно быть положительным!")
                 return
             from_user = update.effective_user
-            from_stats = self.db.get_user_stats(from_user.id)
-            if not from_stats or from_stats['total_points'] < amount:
-                await update.message.reply_text("Недостаточно очков для перевода!")
-                return
             # Найти user_id по username
-            to_user_id = None
-            with sqlite3.connect(self.db.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT user_id FROM users WHERE username = ?", (to_username,))
-                row = cursor.fetchone()
-                if row:
-                    to_user_id = row[0]
+            to_user_id = await self.adb.get_user_id_by_username(to_username)
             if not to_user_id:
                 await update.message.reply_text("Пользователь не найден!")
                 return
-            # Списать у отправителя, начислить получателю
-            self.db.add_points(from_user.id, -amount)
-            self.db.add_points(to_user_id, amount)
+            # Списать у отправителя и начислить получателю одной транзакцией
+            if await self.adb.transfer_points(from_user.id, to_user_id, amount) is None:
+                await update.message.reply_text("Недостаточно очков для перевода!")
+                return
             await context.bot.send_message(
                 chat_id=CHAT_ID,
                 text=f"@{from_user.username or from_user.first_name} отправил(а) {amount} очков активности @{to_username}!"
@@ -384,28 +448,22 @@ class ChatBot:
                 await update.message.reply_text("Минимум 100 очков и только кратно 100!")
                 return
             from_user = update.effective_user
-            from_stats = self.db.get_user_stats(from_user.id)
+            from_stats = await self.adb.get_user_stats(from_user.id)
             if not from_stats or from_stats['total_points'] < amount:
                 await update.message.reply_text("Недостаточно очков для мута!")
                 return
             # Найти user_id по username
-            to_user_id = None
-            with sqlite3.connect(self.db.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT user_id FROM users WHERE username = ?", (to_username,))
-                row = cursor.fetchone()
-                if row:
-                    to_user_id = row[0]
+            to_user_id = await self.adb.get_user_id_by_username(to_username)
             if not to_user_id:
                 await update.message.reply_text("Пользователь не найден!")
                 return
             # Списать очки у инициатора
-            self.db.add_points(from_user.id, -amount)
+            await self.adb.add_points(from_user.id, -amount)
             # Рассчитать время мута
             mute_minutes = (amount // 100) * 30
             mute_seconds = mute_minutes * 60
             until_ts = int(time.time()) + mute_seconds
-            self.db.set_mute(to_user_id, until_ts)
+            await self.adb.set_mute(to_user_id, until_ts)
             await context.bot.send_message(
                 chat_id=CHAT_ID,
                 text=f"@{from_user.username or from_user.first_name} замутил(а) @{to_username} на {mute_minutes} минут! (-{amount} очков)"
@@ -421,7 +479,7 @@ class ChatBot:
                 return
             amount = int(context.args[0])
             user = update.effective_user
-            stats = self.db.get_user_stats(user.id)
+            stats = await self.adb.get_user_stats(user.id)
             if not stats or stats['total_points'] < amount or amount <= 0:
                 await update.message.reply_text("Недостаточно очков для игры!")
                 return
@@ -429,13 +487,13 @@ class ChatBot:
             win_chance = random.uniform(0.10, 0.20)
             win = random.random() < win_chance
             if win:
-                self.db.add_points(user.id, amount)  # удвоение
+                await self.adb.add_points(user.id, amount)  # удвоение
                 await context.bot.send_message(
                     chat_id=CHAT_ID,
                     text=f"@{user.username or user.first_name} бросил(а) кости и выиграл(а) {amount} очков! 🎲"
                 )
             else:
-                self.db.add_points(user.id, -amount)
+                await self.adb.add_points(user.id, -amount)
                 await context.bot.send_message(
                     chat_id=CHAT_ID,
                     text=f"@{user.username or user.first_name} бросил(а) кости и проиграл(а) {amount} очков! 🎲"
@@ -444,13 +502,17 @@ class ChatBot:
             logger.error(f"Ошибка в dice_command: {e}")
             await update.message.reply_text("Ошибка при игре в кости.")
 
+    async def shutdown(self, application):
+        """Сохранение статистики активности и закрытие соединений с базой данных при остановке бота"""
+        await asyncio.get_running_loop().run_in_executor(None, self.activity.save)
+        await self.adb.close()
+
 def main():
     """Основная функция"""
-    # Создаем приложение
-    application = Application.builder().token(BOT_TOKEN).build()
-    
-    # Создаем экземпляр бота
-    bot = ChatBot(application)
+    # Создаем экземпляр бота и приложение
+    bot = ChatBot()
+    application = Application.builder().token(BOT_TOKEN).post_shutdown(bot.shutdown).build()
+    bot.application = application
     
     # Добавляем обработчики команд
     application.add_handler(CommandHandler("start", bot.start))
@@ -462,13 +524,14 @@ def main():
     application.add_handler(CommandHandler("send", bot.send_command))
     application.add_handler(CommandHandler("mute", bot.mute_command))
     application.add_handler(CommandHandler("dice", bot.dice_command))
+    application.add_handler(CommandHandler("activity", bot.activity_command))
     
     # Добавляем обработчик сообщений
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, bot.handle_message))
     
     # Настраиваем планировщик через JobQueue
     job_queue = application.job_queue
-    moscow_tz = pytz.timezone('Europe/Moscow')
+    moscow_tz = pytz.timezone(TIMEZONE)
     
     # Ежедневный отчет
     job_queue.run_daily(
@@ -488,6 +551,15 @@ def main():
         time=datetime.time(hour=RESET_ACHIEVEMENTS_HOUR, minute=RESET_ACHIEVEMENTS_MINUTE, tzinfo=moscow_tz)
     )
     
+    # Удаление истекших мутов
+    job_queue.run_repeating(bot.clear_expired_mutes, interval=3600, first=3600)
+    
+    # Резервная копия базы
+    job_queue.run_daily(
+        bot.backup_database,
+        time=datetime.time(hour=BACKUP_HOUR, minute=0, tzinfo=moscow_tz)
+    )
+    
     # Проверка победителя месяца
     job_queue.run_daily(
         bot.check_monthly_winner, 
@@ -8,6 +8,30 @@ load_dotenv()
 BOT_TOKEN = os.getenv('BOT_TOKEN')
 CHAT_ID = os.getenv('CHAT_ID')
 
+# Хранилище: sqlite или memory (память процесса, данные не сохраняются)
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'sqlite')
+
+# Часовой пояс для границ дня, недели и месяца
+TIMEZONE = os.getenv('TIMEZONE', 'Europe/Moscow')
+
+# Резервные копии базы: каталог, число хранимых снимков и час запуска
+BACKUP_DIR = os.getenv('BACKUP_DIR', 'backups')
+BACKUP_KEEP = int(os.getenv('BACKUP_KEEP', 7))
+BACKUP_HOUR = int(os.getenv('BACKUP_HOUR', 3))
+
+# Администратор (команда /activity) и файл поминутной статистики
+ADMIN_ID = int(os.getenv('ADMIN_ID', 0))
+ACTIVITY_SERIES_PATH = os.getenv('ACTIVITY_SERIES_PATH', 'activity.series')
+
+# Почти повторы сообщений: окно на пользователя, окно на чат и срок хранения (сек)
+DUPLICATE_USER_WINDOW = int(os.getenv('DUPLICATE_USER_WINDOW', 20))
+DUPLICATE_CHAT_WINDOW = int(os.getenv('DUPLICATE_CHAT_WINDOW', 200))
+DUPLICATE_TTL = int(os.getenv('DUPLICATE_TTL', 3600))
+
+# Кэш вердиктов фильтра по хэшу текста: число записей и срок жизни (сек)
+VERDICT_CACHE_SIZE = int(os.getenv('VERDICT_CACHE_SIZE', 4096))
+VERDICT_CACHE_TTL = int(os.getenv('VERDICT_CACHE_TTL', 300))
+
 def load_settings():
     """Загрузка настроек из файла settings.txt"""
     settings = {}
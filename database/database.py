@@ -1,163 +1,263 @@
-import sqlite3
 import os
 from datetime import datetime
-from typing import List, Dict, Optional, Tuple
+from typing import Any, List, Dict, Optional, Tuple
 import logging
 
-class Database:
-    def __init__(self, db_path: str):
+from storage.connection import ConnectionManager
+from storage.migrations import Migration, apply_migrations
+from storage.archive import TransactionArchive
+from storage.cache import LRUCache
+from storage.models import Ad, Booking, DiceGame, Nft, Transaction, User
+from storage.repository import SYSTEM_USER_ID, Repository, TransferError
+from storage.rollup import DEFAULT_TIMEZONE, PeriodClock
+from storage.usernames import UsernameDirectory, username_migration
+
+MIGRATIONS = [
+    Migration(1, 'Начальная схема', [
+        # Таблица пользователей
+        '''
+            CREATE TABLE IF NOT EXISTS users (
+                user_id INTEGER PRIMARY KEY,
+                username TEXT,
+                first_name TEXT,
+                last_name TEXT,
+                ton_wallet TEXT,
+                gasjk_balance REAL DEFAULT 0.0,
+                messages_count INTEGER DEFAULT 0,
+                nft_count INTEGER DEFAULT 0,
+                registration_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                last_activity TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''',
+        # Таблица транзакций
+        '''
+            CREATE TABLE IF NOT EXISTS transactions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                from_user_id INTEGER,
+                to_user_id INTEGER,
+                amount REAL,
+                transaction_type TEXT,
+                status TEXT DEFAULT 'pending',
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (from_user_id) REFERENCES users (user_id),
+                FOREIGN KEY (to_user_id) REFERENCES users (user_id)
+            )
+        ''',
+        # Таблица NFT
+        '''
+            CREATE TABLE IF NOT EXISTS nfts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER,
+                nft_address TEXT,
+                collection_name TEXT,
+                token_id TEXT,
+                metadata TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (user_id) REFERENCES users (user_id)
+            )
+        ''',
+        # Таблица объявлений (каучсёрфинг)
+        '''
+            CREATE TABLE IF NOT EXISTS couchsurfing_ads (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER,
+                country TEXT,
+                city TEXT,
+                settlement TEXT,
+                start_date DATE,
+                end_date DATE,
+                description TEXT,
+                rating REAL DEFAULT 0.0,
+                status TEXT DEFAULT 'active',
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (user_id) REFERENCES users (user_id)
+            )
+        ''',
+        # Таблица бронирований
+        '''
+            CREATE TABLE IF NOT EXISTS bookings (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                guest_id INTEGER,
+                host_id INTEGER,
+                ad_id INTEGER,
+                start_date DATE,
+                end_date DATE,
+                status TEXT DEFAULT 'pending',
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (guest_id) REFERENCES users (user_id),
+                FOREIGN KEY (host_id) REFERENCES users (user_id),
+                FOREIGN KEY (ad_id) REFERENCES couchsurfing_ads (id)
+            )
+        ''',
+        # Таблица игр в кости
+        '''
+            CREATE TABLE IF NOT EXISTS dice_games (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                game_id TEXT UNIQUE,
+                player1_id INTEGER,
+                player2_id INTEGER,
+                bet_amount REAL,
+                player1_dice INTEGER,
+                player2_dice INTEGER,
+                winner_id INTEGER,
+                status TEXT DEFAULT 'active',
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (player1_id) REFERENCES users (user_id),
+                FOREIGN KEY (player2_id) REFERENCES users (user_id),
+                FOREIGN KEY (winner_id) REFERENCES users (user_id)
+            )
+        ''',
+    ]),
+    Migration(2, 'Индексы для частых запросов', [
+        'CREATE INDEX IF NOT EXISTS idx_users_username ON users (username)',
+        'CREATE INDEX IF NOT EXISTS idx_transactions_from ON transactions (from_user_id, created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_transactions_to ON transactions (to_user_id, created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_nfts_user ON nfts (user_id)',
+        'CREATE INDEX IF NOT EXISTS idx_ads_status_location ON couchsurfing_ads (status, country, city, created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_ads_user ON couchsurfing_ads (user_id)',
+        'CREATE INDEX IF NOT EXISTS idx_bookings_guest ON bookings (guest_id, created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_bookings_host ON bookings (host_id, created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_bookings_ad ON bookings (ad_id, status)',
+        'CREATE INDEX IF NOT EXISTS idx_dice_games_player1 ON dice_games (player1_id, created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_dice_games_player2 ON dice_games (player2_id, created_at)',
+    ]),
+    Migration(3, 'История username и индекс без учета регистра', username_migration('last_activity')),
+    Migration(4, 'Счетчики активности по дням', [
+        '''
+            CREATE TABLE IF NOT EXISTS daily_activity (
+                day DATE PRIMARY KEY,
+                active_users INTEGER NOT NULL DEFAULT 0,
+                messages INTEGER NOT NULL DEFAULT 0,
+                rewards REAL NOT NULL DEFAULT 0.0,
+                nfts INTEGER NOT NULL DEFAULT 0
+            )
+        ''',
+        # Пользователи, уже учтенные в active_users текущего дня
+        '''
+            CREATE TABLE IF NOT EXISTS daily_active_users (
+                day DATE NOT NULL,
+                user_id INTEGER NOT NULL,
+                PRIMARY KEY (day, user_id)
+            ) WITHOUT ROWID
+        ''',
+    ]),
+]
+
+class Database(Repository):
+    """Хранилище GasJK-бота в SQLite"""
+    
+    def __init__(self, db_path: str, archive_path: Optional[str] = None,
+                 user_cache_size: int = 1024, user_cache_ttl: Optional[float] = 60.0,
+                 timezone: str = DEFAULT_TIMEZONE, clock: Optional[PeriodClock] = None):
         self.db_path = db_path
+        # Границы дня для счетчиков активности
+        self.clock = clock or PeriodClock(timezone)
+        self._activity_day: Optional[str] = None
+        if os.path.dirname(self.db_path):
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self.pool = ConnectionManager(self.db_path)
+        self.usernames = UsernameDirectory()
         self.init_database()
+        with self.pool.read() as conn:
+            self.usernames.load(conn)
+        
+        # Кэш get_user; записи сбрасываются при каждом изменении строки пользователя
+        self.user_cache = LRUCache(user_cache_size, user_cache_ttl)
+        
+        # Архив транзакций прошлых месяцев хранится в отдельном файле рядом с основной базой
+        if archive_path is None:
+            archive_path = db_path if db_path == ':memory:' else os.path.splitext(db_path)[0] + '_archive.db'
+        self.archive = TransactionArchive(archive_path, skip_user_id=SYSTEM_USER_ID)
     
     def init_database(self):
-        """Инициализация базы данных и создание таблиц"""
-        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
-        
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            
-            # Таблица пользователей
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS users (
-                    user_id INTEGER PRIMARY KEY,
-                    username TEXT,
-                    first_name TEXT,
-                    last_name TEXT,
-                    ton_wallet TEXT,
-                    gasjk_balance REAL DEFAULT 0.0,
-                    messages_count INTEGER DEFAULT 0,
-                    nft_count INTEGER DEFAULT 0,
-                    registration_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    last_activity TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            # Таблица транзакций
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS transactions (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    from_user_id INTEGER,
-                    to_user_id INTEGER,
-                    amount REAL,
-                    transaction_type TEXT,
-                    status TEXT DEFAULT 'pending',
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (from_user_id) REFERENCES users (user_id),
-                    FOREIGN KEY (to_user_id) REFERENCES users (user_id)
-                )
-            ''')
-            
-            # Таблица NFT
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS nfts (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER,
-                    nft_address TEXT,
-                    collection_name TEXT,
-                    token_id TEXT,
-                    metadata TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (user_id) REFERENCES users (user_id)
-                )
-            ''')
-            
-            # Таблица объявлений (каучсёрфинг)
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS couchsurfing_ads (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER,
-                    country TEXT,
-                    city TEXT,
-                    settlement TEXT,
-                    start_date DATE,
-                    end_date DATE,
-                    description TEXT,
-                    rating REAL DEFAULT 0.0,
-                    status TEXT DEFAULT 'active',
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (user_id) REFERENCES users (user_id)
-                )
-            ''')
-            
-            # Таблица бронирований
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS bookings (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    guest_id INTEGER,
-                    host_id INTEGER,
-                    ad_id INTEGER,
-                    start_date DATE,
-                    end_date DATE,
-                    status TEXT DEFAULT 'pending',
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (guest_id) REFERENCES users (user_id),
-                    FOREIGN KEY (host_id) REFERENCES users (user_id),
-                    FOREIGN KEY (ad_id) REFERENCES couchsurfing_ads (id)
-                )
-            ''')
-            
-            # Таблица игр в кости
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS dice_games (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    game_id TEXT UNIQUE,
-                    player1_id INTEGER,
-                    player2_id INTEGER,
-                    bet_amount REAL,
-                    player1_dice INTEGER,
-                    player2_dice INTEGER,
-                    winner_id INTEGER,
-                    status TEXT DEFAULT 'active',
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (player1_id) REFERENCES users (user_id),
-                    FOREIGN KEY (player2_id) REFERENCES users (user_id),
-                    FOREIGN KEY (winner_id) REFERENCES users (user_id)
-                )
-            ''')
-            
-            conn.commit()
+        """Применение миграций схемы базы данных"""
+        apply_migrations(self.pool, MIGRATIONS)
+    
+    def _record_activity(self, cursor, active_users: Tuple[int, ...] = (), messages: int = 0,
+                         rewards: float = 0.0, nfts: int = 0):
+        """Увеличение счетчиков активности текущего дня в транзакции вызывающего"""
+        day = self.clock.current()[0]['day']
+        if day != self._activity_day:
+            # Отметки прошедших дней больше не нужны
+            cursor.execute('DELETE FROM daily_active_users WHERE day < ?', (day,))
+            self._activity_day = day
+        new_users = 0
+        if active_users:
+            cursor.executemany('INSERT OR IGNORE INTO daily_active_users (day, user_id) VALUES (?, ?)',
+                               [(day, user_id) for user_id in active_users])
+            new_users = cursor.rowcount
+        cursor.execute('''
+            INSERT INTO daily_activity (day, active_users, messages, rewards, nfts)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(day) DO UPDATE SET
+                active_users = active_users + excluded.active_users,
+                messages = messages + excluded.messages,
+                rewards = rewards + excluded.rewards,
+                nfts = nfts + excluded.nfts
+        ''', (day, new_users, messages, rewards, nfts))
     
     def add_user(self, user_id: int, username: Optional[str] = None, first_name: Optional[str] = None, last_name: Optional[str] = None) -> bool:
         """Добавление нового пользователя"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.pool.write() as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
-                    INSERT OR IGNORE INTO users (user_id, username, first_name, last_name)
-                    VALUES (?, ?, ?, ?)
-                ''', (user_id, username, first_name, last_name))
+                    INSERT OR IGNORE INTO users (user_id, first_name, last_name)
+                    VALUES (?, ?, ?)
+                ''', (user_id, first_name, last_name))
+                added = cursor.rowcount > 0
+                # Username записывается отдельно: он мог смениться у существующего пользователя
+                renamed = self.usernames.record(conn, user_id, username)
                 conn.commit()
-                return cursor.rowcount > 0
+                self.usernames.set(user_id, username)
+            if added or renamed:
+                self.user_cache.invalidate(user_id)
+            return added
         except Exception as e:
             logging.error(f"Error adding user: {e}")
             return False
     
-    def get_user(self, user_id: int) -> Optional[Dict]:
-        """Получение информации о пользователе"""
+    def get_user(self, user_id: int) -> Optional[User]:
+        """Получение информации о пользователе (через кэш)
+        
+        Возвращаемый объект общий для всех вызывающих, изменять его нельзя
+        """
+        user = self.user_cache.get(user_id)
+        if user is not None:
+            return user
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            generation = self.user_cache.generation()
+            with self.pool.read() as conn:
                 cursor = conn.cursor()
                 cursor.execute('SELECT * FROM users WHERE user_id = ?', (user_id,))
-                row = cursor.fetchone()
-                if row:
-                    columns = [description[0] for description in cursor.description]
-                    return dict(zip(columns, row))
-                return None
+                user = User.one_from_cursor(cursor)
+            if user is not None:
+                self.user_cache.put(user_id, user, generation)
+            return user
         except Exception as e:
             logging.error(f"Error getting user: {e}")
             return None
     
+    def get_user_id_by_username(self, username: str) -> Optional[int]:
+        """Поиск user_id по текущему или прежнему username без учета регистра (в памяти)"""
+        return self.usernames.resolve(username)
+    
     def update_user_balance(self, user_id: int, amount: float) -> bool:
         """Обновление баланса пользователя"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.pool.write() as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
                     UPDATE users SET gasjk_balance = gasjk_balance + ?, last_activity = CURRENT_TIMESTAMP
                     WHERE user_id = ?
                 ''', (amount, user_id))
-                conn.commit()
-                return cursor.rowcount > 0
+                updated = cursor.rowcount > 0
+                if updated:
+                    self._record_activity(cursor, active_users=(user_id,))
+            self.user_cache.invalidate(user_id)
+            if updated:
+                self._balances_changed((user_id,))
+            return updated
         except Exception as e:
             logging.error(f"Error updating balance: {e}")
             return False
@@ -165,14 +265,17 @@ class Database:
     def increment_messages(self, user_id: int) -> bool:
         """Увеличение счетчика сообщений"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.pool.write() as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
                     UPDATE users SET messages_count = messages_count + 1, last_activity = CURRENT_TIMESTAMP
                     WHERE user_id = ?
                 ''', (user_id,))
-                conn.commit()
-                return cursor.rowcount > 0
+                updated = cursor.rowcount > 0
+                if updated:
+                    self._record_activity(cursor, active_users=(user_id,), messages=1)
+            self.user_cache.invalidate(user_id)
+            return updated
         except Exception as e:
             logging.error(f"Error incrementing messages: {e}")
             return False
@@ -180,66 +283,222 @@ class Database:
     def add_transaction(self, from_user_id: int, to_user_id: int, amount: float, transaction_type: str) -> int:
         """Добавление транзакции"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.pool.write() as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
                     INSERT INTO transactions (from_user_id, to_user_id, amount, transaction_type)
                     VALUES (?, ?, ?, ?)
                 ''', (from_user_id, to_user_id, amount, transaction_type))
-                conn.commit()
                 result = cursor.lastrowid
                 return result if result is not None else -1
         except Exception as e:
             logging.error(f"Error adding transaction: {e}")
             return -1
     
-    def get_user_transactions(self, user_id: int, limit: int = 10) -> List[Dict]:
+    def apply_message_rewards(self, rewards: List[Tuple[int, float, int]],
+                              transactions: List[Tuple[int, float, str]]) -> Optional[Dict[int, float]]:
+        """Пакетное начисление наград за сообщения одной транзакцией
+        
+        rewards: (user_id, сумма, количество сообщений) - по строке на пользователя
+        transactions: (user_id, сумма, время) - по записи на каждое сообщение
+        Возвращает новые балансы пользователей или None при ошибке (транзакция откатывается)
+        """
+        try:
+            with self.pool.write() as conn:
+                cursor = conn.cursor()
+                balances = {}
+                issued = 0.0
+                messages_total = 0
+                for user_id, amount, messages in rewards:
+                    cursor.execute('''
+                        UPDATE users SET gasjk_balance = gasjk_balance + ?, messages_count = messages_count + ?,
+                                         last_activity = CURRENT_TIMESTAMP
+                        WHERE user_id = ?
+                        RETURNING gasjk_balance
+                    ''', (amount, messages, user_id))
+                    row = cursor.fetchone()
+                    if row:
+                        balances[user_id] = row[0]
+                        issued += amount
+                        messages_total += messages
+                
+                self._record_activity(cursor, active_users=tuple(balances), messages=messages_total,
+                                      rewards=issued)
+                cursor.executemany('''
+                    INSERT INTO transactions (from_user_id, to_user_id, amount, transaction_type, created_at)
+                    VALUES (0, ?, ?, 'message_reward', ?)
+                ''', transactions)
+            self.user_cache.invalidate(*balances)
+            self._balances_changed(balances)
+            return balances
+        except Exception as e:
+            logging.error(f"Error applying message rewards: {e}")
+            return None
+    
+    def transfer_many(self, transfers: List[Tuple[int, int, float]],
+                      transaction_type: str = 'transfer') -> Optional[Dict[int, float]]:
+        """Пакет переводов (from_user_id, to_user_id, сумма) одной транзакцией
+        
+        Списание выполняется условным UPDATE (gasjk_balance >= сумма), поэтому между
+        проверкой баланса и списанием нет окна для двойной траты. Переводы от
+        SYSTEM_USER_ID (например, раздачи от администратора) только начисляют.
+        Если хотя бы один перевод невозможен, не применяется ни один.
+        Возвращает новые балансы участников или None.
+        """
+        try:
+            with self.pool.write() as conn:
+                cursor = conn.cursor()
+                balances = {}
+                for from_user_id, to_user_id, amount in transfers:
+                    if amount <= 0 or from_user_id == to_user_id:
+                        raise TransferError(f"invalid transfer {from_user_id} -> {to_user_id} of {amount}")
+                    
+                    if from_user_id != SYSTEM_USER_ID:
+                        cursor.execute('''
+                            UPDATE users SET gasjk_balance = gasjk_balance - ?, last_activity = CURRENT_TIMESTAMP
+                            WHERE user_id = ? AND gasjk_balance >= ?
+                            RETURNING gasjk_balance
+                        ''', (amount, from_user_id, amount))
+                        row = cursor.fetchone()
+                        if row is None:
+                            raise TransferError(f"insufficient balance of user {from_user_id}")
+                        balances[from_user_id] = row[0]
+                    
+                    cursor.execute('''
+                        UPDATE users SET gasjk_balance = gasjk_balance + ?
+                        WHERE user_id = ?
+                        RETURNING gasjk_balance
+                    ''', (amount, to_user_id))
+                    row = cursor.fetchone()
+                    if row is None:
+                        raise TransferError(f"unknown recipient {to_user_id}")
+                    balances[to_user_id] = row[0]
+                
+                senders = tuple({from_user_id for from_user_id, _, _ in transfers} - {SYSTEM_USER_ID})
+                self._record_activity(cursor, active_users=senders)
+                cursor.executemany('''
+                    INSERT INTO transactions (from_user_id, to_user_id, amount, transaction_type, status)
+                    VALUES (?, ?, ?, ?, 'completed')
+                ''', [(from_user_id, to_user_id, amount, transaction_type)
+                      for from_user_id, to_user_id, amount in transfers])
+            self.user_cache.invalidate(*balances)
+            self._balances_changed(balances)
+            return balances
+        except TransferError as e:
+            logging.warning(f"Transfer rejected: {e}")
+            return None
+        except Exception as e:
+            logging.error(f"Error transferring: {e}")
+            return None
+    
+    def get_user_transactions(self, user_id: int, limit: int = 10) -> List[Transaction]:
         """Получение транзакций пользователя"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.pool.read() as conn:
                 cursor = conn.cursor()
+                # Две ветки вместо OR, чтобы каждая шла по своему индексу
                 cursor.execute('''
-                    SELECT * FROM transactions 
-                    WHERE from_user_id = ? OR to_user_id = ?
-                    ORDER BY created_at DESC LIMIT ?
-                ''', (user_id, user_id, limit))
-                rows = cursor.fetchall()
-                columns = [description[0] for description in cursor.description]
-                return [dict(zip(columns, row)) for row in rows]
+                    SELECT * FROM (
+                        SELECT * FROM transactions WHERE from_user_id = :user_id
+                        ORDER BY created_at DESC LIMIT :limit
+                    )
+                    UNION ALL
+                    SELECT * FROM (
+                        SELECT * FROM transactions WHERE to_user_id = :user_id AND from_user_id != :user_id
+                        ORDER BY created_at DESC LIMIT :limit
+                    )
+                    ORDER BY created_at DESC LIMIT :limit
+                ''', {'user_id': user_id, 'limit': limit})
+                transactions = Transaction.from_cursor(cursor)
+            
+            # Недостающие строки берутся из архива прошлых месяцев
+            if len(transactions) < limit:
+                archived = [Transaction(*row) for row in self.archive.user_history(user_id, limit)]
+                transactions.extend(archived)
+                transactions.sort(key=lambda tx: (tx.created_at, tx.id), reverse=True)
+                transactions = transactions[:limit]
+            return transactions
         except Exception as e:
             logging.error(f"Error getting transactions: {e}")
             return []
     
+    def archive_transactions(self, before: Optional[str] = None, batch_size: int = 5000) -> int:
+        """Перенос транзакций прошлых месяцев в сжатый архив
+        
+        before - граница в формате 'YYYY-MM-DD' (по умолчанию начало текущего месяца, UTC).
+        Строки переносятся пачками по batch_size в порядке id: пачка записывается
+        в архив, затем удаляется из основной базы до ее наибольшего id, поэтому
+        память не зависит от объема истории, а прерванный перенос безопасно
+        повторить. Возвращает число перенесенных строк.
+        """
+        if before is None:
+            before = datetime.utcnow().strftime('%Y-%m-01')
+        archived = 0
+        months = set()
+        try:
+            last_id = 0
+            while True:
+                with self.pool.read() as conn:
+                    cursor = conn.cursor()
+                    cursor.execute('''
+                        SELECT * FROM transactions WHERE created_at < ? AND id > ? ORDER BY id LIMIT ?
+                    ''', (before, last_id, batch_size))
+                    rows = cursor.fetchall()
+                if not rows:
+                    break
+                
+                by_month: Dict[str, List[Tuple]] = {}
+                for row in rows:
+                    by_month.setdefault(str(row[6])[:7], []).append(row)
+                for month, month_rows in by_month.items():
+                    self.archive.store(month, month_rows)
+                months.update(by_month)
+                
+                # Удаляем только заархивированные строки: новые могли появиться после чтения
+                last_id = rows[-1][0]
+                with self.pool.write() as conn:
+                    cursor = conn.cursor()
+                    cursor.execute('''
+                        DELETE FROM transactions WHERE created_at < ? AND id <= ?
+                    ''', (before, last_id))
+                    archived += cursor.rowcount
+                if len(rows) < batch_size:
+                    break
+            if archived:
+                logging.info(f"Archived {archived} transactions from {len(months)} months")
+            return archived
+        except Exception as e:
+            logging.error(f"Error archiving transactions: {e}")
+            return archived
+    
     def add_nft(self, user_id: int, nft_address: str, collection_name: str, token_id: str, metadata: str) -> bool:
         """Добавление NFT пользователю"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.pool.write() as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
                     INSERT INTO nfts (user_id, nft_address, collection_name, token_id, metadata)
                     VALUES (?, ?, ?, ?, ?)
                 ''', (user_id, nft_address, collection_name, token_id, metadata))
-                conn.commit()
                 
                 # Обновляем счетчик NFT у пользователя
                 cursor.execute('''
                     UPDATE users SET nft_count = nft_count + 1 WHERE user_id = ?
                 ''', (user_id,))
-                conn.commit()
-                return True
+                self._record_activity(cursor, nfts=1)
+            self.user_cache.invalidate(user_id)
+            return True
         except Exception as e:
             logging.error(f"Error adding NFT: {e}")
             return False
     
-    def get_user_nfts(self, user_id: int) -> List[Dict]:
+    def get_user_nfts(self, user_id: int) -> List[Nft]:
         """Получение NFT пользователя"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.pool.read() as conn:
                 cursor = conn.cursor()
                 cursor.execute('SELECT * FROM nfts WHERE user_id = ?', (user_id,))
-                rows = cursor.fetchall()
-                columns = [description[0] for description in cursor.description]
-                return [dict(zip(columns, row)) for row in rows]
+                return Nft.from_cursor(cursor)
         except Exception as e:
             logging.error(f"Error getting NFTs: {e}")
             return []
@@ -248,24 +507,34 @@ class Database:
                            start_date: str, end_date: str, description: str) -> int:
         """Добавление объявления о каучсёрфинге"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.pool.write() as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
                     INSERT INTO couchsurfing_ads (user_id, country, city, settlement, start_date, end_date, description)
                     VALUES (?, ?, ?, ?, ?, ?, ?)
                 ''', (user_id, country, city, settlement, start_date, end_date, description))
-                conn.commit()
                 result = cursor.lastrowid
                 return result if result is not None else -1
         except Exception as e:
             logging.error(f"Error adding ad: {e}")
             return -1
     
+    def get_couchsurfing_ad(self, ad_id: int) -> Optional[Ad]:
+        """Получение объявления по id"""
+        try:
+            with self.pool.read() as conn:
+                cursor = conn.cursor()
+                cursor.execute('SELECT * FROM couchsurfing_ads WHERE id = ?', (ad_id,))
+                return Ad.one_from_cursor(cursor)
+        except Exception as e:
+            logging.error(f"Error getting ad: {e}")
+            return None
+    
     def get_couchsurfing_ads(self, country: Optional[str] = None, city: Optional[str] = None, 
-                            settlement: Optional[str] = None, status: str = 'active') -> List[Dict]:
+                            settlement: Optional[str] = None, status: str = 'active') -> List[Ad]:
         """Получение объявлений о каучсёрфинге с фильтрацией"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.pool.read() as conn:
                 cursor = conn.cursor()
                 query = 'SELECT * FROM couchsurfing_ads WHERE status = ?'
                 params = [status]
@@ -282,23 +551,168 @@ class Database:
                 
                 query += ' ORDER BY created_at DESC'
                 cursor.execute(query, params)
+                return Ad.from_cursor(cursor)
+        except Exception as e:
+            logging.error(f"Error getting ads: {e}")
+            return []
+    
+    def search_couchsurfing_ads(self, query: str) -> List[Ad]:
+        """Поиск активных объявлений по месту и описанию"""
+        try:
+            with self.pool.read() as conn:
+                cursor = conn.cursor()
+                pattern = f'%{query}%'
+                cursor.execute('''
+                    SELECT * FROM couchsurfing_ads
+                    WHERE status = 'active' AND (
+                        country LIKE ? OR 
+                        city LIKE ? OR 
+                        settlement LIKE ? OR 
+                        description LIKE ?
+                    )
+                    ORDER BY created_at DESC
+                ''', (pattern, pattern, pattern, pattern))
+                return Ad.from_cursor(cursor)
+        except Exception as e:
+            logging.error(f"Error searching ads: {e}")
+            return []
+    
+    def get_popular_destinations(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """Получение популярных направлений"""
+        try:
+            with self.pool.read() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT 
+                        country,
+                        city,
+                        COUNT(*) as ads_count,
+                        AVG(rating) as avg_rating
+                    FROM couchsurfing_ads
+                    WHERE status = 'active'
+                    GROUP BY country, city
+                    ORDER BY ads_count DESC, avg_rating DESC
+                    LIMIT ?
+                ''', (limit,))
                 rows = cursor.fetchall()
                 columns = [description[0] for description in cursor.description]
                 return [dict(zip(columns, row)) for row in rows]
         except Exception as e:
-            logging.error(f"Error getting ads: {e}")
+            logging.error(f"Error getting popular destinations: {e}")
             return []
     
+    def get_couchsurfing_stats(self, user_id: int) -> Dict[str, Any]:
+        """Статистика пользователя в каучсёрфинге"""
+        try:
+            with self.pool.read() as conn:
+                cursor = conn.cursor()
+                
+                # Статистика как хост
+                cursor.execute('''
+                    SELECT 
+                        COUNT(*) as ads_count,
+                        AVG(rating) as avg_rating,
+                        COUNT(CASE WHEN status = 'active' THEN 1 END) as active_ads
+                    FROM couchsurfing_ads
+                    WHERE user_id = ?
+                ''', (user_id,))
+                host_stats = cursor.fetchone()
+                
+                # Статистика как гость
+                cursor.execute('SELECT COUNT(*) FROM bookings WHERE guest_id = ?', (user_id,))
+                guest_stats = cursor.fetchone()
+                
+                return {
+                    'host_ads_count': host_stats[0] or 0,
+                    'host_avg_rating': host_stats[1] or 0.0,
+                    'host_active_ads': host_stats[2] or 0,
+                    'guest_bookings_count': guest_stats[0] or 0
+                }
+        except Exception as e:
+            logging.error(f"Error getting couchsurfing stats: {e}")
+            return {'host_ads_count': 0, 'host_avg_rating': 0.0, 'host_active_ads': 0, 'guest_bookings_count': 0}
+    
+    def add_booking(self, guest_id: int, host_id: int, ad_id: int, start_date: str, end_date: str) -> int:
+        """Создание бронирования"""
+        try:
+            with self.pool.write() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    INSERT INTO bookings (guest_id, host_id, ad_id, start_date, end_date)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (guest_id, host_id, ad_id, start_date, end_date))
+                result = cursor.lastrowid
+                return result if result is not None else -1
+        except Exception as e:
+            logging.error(f"Error adding booking: {e}")
+            return -1
+    
+    def count_active_bookings(self, ad_id: int) -> int:
+        """Число ожидающих и подтвержденных бронирований объявления"""
+        with self.pool.read() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT COUNT(*) FROM bookings 
+                WHERE ad_id = ? AND status IN ('pending', 'confirmed')
+            ''', (ad_id,))
+            return cursor.fetchone()[0]
+    
+    def get_user_bookings(self, user_id: int, as_guest: bool = True) -> List[Booking]:
+        """Бронирования пользователя как гостя или как хоста"""
+        # Второй участник бронирования: хост для гостя и гость для хоста
+        own, other = ('guest_id', 'host_id') if as_guest else ('host_id', 'guest_id')
+        try:
+            with self.pool.read() as conn:
+                cursor = conn.cursor()
+                cursor.execute(f'''
+                    SELECT b.*, ca.country, ca.city, ca.settlement, ca.description,
+                           u.first_name, u.last_name, u.username
+                    FROM bookings b
+                    JOIN couchsurfing_ads ca ON b.ad_id = ca.id
+                    JOIN users u ON b.{other} = u.user_id
+                    WHERE b.{own} = ?
+                    ORDER BY b.created_at DESC
+                ''', (user_id,))
+                return Booking.from_cursor(cursor)
+        except Exception as e:
+            logging.error(f"Error getting user bookings: {e}")
+            return []
+    
+    def update_booking_status(self, booking_id: int, status: str) -> bool:
+        """Обновление статуса бронирования"""
+        try:
+            with self.pool.write() as conn:
+                cursor = conn.cursor()
+                cursor.execute('UPDATE bookings SET status = ? WHERE id = ?', (status, booking_id))
+                return cursor.rowcount > 0
+        except Exception as e:
+            logging.error(f"Error updating booking status: {e}")
+            return False
+    
+    def rate_booking_host(self, booking_id: int, rating: float) -> bool:
+        """Учет оценки хоста в рейтинге объявления"""
+        try:
+            with self.pool.write() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    UPDATE couchsurfing_ads 
+                    SET rating = (rating + ?) / 2 
+                    WHERE id = (SELECT ad_id FROM bookings WHERE id = ?)
+                ''', (rating, booking_id))
+                return cursor.rowcount > 0
+        except Exception as e:
+            logging.error(f"Error rating host: {e}")
+            return False
+    
     def add_dice_game(self, game_id: str, player1_id: int, player2_id: int, bet_amount: float) -> bool:
         """Создание новой игры в кости"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.pool.write() as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
                     INSERT INTO dice_games (game_id, player1_id, player2_id, bet_amount)
                     VALUES (?, ?, ?, ?)
                 ''', (game_id, player1_id, player2_id, bet_amount))
-                conn.commit()
                 return True
         except Exception as e:
             logging.error(f"Error adding dice game: {e}")
@@ -307,40 +721,127 @@ class Database:
     def update_dice_game_result(self, game_id: str, player1_dice: int, player2_dice: int, winner_id: int) -> bool:
         """Обновление результата игры в кости"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.pool.write() as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
                     UPDATE dice_games 
                     SET player1_dice = ?, player2_dice = ?, winner_id = ?, status = 'completed'
                     WHERE game_id = ?
                 ''', (player1_dice, player2_dice, winner_id, game_id))
-                conn.commit()
                 return cursor.rowcount > 0
         except Exception as e:
             logging.error(f"Error updating dice game: {e}")
             return False
     
-    def get_daily_stats(self) -> Dict:
-        """Получение статистики за день"""
+    def get_player_dice_games(self, player_id: int, limit: int = 10) -> List[DiceGame]:
+        """Последние игры игрока"""
+        try:
+            with self.pool.read() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT * FROM dice_games 
+                    WHERE player1_id = ? OR player2_id = ?
+                    ORDER BY created_at DESC LIMIT ?
+                ''', (player_id, player_id, limit))
+                return DiceGame.from_cursor(cursor)
+        except Exception as e:
+            logging.error(f"Error getting player games: {e}")
+            return []
+    
+    def get_dice_leaderboard(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """Таблица лидеров по выигрышам"""
+        try:
+            with self.pool.read() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT 
+                        u.user_id,
+                        u.username,
+                        u.first_name,
+                        u.last_name,
+                        COUNT(CASE WHEN dg.winner_id = u.user_id THEN 1 END) as wins,
+                        COUNT(CASE WHEN dg.winner_id != u.user_id AND dg.winner_id IS NOT NULL THEN 1 END) as losses,
+                        SUM(CASE WHEN dg.winner_id = u.user_id THEN dg.bet_amount ELSE 0 END) as total_winnings
+                    FROM users u
+                    LEFT JOIN dice_games dg ON (u.user_id = dg.player1_id OR u.user_id = dg.player2_id)
+                    WHERE dg.status = 'completed'
+                    GROUP BY u.user_id
+                    ORDER BY total_winnings DESC, wins DESC
+                    LIMIT ?
+                ''', (limit,))
+                rows = cursor.fetchall()
+                columns = [description[0] for description in cursor.description]
+                return [dict(zip(columns, row)) for row in rows]
+        except Exception as e:
+            logging.error(f"Error getting dice leaderboard: {e}")
+            return []
+    
+    def get_dice_statistics(self) -> Dict[str, Any]:
+        """Статистика игр в кости"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.pool.read() as conn:
                 cursor = conn.cursor()
+                
+                # Общая статистика
                 cursor.execute('''
                     SELECT 
-                        COUNT(*) as total_users,
-                        SUM(gasjk_balance) as total_balance,
-                        SUM(messages_count) as total_messages,
-                        SUM(nft_count) as total_nfts
-                    FROM users
-                    WHERE DATE(last_activity) = DATE('now')
+                        COUNT(*) as total_games,
+                        COUNT(CASE WHEN status = 'completed' THEN 1 END) as completed_games,
+                        COUNT(CASE WHEN status = 'draw' THEN 1 END) as draw_games,
+                        SUM(bet_amount) as total_bets
+                    FROM dice_games
                 ''')
                 row = cursor.fetchone()
+                
+                # Статистика по дням
+                cursor.execute('''
+                    SELECT 
+                        DATE(created_at) as game_date,
+                        COUNT(*) as games_count,
+                        SUM(bet_amount) as total_bets
+                    FROM dice_games
+                    WHERE created_at >= DATE('now', '-7 days')
+                    GROUP BY DATE(created_at)
+                    ORDER BY game_date DESC
+                ''')
+                daily_stats = cursor.fetchall()
+                
                 return {
-                    'total_users': row[0] or 0,
-                    'total_balance': row[1] or 0,
-                    'total_messages': row[2] or 0,
-                    'total_nfts': row[3] or 0
+                    'total_games': row[0] or 0,
+                    'completed_games': row[1] or 0,
+                    'draw_games': row[2] or 0,
+                    'total_bets': row[3] or 0,
+                    'daily_stats': daily_stats
                 }
+        except Exception as e:
+            logging.error(f"Error getting dice statistics: {e}")
+            return {'total_games': 0, 'completed_games': 0, 'draw_games': 0, 'total_bets': 0, 'daily_stats': []}
+    
+    def get_daily_stats(self) -> Dict[str, Any]:
+        """Счетчики активности за текущий день (одна строка daily_activity)"""
+        day = self.clock.current()[0]['day']
+        stats = {'day': day, 'active_users': 0, 'messages': 0, 'rewards': 0.0, 'nfts': 0}
+        try:
+            with self.pool.read() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT active_users, messages, rewards, nfts FROM daily_activity WHERE day = ?
+                ''', (day,))
+                row = cursor.fetchone()
+            if row:
+                stats.update(active_users=row[0], messages=row[1], rewards=row[2], nfts=row[3])
+            return stats
         except Exception as e:
             logging.error(f"Error getting daily stats: {e}")
-            return {'total_users': 0, 'total_balance': 0, 'total_messages': 0, 'total_nfts': 0} 
\ No newline at end of file
+            return stats
+    
+    def cache_stats(self) -> Optional[Dict[str, Any]]:
+        return self.user_cache.stats()
+    
+    def backup_sources(self) -> List[Tuple[str, ConnectionManager]]:
+        return [('gasjk_bot', self.pool), ('gasjk_archive', self.archive.pool)]
+    
+    def close(self):
+        """Закрытие соединений с базой данных"""
+        self.pool.close()
+        self.archive.close()
@@ -4,8 +4,11 @@ import logging
 from typing import Dict, List, Optional, Tuple
 from datetime import datetime
 
+from storage.models import DiceGame as DiceGameRecord
+from storage.repository import Repository
+
 class DiceGame:
-    def __init__(self, database):
+    def __init__(self, database: Repository):
         self.db = database
         self.active_games = {}  # game_id -> game_data
         self.min_bet = 1.0
@@ -25,7 +28,7 @@ class DiceGame:
             if not player1 or not player2:
                 return None
             
-            if player1['gasjk_balance'] < bet_amount or player2['gasjk_balance'] < bet_amount:
+            if player1.gasjk_balance < bet_amount or player2.gasjk_balance < bet_amount:
                 return None
             
             # Создание уникального ID игры
@@ -173,23 +176,9 @@ class DiceGame:
             logging.error(f"Error getting game status: {e}")
             return None
     
-    def get_player_games(self, player_id: int, limit: int = 10) -> List[Dict]:
+    def get_player_games(self, player_id: int, limit: int = 10) -> List[DiceGameRecord]:
         """Получение игр игрока"""
-        try:
-            # Получение из базы данных
-            with self.db.db_path as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    SELECT * FROM dice_games 
-                    WHERE player1_id = ? OR player2_id = ?
-                    ORDER BY created_at DESC LIMIT ?
-                ''', (player_id, player_id, limit))
-                rows = cursor.fetchall()
-                columns = [description[0] for description in cursor.description]
-                return [dict(zip(columns, row)) for row in rows]
-        except Exception as e:
-            logging.error(f"Error getting player games: {e}")
-            return []
+        return self.db.get_player_dice_games(player_id, limit)
     
     def cancel_game(self, game_id: str, player_id: int) -> bool:
         """Отмена игры (если второй игрок еще не бросил кости)"""
@@ -222,75 +211,8 @@ class DiceGame:
     
     def get_leaderboard(self, limit: int = 10) -> List[Dict]:
         """Получение таблицы лидеров по выигрышам"""
-        try:
-            with self.db.db_path as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    SELECT 
-                        u.user_id,
-                        u.username,
-                        u.first_name,
-                        u.last_name,
-                        COUNT(CASE WHEN dg.winner_id = u.user_id THEN 1 END) as wins,
-                        COUNT(CASE WHEN dg.winner_id != u.user_id AND dg.winner_id IS NOT NULL THEN 1 END) as losses,
-                        SUM(CASE WHEN dg.winner_id = u.user_id THEN dg.bet_amount ELSE 0 END) as total_winnings
-                    FROM users u
-                    LEFT JOIN dice_games dg ON (u.user_id = dg.player1_id OR u.user_id = dg.player2_id)
-                    WHERE dg.status = 'completed'
-                    GROUP BY u.user_id
-                    ORDER BY total_winnings DESC, wins DESC
-                    LIMIT ?
-                ''', (limit,))
-                rows = cursor.fetchall()
-                columns = [description[0] for description in cursor.description]
-                return [dict(zip(columns, row)) for row in rows]
-        except Exception as e:
-            logging.error(f"Error getting leaderboard: {e}")
-            return []
+        return self.db.get_dice_leaderboard(limit)
     
     def get_game_statistics(self) -> Dict:
         """Получение статистики игр"""
-        try:
-            with self.db.db_path as conn:
-                cursor = conn.cursor()
-                
-                # Общая статистика
-                cursor.execute('''
-                    SELECT 
-                        COUNT(*) as total_games,
-                        COUNT(CASE WHEN status = 'completed' THEN 1 END) as completed_games,
-                        COUNT(CASE WHEN status = 'draw' THEN 1 END) as draw_games,
-                        SUM(bet_amount) as total_bets
-                    FROM dice_games
-                ''')
-                row = cursor.fetchone()
-                
-                # Статистика по дням
-                cursor.execute('''
-                    SELECT 
-                        DATE(created_at) as game_date,
-                        COUNT(*) as games_count,
-                        SUM(bet_amount) as total_bets
-                    FROM dice_games
-                    WHERE created_at >= DATE('now', '-7 days')
-                    GROUP BY DATE(created_at)
-                    ORDER BY game_date DESC
-                ''')
-                daily_stats = cursor.fetchall()
-                
-                return {
-                    'total_games': row[0] or 0,
-                    'completed_games': row[1] or 0,
-                    'draw_games': row[2] or 0,
-                    'total_bets': row[3] or 0,
-                    'daily_stats': daily_stats
-                }
-        except Exception as e:
-            logging.error(f"Error getting game statistics: {e}")
-            return {
-                'total_games': 0,
-                'completed_games': 0,
-                'draw_games': 0,
-                'total_bets': 0,
-                'daily_stats': []
-            } 
\ No newline at end of file
+        return self.db.get_dice_statistics()
@@ -10,8 +10,15 @@ from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQu
 from dotenv import load_dotenv
 
 from database.database import Database
+from storage.async_database import AsyncDatabase
+from storage.backup import DatabaseBackup
+from storage.memory import InMemoryRepository
+from storage.timeseries import TimeSeriesStore
+from storage.reward_accumulator import RewardAccumulator
 from ton_integration.ton_wallet import TONWallet
 from utils.message_validator import MessageValidator
+from utils.normalized_message import NormalizedMessage
+from utils.duplicate_detector import DuplicateDetector
 from games.dice_game import DiceGame
 from couchsurfing.couchsurfing_service import CouchsurfingService
 
@@ -28,9 +35,15 @@ logger = logging.getLogger(__name__)
 class GasJKBot:
     def __init__(self):
         # Инициализация компонентов
-        self.db = Database(os.getenv('DATABASE_PATH', './database/gasjk_bot.db'))
+        # Хранилище: SQLite или память процесса (для локальной отладки, данные не сохраняются)
+        if os.getenv('STORAGE_BACKEND', 'sqlite') == 'memory':
+            self.db = InMemoryRepository()
+        else:
+            self.db = Database(os.getenv('DATABASE_PATH', './database/gasjk_bot.db'))
+        self.adb = AsyncDatabase(self.db)
         self.ton_wallet = TONWallet(os.getenv('TON_NETWORK', 'mainnet'))
-        self.message_validator = MessageValidator()
+        self.message_validator = MessageValidator(int(os.getenv('VERDICT_CACHE_SIZE', 4096)),
+                                                  float(os.getenv('VERDICT_CACHE_TTL', 300)))
         self.dice_game = DiceGame(self.db)
         self.couchsurfing = CouchsurfingService(self.db)
         
@@ -39,6 +52,25 @@ class GasJKBot:
         self.admin_id = int(os.getenv('TELEGRAM_ADMIN_ID', 0))
         self.message_reward = float(os.getenv('MESSAGE_REWARD', 0.1))
         self.min_withdrawal = float(os.getenv('MIN_WITHDRAWAL_AMOUNT', 25000))
+        self.reward_flush_interval = int(os.getenv('REWARD_FLUSH_INTERVAL_MS', 500)) / 1000
+        
+        # Награды за сообщения пишутся в базу пакетами
+        self.rewards = RewardAccumulator(self.adb, int(os.getenv('REWARD_FLUSH_MAX_EVENTS', 100)))
+        
+        # Поминутная статистика сообщений, наград и отклоненных валидатором сообщений
+        self.activity = TimeSeriesStore(['messages', 'rewards', 'rejected'],
+                                        os.getenv('ACTIVITY_SERIES_PATH', './database/activity.series'))
+        
+        # Почти повторы недавних сообщений пользователя или чата не награждаются
+        self.duplicates = DuplicateDetector(int(os.getenv('DUPLICATE_USER_WINDOW', 20)),
+                                            int(os.getenv('DUPLICATE_CHAT_WINDOW', 200)),
+                                            ttl=int(os.getenv('DUPLICATE_TTL', 3600)))
+        
+        # Резервные копии баз хранилища (основная база и архив транзакций)
+        backup_dir = os.getenv('BACKUP_DIR', './database/backups')
+        backup_keep = int(os.getenv('BACKUP_KEEP', 7))
+        self.backups = [DatabaseBackup(pool, backup_dir, name, backup_keep)
+                        for name, pool in self.db.backup_sources()]
         
         # Московское время
         self.moscow_tz = pytz.timezone('Europe/Moscow')
@@ -52,7 +84,7 @@ class GasJKBot:
         chat_id = update.effective_chat.id
         
         # Добавление пользователя в базу данных
-        self.db.add_user(
+        await self.adb.add_user(
             user.id, 
             user.username, 
             user.first_name, 
@@ -102,7 +134,7 @@ class GasJKBot:
         chat_type = update.effective_chat.type
         
         # Добавление пользователя в базу данных
-        self.db.add_user(
+        await self.adb.add_user(
             user.id, 
             user.username, 
             user.first_name, 
@@ -121,6 +153,9 @@ class GasJKBot:
         user_id = update.effective_user.id
         message_text = update.message.text
         
+        # Балансы в базе должны учитывать накопленные награды
+        await self.rewards.flush()
+        
         # Проверка состояния пользователя
         user_state = self.user_states.get(user_id, {})
         
@@ -147,34 +182,57 @@ class GasJKBot:
     async def handle_group_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработка сообщений в групповом чате"""
         user = update.effective_user
-        message_text = update.message.text
+        # Текст разбирается один раз для всех проверок
+        message = NormalizedMessage(update.message.text)
+        
+        self.activity.record('messages')
         
         # Валидация сообщения
-        validation_result = self.message_validator.validate_message(message_text, user.id)
+        validation_result = self.message_validator.validate_message(message, user.id)
+        if validation_result['is_valid']:
+            duplicate = self.duplicates.check(user.id, update.effective_chat.id, message.clean_words)
+            if duplicate:
+                validation_result = {
+                    'is_valid': False,
+                    'reason': f'Почти повтор недавнего сообщения ({duplicate})',
+                    'score': 0.0
+                }
         
         if validation_result['is_valid']:
-            # Начисление токенов за осмысленное сообщение
-            self.db.update_user_balance(user.id, self.message_reward)
-            self.db.increment_messages(user.id)
-            
-            # Добавление транзакции
-            self.db.add_transaction(0, user.id, self.message_reward, 'message_reward')
+            # Начисление токенов за осмысленное сообщение (баланс, счетчик и транзакция пишутся пакетом)
+            balance = await self.rewards.add_reward(user.id, self.message_reward)
+            self.activity.record('rewards', self.message_reward)
             
             # Уведомление пользователя (только если это не спам)
             if validation_result['score'] > 0.5:
                 await update.message.reply_text(
                     f"✅ +{self.message_reward} $gasJK за осмысленное сообщение! "
-                    f"Баланс: {self.db.get_user(user.id)['gasjk_balance']:.1f} $gasJK"
+                    f"Баланс: {balance:.1f} $gasJK"
                 )
         else:
             # Сообщение не прошло валидацию
+            self.activity.record('rejected')
             logger.info(f"Message from {user.id} didn't pass validation: {validation_result['reason']}")
     
+    async def activity_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Команда /activity: графики активности для администратора"""
+        if not self.admin_id or update.effective_user.id != self.admin_id:
+            return
+        summary = self.activity.summary({'messages': '💬 Сообщения', 'rewards': '💰 Награды $gasJK',
+                                         'rejected': '🚫 Отклонено валидатором'})
+        cache = self.message_validator.verdicts.stats()
+        await update.message.reply_text(f"📈 Активность\n\n{summary}\n\n"
+                                        f"🗃 Кэш валидатора: {cache['hits']} попаданий, {cache['misses']} промахов "
+                                        f"({cache['hit_rate']:.0%})")
+    
     async def handle_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработка callback кнопок"""
         query = update.callback_query
         await query.answer()
         
+        # Балансы в базе должны учитывать накопленные награды
+        await self.rewards.flush()
+        
         data = query.data
         
         if data == "balance":
@@ -203,12 +261,12 @@ class GasJKBot:
     async def show_balance(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Показать баланс пользователя"""
         user_id = update.callback_query.from_user.id
-        user = self.db.get_user(user_id)
+        user = await self.adb.get_user(user_id)
         
         if user:
-            balance = user['gasjk_balance']
-            messages_count = user['messages_count']
-            nft_count = user['nft_count']
+            balance = user.gasjk_balance
+            messages_count = user.messages_count
+            nft_count = user.nft_count
             
             text = f"💰 Ваш баланс: {balance:.1f} $gasJK\n\n"
             text += f"📊 Статистика:\n"
@@ -259,12 +317,12 @@ class GasJKBot:
     async def show_nfts(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Показать NFT пользователя"""
         user_id = update.callback_query.from_user.id
-        nfts = self.db.get_user_nfts(user_id)
+        nfts = await self.adb.get_user_nfts(user_id)
         
         if nfts:
             text = "🖼️ Ваши NFT:\n\n"
             for nft in nfts:
-                text += f"• {nft['collection_name']} #{nft['token_id']}\n"
+                text += f"• {nft.collection_name} #{nft.token_id}\n"
         else:
             text = "🖼️ У вас пока нет NFT"
         
@@ -276,20 +334,20 @@ class GasJKBot:
     async def show_stats(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Показать статистику"""
         user_id = update.callback_query.from_user.id
-        user = self.db.get_user(user_id)
-        transactions = self.db.get_user_transactions(user_id, 5)
+        user = await self.adb.get_user(user_id)
+        transactions = await self.adb.get_user_transactions(user_id, 5)
         
         text = "📊 Ваша статистика:\n\n"
-        text += f"💰 Баланс: {user['gasjk_balance']:.1f} $gasJK\n"
-        text += f"💬 Сообщений: {user['messages_count']}\n"
-        text += f"🖼️ NFT: {user['nft_count']}\n"
-        text += f"📅 Регистрация: {user['registration_date']}\n\n"
+        text += f"💰 Баланс: {user.gasjk_balance:.1f} $gasJK\n"
+        text += f"💬 Сообщений: {user.messages_count}\n"
+        text += f"🖼️ NFT: {user.nft_count}\n"
+        text += f"📅 Регистрация: {user.registration_date}\n\n"
         
         if transactions:
             text += "📈 Последние транзакции:\n"
             for tx in transactions[:3]:
-                amount = tx['amount']
-                if tx['from_user_id'] == user_id:
+                amount = tx.amount
+                if tx.from_user_id == user_id:
                     text += f"➖ {amount:.1f} $gasJK\n"
                 else:
                     text += f"➕ {amount:.1f} $gasJK\n"
@@ -302,9 +360,9 @@ class GasJKBot:
     async def start_send_gasjk(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Начать процесс отправки $gasJK"""
         user_id = update.callback_query.from_user.id
-        user = self.db.get_user(user_id)
+        user = await self.adb.get_user(user_id)
         
-        if user['gasjk_balance'] <= 0:
+        if user.gasjk_balance <= 0:
             await update.callback_query.edit_message_text(
                 "❌ Недостаточно $gasJK для отправки",
                 reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Назад", callback_data="back_to_main")]])
@@ -318,7 +376,7 @@ class GasJKBot:
         }
         
         await update.callback_query.edit_message_text(
-            f"💸 Отправка $gasJK\n\nВаш баланс: {user['gasjk_balance']:.1f} $gasJK\n\n"
+            f"💸 Отправка $gasJK\n\nВаш баланс: {user.gasjk_balance:.1f} $gasJK\n\n"
             f"Введите сумму для отправки:",
             reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Отмена", callback_data="back_to_main")]])
         )
@@ -328,13 +386,13 @@ class GasJKBot:
         user_id = update.effective_user.id
         try:
             amount = float(update.message.text)
-            user = self.db.get_user(user_id)
+            user = await self.adb.get_user(user_id)
             
             if amount <= 0:
                 await update.message.reply_text("❌ Сумма должна быть больше 0")
                 return
             
-            if amount > user['gasjk_balance']:
+            if amount > user.gasjk_balance:
                 await update.message.reply_text("❌ Недостаточно средств")
                 return
             
@@ -358,9 +416,7 @@ class GasJKBot:
         recipient_username = update.message.text.strip()
         
         # Поиск пользователя по username
-        # В реальном проекте нужно добавить метод поиска по username в базу данных
-        # Пока используем заглушку
-        recipient_id = None  # Здесь должна быть логика поиска
+        recipient_id = await self.adb.get_user_id_by_username(recipient_username.lstrip('@'))
         
         if not recipient_id:
             await update.message.reply_text("❌ Пользователь не найден")
@@ -370,16 +426,17 @@ class GasJKBot:
         state_data = self.user_states[user_id]['data']
         amount = state_data['amount']
         
-        # Списывание с отправителя
-        self.db.update_user_balance(user_id, -amount)
-        # Начисление получателю
-        self.db.update_user_balance(recipient_id, amount)
-        # Запись транзакции
-        self.db.add_transaction(user_id, recipient_id, amount, 'transfer')
+        # Списание, начисление и запись транзакции одной транзакцией базы
+        balances = await self.adb.transfer(user_id, recipient_id, amount)
         
         # Очистка состояния
         del self.user_states[user_id]
         
+        if balances is None:
+            await update.message.reply_text("❌ Перевод не выполнен: недостаточно средств")
+            await self.show_main_menu(update, context)
+            return
+        
         await update.message.reply_text(
             f"✅ Успешно отправлено {amount:.1f} $gasJK пользователю @{recipient_username}"
         )
@@ -388,12 +445,12 @@ class GasJKBot:
     async def show_receive_gasjk(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Показать информацию о получении $gasJK"""
         user_id = update.callback_query.from_user.id
-        user = self.db.get_user(user_id)
+        user = await self.adb.get_user(user_id)
         
         text = "📥 Получение $gasJK\n\n"
-        text += f"Ваш username: @{user.get('username', 'не указан')}\n\n"
+        text += f"Ваш username: @{user.username or 'не указан'}\n\n"
         text += "Другие пользователи могут отправить вам $gasJK, используя ваш username.\n\n"
-        text += f"Текущий баланс: {user['gasjk_balance']:.1f} $gasJK"
+        text += f"Текущий баланс: {user.gasjk_balance:.1f} $gasJK"
         
         keyboard = [[InlineKeyboardButton("🔙 Назад", callback_data="back_to_main")]]
         reply_markup = InlineKeyboardMarkup(keyboard)
@@ -459,9 +516,9 @@ class GasJKBot:
     async def start_dice_game(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Начать создание игры в кости"""
         user_id = update.callback_query.from_user.id
-        user = self.db.get_user(user_id)
+        user = await self.adb.get_user(user_id)
         
-        if user['gasjk_balance'] < self.dice_game.min_bet:
+        if user.gasjk_balance < self.dice_game.min_bet:
             await update.callback_query.edit_message_text(
                 f"❌ Недостаточно $gasJK для игры. Минимум: {self.dice_game.min_bet} $gasJK",
                 reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Назад", callback_data="dice_game")]])
@@ -476,7 +533,7 @@ class GasJKBot:
         
         await update.callback_query.edit_message_text(
             f"🎲 Создание игры в кости\n\n"
-            f"Ваш баланс: {user['gasjk_balance']:.1f} $gasJK\n"
+            f"Ваш баланс: {user.gasjk_balance:.1f} $gasJK\n"
             f"Минимальная ставка: {self.dice_game.min_bet} $gasJK\n"
             f"Максимальная ставка: {self.dice_game.max_bet} $gasJK\n\n"
             f"Введите сумму ставки:",
@@ -488,7 +545,7 @@ class GasJKBot:
         user_id = update.effective_user.id
         try:
             bet_amount = float(update.message.text)
-            user = self.db.get_user(user_id)
+            user = await self.adb.get_user(user_id)
             
             if not self.dice_game.min_bet <= bet_amount <= self.dice_game.max_bet:
                 await update.message.reply_text(
@@ -496,7 +553,7 @@ class GasJKBot:
                 )
                 return
             
-            if bet_amount > user['gasjk_balance']:
+            if bet_amount > user.gasjk_balance:
                 await update.message.reply_text("❌ Недостаточно средств")
                 return
             
@@ -534,7 +591,7 @@ class GasJKBot:
         state_data = self.user_states[user_id]['data']
         bet_amount = state_data['bet_amount']
         
-        game_id = self.dice_game.create_game(user_id, opponent_id, bet_amount)
+        game_id = await self.adb.run(self.dice_game.create_game, user_id, opponent_id, bet_amount)
         
         if game_id:
             # Очистка состояния
@@ -555,7 +612,7 @@ class GasJKBot:
     async def show_my_dice_games(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Показать игры пользователя в кости"""
         user_id = update.callback_query.from_user.id
-        games = self.dice_game.get_player_games(user_id, 5)
+        games = await self.adb.run(self.dice_game.get_player_games, user_id, 5)
         
         if games:
             text = "🎲 Ваши последние игры:\n\n"
@@ -573,7 +630,7 @@ class GasJKBot:
     
     async def show_dice_leaderboard(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Показать таблицу лидеров игры в кости"""
-        leaderboard = self.dice_game.get_leaderboard(10)
+        leaderboard = await self.adb.run(self.dice_game.get_leaderboard, 10)
         
         if leaderboard:
             text = "🏆 Таблица лидеров (игра в кости):\n\n"
@@ -658,7 +715,8 @@ class GasJKBot:
         city = state_data['city']
         
         # Создание объявления (упрощенная версия без дат)
-        ad_id = self.couchsurfing.create_ad(
+        ad_id = await self.adb.run(
+            self.couchsurfing.create_ad,
             user_id, country, city, "", "2024-01-01", "2024-12-31", description
         )
         
@@ -680,15 +738,15 @@ class GasJKBot:
     
     async def show_available_ads(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Показать доступные объявления"""
-        ads = self.couchsurfing.get_ads()
+        ads = await self.adb.run(self.couchsurfing.get_ads)
         
         if ads:
             text = "🏠 Доступные объявления:\n\n"
             for ad in ads[:5]:  # Показываем первые 5
-                text += f"📍 {ad['country']}, {ad['city']}\n"
-                text += f"👤 {ad.get('host_name', 'Не указано')}\n"
-                text += f"⭐ Рейтинг: {ad.get('rating', 0):.1f}\n"
-                text += f"📝 {ad['description'][:100]}...\n\n"
+                text += f"📍 {ad.country}, {ad.city}\n"
+                text += f"👤 {ad.host_name or 'Не указано'}\n"
+                text += f"⭐ Рейтинг: {ad.rating or 0:.1f}\n"
+                text += f"📝 {ad.description[:100]}...\n\n"
         else:
             text = "🏠 Пока нет доступных объявлений"
         
@@ -699,15 +757,15 @@ class GasJKBot:
     
     async def show_ads_board(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Показать доску объявлений"""
-        ads = self.couchsurfing.get_ads()
+        ads = await self.adb.run(self.couchsurfing.get_ads)
         
         if ads:
             text = "📋 Доска объявлений:\n\n"
             for ad in ads[:10]:  # Показываем первые 10
-                text += f"🏠 {ad['country']}, {ad['city']}\n"
-                text += f"👤 @{ad.get('host_username', 'не указан')}\n"
-                text += f"⭐ {ad.get('rating', 0):.1f}/5.0\n"
-                text += f"📅 {ad['start_date']} - {ad['end_date']}\n\n"
+                text += f"🏠 {ad.country}, {ad.city}\n"
+                text += f"👤 @{ad.host_username or 'не указан'}\n"
+                text += f"⭐ {ad.rating or 0:.1f}/5.0\n"
+                text += f"📅 {ad.start_date} - {ad.end_date}\n\n"
         else:
             text = "📋 Пока нет объявлений"
         
@@ -719,21 +777,21 @@ class GasJKBot:
     async def show_my_bookings(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Показать бронирования пользователя"""
         user_id = update.callback_query.from_user.id
-        bookings_as_guest = self.couchsurfing.get_user_bookings(user_id, as_guest=True)
-        bookings_as_host = self.couchsurfing.get_user_bookings(user_id, as_guest=False)
+        bookings_as_guest = await self.adb.run(self.couchsurfing.get_user_bookings, user_id, as_guest=True)
+        bookings_as_host = await self.adb.run(self.couchsurfing.get_user_bookings, user_id, as_guest=False)
         
         text = "📋 Мои бронирования:\n\n"
         
         if bookings_as_guest:
             text += "🏃 Как гость:\n"
             for booking in bookings_as_guest[:3]:
-                text += f"• {booking['country']}, {booking['city']} - {booking['status']}\n"
+                text += f"• {booking.country}, {booking.city} - {booking.status}\n"
             text += "\n"
         
         if bookings_as_host:
             text += "🏠 Как хост:\n"
             for booking in bookings_as_host[:3]:
-                text += f"• {booking['country']}, {booking['city']} - {booking['status']}\n"
+                text += f"• {booking.country}, {booking.city} - {booking.status}\n"
         
         if not bookings_as_guest and not bookings_as_host:
             text += "У вас пока нет бронирований"
@@ -748,13 +806,21 @@ class GasJKBot:
         if not self.admin_id:
             return
         
-        stats = self.db.get_daily_stats()
+        # Награды из буфера попадают в счетчики дня только после записи
+        await self.rewards.flush()
+        stats = await self.adb.get_daily_stats()
         
         text = "📊 Ежедневный отчет\n\n"
-        text += f"👥 Активных пользователей: {stats['total_users']}\n"
-        text += f"💰 Общий баланс: {stats['total_balance']:.1f} $gasJK\n"
-        text += f"💬 Сообщений: {stats['total_messages']}\n"
-        text += f"🖼️ NFT: {stats['total_nfts']}\n\n"
+        text += f"👥 Активных пользователей: {stats['active_users']}\n"
+        text += f"💰 Начислено наград: {stats['rewards']:.1f} $gasJK\n"
+        text += f"💬 Сообщений: {stats['messages']}\n"
+        text += f"🖼️ Новых NFT: {stats['nfts']}\n"
+        cache = self.db.cache_stats()
+        if cache:
+            text += f"🗃 Кэш пользователей: {cache['hits']} попаданий, {cache['misses']} промахов ({cache['hit_rate']:.0%})\n"
+        verdicts = self.message_validator.verdicts.stats()
+        text += f"🛡 Кэш валидатора: {verdicts['hits']} попаданий, {verdicts['misses']} промахов ({verdicts['hit_rate']:.0%})\n"
+        text += "\n"
         text += f"📅 {datetime.now(self.moscow_tz).strftime('%d.%m.%Y')}"
         
         await context.bot.send_message(chat_id=self.admin_id, text=text)
@@ -773,6 +839,29 @@ class GasJKBot:
         
         await context.bot.send_message(chat_id=self.admin_id, text=text)
     
+    async def backup_databases(self, context: ContextTypes.DEFAULT_TYPE):
+        """Резервное копирование баз без остановки бота"""
+        for backup in self.backups:
+            try:
+                result = await self.adb.run(backup.run, timeout=None)
+                logger.info(f"Backup {result.path} done in {result.seconds:.1f}s, "
+                            f"{result.size / 1024 / 1024:.1f} MB, removed {len(result.removed)} old snapshots")
+            except Exception as e:
+                logger.error(f"Backup of {backup.name} failed: {e}")
+    
+    async def archive_transactions(self, context: ContextTypes.DEFAULT_TYPE):
+        """Перенос транзакций прошлых месяцев в архив"""
+        await self.rewards.flush()
+        archived = await self.adb.archive_transactions(timeout=None)
+        if archived:
+            logger.info(f"Moved {archived} old transactions to the archive")
+    
+    async def shutdown(self, application: Application):
+        """Запись накопленных наград и статистики активности, закрытие соединений с базой данных"""
+        await self.rewards.flush()
+        await asyncio.get_running_loop().run_in_executor(None, self.activity.save)
+        await self.adb.close()
+    
     def run(self):
         """Запуск бота"""
         if not self.bot_token:
@@ -780,10 +869,11 @@ class GasJKBot:
             return
         
         # Создание приложения
-        application = Application.builder().token(self.bot_token).build()
+        application = Application.builder().token(self.bot_token).post_shutdown(self.shutdown).build()
         
         # Добавление обработчиков
         application.add_handler(CommandHandler("start", self.start))
+        application.add_handler(CommandHandler("activity", self.activity_command))
         application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, self.handle_message))
         application.add_handler(CallbackQueryHandler(self.handle_callback))
         
@@ -798,6 +888,17 @@ class GasJKBot:
         course_time = time(8, 0, tzinfo=self.moscow_tz)
         job_queue.run_daily(self.send_course_update, course_time)
         
+        # Архивирование транзакций прошлых месяцев в 4:00 по МСК
+        archive_time = time(4, 0, tzinfo=self.moscow_tz)
+        job_queue.run_daily(self.archive_transactions, archive_time)
+        
+        # Резервное копирование в 3:00 по МСК (до архивирования)
+        backup_time = time(int(os.getenv('BACKUP_HOUR', 3)), 0, tzinfo=self.moscow_tz)
+        job_queue.run_daily(self.backup_databases, backup_time)
+        
+        # Пакетная запись наград за сообщения
+        job_queue.run_repeating(self.rewards.flush, interval=self.reward_flush_interval)
+        
         # Запуск бота
         logger.info("Starting GasJK Bot...")
         application.run_polling()
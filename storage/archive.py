@@ -0,0 +1,106 @@
+import json
+import zlib
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from storage.connection import ConnectionManager
+from storage.migrations import Migration, apply_migrations
+
+ARCHIVE_MIGRATIONS = [
+    Migration(1, 'Сегменты архива транзакций', [
+        # Один сжатый сегмент на пользователя и месяц: строки, где он отправитель или получатель
+        '''
+            CREATE TABLE IF NOT EXISTS transaction_segments (
+                user_id INTEGER NOT NULL,
+                month TEXT NOT NULL,
+                row_count INTEGER NOT NULL,
+                payload BLOB NOT NULL,
+                PRIMARY KEY (user_id, month)
+            ) WITHOUT ROWID
+        ''',
+    ]),
+]
+
+
+# Сегмент строк, в которых нет ни одного участника-пользователя (например,
+# системная операция без получателя): такие строки тоже удаляются из основной базы
+SYSTEM_SEGMENT = -1
+
+
+def _encode(rows: List[Sequence[Any]]) -> bytes:
+    return zlib.compress(json.dumps(rows, ensure_ascii=False, separators=(',', ':')).encode('utf-8'), 9)
+
+
+def _decode(payload: bytes) -> List[List[Any]]:
+    return json.loads(zlib.decompress(payload).decode('utf-8'))
+
+
+class TransactionArchive:
+    """Холодный архив транзакций по месяцам в отдельном файле SQLite
+
+    Строки хранятся сжатыми сегментами (пользователь, месяц), поэтому история
+    одного пользователя читается по первичному ключу без просмотра чужих данных.
+    Первый столбец строки - id транзакции: повторная запись того же месяца
+    объединяет сегменты без дублей, так что архивирование можно повторять.
+    Строки без участников (только skip_user_id или NULL) попадают в сегмент
+    SYSTEM_SEGMENT, чтобы ни одна удаляемая из основной базы строка не терялась.
+    """
+
+    def __init__(self, path: str, id_index: int = 0, from_index: int = 1, to_index: int = 2,
+                 created_at_index: int = 6, skip_user_id: Optional[int] = None):
+        self.path = path
+        self.id_index = id_index
+        self.participants = (from_index, to_index)
+        self.created_at_index = created_at_index
+        self.skip_user_id = skip_user_id
+        self.pool = ConnectionManager(path)
+        apply_migrations(self.pool, ARCHIVE_MIGRATIONS)
+
+    def store(self, month: str, rows: Iterable[Sequence[Any]]) -> int:
+        """Добавление строк месяца в сегменты участников, возвращает число сегментов"""
+        by_user: Dict[int, List[Sequence[Any]]] = {}
+        for row in rows:
+            owners = {row[i] for i in self.participants} - {None, self.skip_user_id}
+            for user_id in owners or (SYSTEM_SEGMENT,):
+                by_user.setdefault(user_id, []).append(list(row))
+
+        with self.pool.write() as conn:
+            conn.execute('BEGIN')
+            for user_id, user_rows in by_user.items():
+                existing = conn.execute(
+                    'SELECT payload FROM transaction_segments WHERE user_id = ? AND month = ?',
+                    (user_id, month)
+                ).fetchone()
+                merged = {row[self.id_index]: row for row in (_decode(existing[0]) if existing else [])}
+                merged.update((row[self.id_index], row) for row in user_rows)
+                segment = sorted(merged.values(), key=lambda r: (r[self.created_at_index], r[self.id_index]),
+                                 reverse=True)
+                conn.execute('''
+                    INSERT OR REPLACE INTO transaction_segments (user_id, month, row_count, payload)
+                    VALUES (?, ?, ?, ?)
+                ''', (user_id, month, len(segment), _encode(segment)))
+        return len(by_user)
+
+    def user_history(self, user_id: int, limit: int) -> List[List[Any]]:
+        """Последние limit архивных строк пользователя, от новых к старым"""
+        result: List[List[Any]] = []
+        if limit <= 0:
+            return result
+        with self.pool.read() as conn:
+            cursor = conn.execute('''
+                SELECT payload FROM transaction_segments
+                WHERE user_id = ?
+                ORDER BY month DESC
+            ''', (user_id,))
+            for (payload,) in cursor:
+                result.extend(_decode(payload))
+                if len(result) >= limit:
+                    break
+        return result[:limit]
+
+    def months(self) -> List[str]:
+        """Месяцы, присутствующие в архиве"""
+        with self.pool.read() as conn:
+            return [row[0] for row in conn.execute('SELECT DISTINCT month FROM transaction_segments ORDER BY month')]
+
+    def close(self):
+        self.pool.close()
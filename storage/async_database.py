@@ -0,0 +1,76 @@
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+# Таймаут запроса к базе по умолчанию (секунды), только для чтения
+DEFAULT_TIMEOUT = 10.0
+
+# Методы Database с этими префиксами только читают данные
+_READ_PREFIXES = ('get_', 'is_', 'count_', 'search_')
+
+_USE_DEFAULT = object()
+
+
+class AsyncDatabase:
+    """Неблокирующая обертка над Database
+
+    Повторяет API исходного класса: любой публичный метод можно вызвать как
+    `await adb.get_user(user_id)`. Запросы выполняются в отдельном пуле потоков,
+    поэтому медленный fsync не останавливает обработку обновлений.
+
+    Каждый вызов принимает необязательный аргумент `timeout` (None - без
+    ограничения). При отмене или таймауте задача, еще не взятая в работу,
+    снимается с очереди; уже выполняющийся запрос доходит до конца, а его
+    результат отбрасывается. Для записи это значит, что после TimeoutError
+    транзакция все равно может быть зафиксирована, и повтор записи ее
+    продублирует. Поэтому таймаут по умолчанию применяется только к методам
+    чтения (get_*, is_*, count_*, search_*); записи и run() по умолчанию ждут
+    завершения.
+    """
+
+    def __init__(self, db, max_workers: int = 4, timeout: Optional[float] = DEFAULT_TIMEOUT):
+        self.db = db
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='db')
+
+    async def run(self, func: Callable[..., Any], *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """Выполнение произвольной блокирующей функции в пуле базы данных
+
+        timeout стоит задавать только для функций, которые ничего не пишут:
+        по таймауту вызов не прерывается, отбрасывается лишь его результат.
+        """
+        future = self._executor.submit(functools.partial(func, *args, **kwargs))
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            future.cancel()
+            logging.warning(f"Database call {getattr(func, '__name__', func)} timed out after {timeout}s")
+            raise
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+
+    def __getattr__(self, name: str):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        method = getattr(self.db, name)
+        if not callable(method):
+            raise AttributeError(name)
+
+        default_timeout = self.timeout if name.startswith(_READ_PREFIXES) else None
+
+        @functools.wraps(method)
+        async def wrapper(*args, timeout: Any = _USE_DEFAULT, **kwargs):
+            if timeout is _USE_DEFAULT:
+                timeout = default_timeout
+            return await self.run(method, *args, timeout=timeout, **kwargs)
+
+        return wrapper
+
+    async def close(self):
+        """Дождаться завершения запросов и закрыть соединения"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, functools.partial(self._executor.shutdown, wait=True))
+        self.db.close()
@@ -0,0 +1,103 @@
+import datetime
+import glob
+import logging
+import os
+import sqlite3
+import time
+from typing import List
+
+
+class BackupResult:
+    """Итог резервного копирования: файл снимка, размер, длительность и число страниц"""
+
+    __slots__ = ('path', 'size', 'seconds', 'pages', 'removed')
+
+    def __init__(self, path: str, size: int, seconds: float, pages: int, removed: List[str]):
+        self.path = path
+        self.size = size
+        self.seconds = seconds
+        self.pages = pages
+        self.removed = removed
+
+    def __repr__(self):
+        return (f"BackupResult({self.path!r}, size={self.size}, seconds={self.seconds:.2f}, "
+                f"pages={self.pages}, removed={len(self.removed)})")
+
+
+class DatabaseBackup:
+    """Онлайн-копирование базы через sqlite3 backup API с ротацией снимков
+
+    Копирование идет порциями по pages страниц, между порциями поток засыпает
+    на pause секунд, поэтому бот продолжает обрабатывать сообщения. Источник
+    держит одну читающую транзакцию на все копирование: в режиме WAL она не
+    мешает записи, а снимок получается согласованным и не начинается заново
+    при каждой записи. Снимок пишется во временный файл и переименовывается
+    только после успешного завершения; хранятся последние keep снимков.
+    """
+
+    def __init__(self, pool, directory: str, name: str, keep: int = 7,
+                 pages: int = 256, pause: float = 0.005):
+        if keep < 1:
+            raise ValueError("At least one backup must be kept")
+        self.pool = pool
+        self.directory = directory
+        self.name = name
+        self.keep = keep
+        self.pages = pages
+        self.pause = pause
+
+    def snapshots(self) -> List[str]:
+        """Существующие снимки, от старых к новым"""
+        return sorted(glob.glob(os.path.join(self.directory, f'{self.name}-*.db')))
+
+    def run(self) -> BackupResult:
+        """Создание снимка и удаление лишних старых снимков (блокирующий вызов)"""
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = datetime.datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+        path = os.path.join(self.directory, f'{self.name}-{stamp}.db')
+        tmp_path = path + '.tmp'
+
+        started = time.perf_counter()
+        pages = 0
+
+        def progress(status, remaining, total):
+            nonlocal pages
+            pages = total
+            if remaining and self.pause:
+                time.sleep(self.pause)
+
+        target = sqlite3.connect(tmp_path)
+        try:
+            if self.pool.in_memory:
+                # База в памяти доступна только через соединение писателя
+                with self.pool.write() as source:
+                    source.backup(target, pages=self.pages, progress=progress)
+            else:
+                source = sqlite3.connect(self.pool.db_path)
+                try:
+                    source.execute('BEGIN')
+                    source.execute('SELECT 1 FROM sqlite_master LIMIT 1').fetchall()
+                    source.backup(target, pages=self.pages, progress=progress)
+                finally:
+                    source.close()
+            # Снимок - самостоятельный файл без -wal
+            target.execute('PRAGMA journal_mode = DELETE')
+        except Exception:
+            target.close()
+            os.remove(tmp_path)
+            raise
+        target.close()
+        os.replace(tmp_path, path)
+
+        removed = self.rotate()
+        return BackupResult(path, os.path.getsize(path), time.perf_counter() - started, pages, removed)
+
+    def rotate(self) -> List[str]:
+        """Удаление снимков сверх keep, возвращает удаленные пути"""
+        removed = self.snapshots()[:-self.keep]
+        for path in removed:
+            try:
+                os.remove(path)
+            except OSError as e:
+                logging.error(f"Failed to remove old backup {path}: {e}")
+        return removed
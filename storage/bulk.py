@@ -0,0 +1,233 @@
+import base64
+import csv
+import json
+import os
+import sqlite3
+import time
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+
+from storage.migrations import get_schema_version
+
+FORMATS = ('jsonl', 'csv')
+MANIFEST = 'manifest.json'
+
+# Значение NULL в CSV (как в COPY PostgreSQL), чтобы отличать его от пустой строки
+CSV_NULL = '\\N'
+
+# Значение BLOB в JSONL: объект {"$base64": "..."}; в CSV BLOB пишется строкой
+# base64 и восстанавливается по объявленному типу столбца
+BLOB_MARKER = '$base64'
+
+# Вызывается с (таблица, строк обработано, секунд прошло, завершено ли)
+Progress = Callable[[str, int, float, bool], None]
+
+
+def list_tables(conn: sqlite3.Connection) -> List[str]:
+    """Пользовательские таблицы базы в порядке создания"""
+    return [row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY rowid"
+    )]
+
+
+def _table_path(directory: str, table: str, fmt: str) -> str:
+    return os.path.join(directory, f'{table}.{fmt}')
+
+
+def _report(progress: Optional[Progress], table: str, count: int, started: float,
+            every: int, done: bool = False):
+    if progress is not None and (done or count % every == 0):
+        progress(table, count, time.perf_counter() - started, done)
+
+
+def _to_json(value: Any) -> Any:
+    if isinstance(value, bytes):
+        return {BLOB_MARKER: base64.b64encode(value).decode('ascii')}
+    return value
+
+
+def _from_json(value: Any) -> Any:
+    if isinstance(value, dict) and BLOB_MARKER in value:
+        return base64.b64decode(value[BLOB_MARKER])
+    return value
+
+
+def _to_csv(value: Any) -> Any:
+    if value is None:
+        return CSV_NULL
+    if isinstance(value, bytes):
+        return base64.b64encode(value).decode('ascii')
+    return value
+
+
+def _number(value: str) -> Any:
+    for parse in (int, float):
+        try:
+            return parse(value)
+        except ValueError:
+            pass
+    return value
+
+
+def _real(value: str) -> Any:
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+def _csv_parser(declared: str) -> Optional[Callable[[str], Any]]:
+    """Преобразование строки CSV к объявленному типу столбца (правила родства типов SQLite)
+
+    Столбцы без объявленного типа остаются строками: в CSV тип значения не сохраняется.
+    """
+    declared = declared.upper()
+    if 'INT' in declared:
+        return _number
+    if any(name in declared for name in ('CHAR', 'CLOB', 'TEXT')) or not declared:
+        return None
+    if 'BLOB' in declared:
+        return base64.b64decode
+    if any(name in declared for name in ('REAL', 'FLOA', 'DOUB')):
+        return _real
+    return _number
+
+
+def _write_rows(path: str, fmt: str, columns: Sequence[str], rows: Iterable[Sequence[Any]],
+                on_row: Callable[[], None]):
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        if fmt == 'csv':
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            for row in rows:
+                writer.writerow([_to_csv(value) for value in row])
+                on_row()
+        else:
+            for row in rows:
+                record = {column: _to_json(value) for column, value in zip(columns, row)}
+                f.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')))
+                f.write('\n')
+                on_row()
+
+
+def _read_rows(path: str, fmt: str, columns: Sequence[str],
+               types: Optional[Sequence[str]] = None) -> Iterator[List[Any]]:
+    with open(path, encoding='utf-8', newline='') as f:
+        if fmt == 'csv':
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if header is not None and list(header) != list(columns):
+                raise ValueError(f"CSV header of {path} does not match manifest columns")
+            # Выгрузки без типов в манифесте загружаются строками, как раньше
+            parsers = [_csv_parser(declared) for declared in types] if types else [None] * len(columns)
+            for row in reader:
+                yield [None if value == CSV_NULL else parse(value) if parse else value
+                       for value, parse in zip(row, parsers)]
+        else:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    yield [_from_json(record.get(column)) for column in columns]
+
+
+def export_database(pool, directory: str, fmt: str = 'jsonl', tables: Optional[Sequence[str]] = None,
+                    progress: Optional[Progress] = None, progress_every: int = 50000) -> Dict[str, int]:
+    """Потоковая выгрузка таблиц в файлы <таблица>.<формат> и manifest.json
+
+    Строки читаются итерацией по курсору, без fetchall(), поэтому память не
+    зависит от размера таблицы. В манифест записываются столбцы с объявленными
+    типами, схема таблиц с индексами и версия миграций, чтобы импорт мог создать
+    пустую базу и вернуть значениям CSV их типы.
+    Возвращает число выгруженных строк по таблицам.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format: {fmt}")
+    os.makedirs(directory, exist_ok=True)
+    manifest: Dict[str, Any] = {'format': fmt, 'tables': {}}
+    counts: Dict[str, int] = {}
+
+    with pool.read() as conn:
+        manifest['user_version'] = get_schema_version(conn)
+        existing = list_tables(conn)
+        for table in tables or existing:
+            if table not in existing:
+                raise ValueError(f"Unknown table: {table}")
+            schema = [row[0] for row in conn.execute(
+                "SELECT sql FROM sqlite_master WHERE tbl_name = ? AND sql IS NOT NULL ORDER BY type DESC, rowid",
+                (table,)
+            )]
+            declared = {row[1]: row[2] for row in conn.execute(f'PRAGMA table_info("{table}")')}
+            cursor = conn.execute(f'SELECT * FROM "{table}"')
+            columns = [d[0] for d in cursor.description]
+
+            count = 0
+            started = time.perf_counter()
+
+            def on_row():
+                nonlocal count
+                count += 1
+                _report(progress, table, count, started, progress_every)
+
+            _write_rows(_table_path(directory, table, fmt), fmt, columns, cursor, on_row)
+            _report(progress, table, count, started, progress_every, done=True)
+            counts[table] = count
+            manifest['tables'][table] = {'columns': columns, 'types': [declared.get(c, '') for c in columns],
+                                         'rows': count, 'schema': schema}
+
+    with open(os.path.join(directory, MANIFEST), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return counts
+
+
+def import_database(pool, directory: str, tables: Optional[Sequence[str]] = None, batch_size: int = 10000,
+                    replace: bool = False, progress: Optional[Progress] = None,
+                    progress_every: int = 50000) -> Dict[str, int]:
+    """Загрузка выгрузки export_database() в базу
+
+    Каждая таблица загружается одной транзакцией пакетами executemany по
+    batch_size строк. Отсутствующие таблицы создаются по схеме из манифеста,
+    а в пустой базе выставляется версия миграций источника. При replace
+    строки с совпадающим ключом заменяются, иначе конфликт прерывает импорт
+    таблицы. Возвращает число загруженных строк по таблицам.
+    """
+    with open(os.path.join(directory, MANIFEST), encoding='utf-8') as f:
+        manifest = json.load(f)
+    fmt = manifest['format']
+    verb = 'INSERT OR REPLACE' if replace else 'INSERT'
+    counts: Dict[str, int] = {}
+
+    with pool.write() as conn:
+        existing = list_tables(conn)
+        fresh = get_schema_version(conn) == 0 and not existing
+        for table in tables or manifest['tables']:
+            if table not in manifest['tables']:
+                raise ValueError(f"Table {table} is not in the export")
+            if table not in existing:
+                for statement in manifest['tables'][table]['schema']:
+                    conn.execute(statement)
+        if fresh:
+            conn.execute(f"PRAGMA user_version = {int(manifest['user_version'])}")
+
+    for table in tables or manifest['tables']:
+        columns = manifest['tables'][table]['columns']
+        types = manifest['tables'][table].get('types')
+        column_list = ', '.join(f'"{column}"' for column in columns)
+        placeholders = ', '.join('?' * len(columns))
+        query = f'{verb} INTO "{table}" ({column_list}) VALUES ({placeholders})'
+        rows = _read_rows(_table_path(directory, table, fmt), fmt, columns, types)
+
+        count = 0
+        started = time.perf_counter()
+        with pool.write() as conn:
+            conn.execute('BEGIN')
+            while True:
+                batch = list(islice(rows, batch_size))
+                if not batch:
+                    break
+                conn.executemany(query, batch)
+                previous, count = count, count + len(batch)
+                if count // progress_every != previous // progress_every:
+                    _report(progress, table, count, started, 1)
+        _report(progress, table, count, started, progress_every, done=True)
+        counts[table] = count
+    return counts
@@ -0,0 +1,83 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class LRUCache:
+    """Ограниченный кэш с вытеснением давно не использованных записей и сроком жизни
+
+    Рассчитан на схему read-through: get() -> при промахе чтение из базы ->
+    put() с маркером, полученным через generation() до чтения. Если между чтением
+    и put() запись была инвалидирована, устаревшее значение в кэш не попадет.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = 60.0,
+                 time_func: Callable[[], float] = time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.time_func = time_func
+        self._data: 'OrderedDict[Hashable, Tuple[Any, float]]' = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def generation(self) -> int:
+        """Маркер состояния для put(): меняется при каждой инвалидации"""
+        return self._generation
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if self.ttl is None or expires_at > self.time_func():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+                self.expirations += 1
+            self.misses += 1
+            return default
+
+    def put(self, key: Hashable, value: Any, generation: Optional[int] = None):
+        """Запись значения; при устаревшем маркере generation запись пропускается"""
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            expires_at = self.time_func() + self.ttl if self.ttl is not None else 0.0
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, *keys: Hashable):
+        with self._lock:
+            self._generation += 1
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        """Счетчики для мониторинга эффективности кэша"""
+        requests = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'hit_rate': self.hits / requests if requests else 0.0,
+        }
@@ -0,0 +1,546 @@
+import sqlite3
+import datetime
+from typing import List, Tuple, Optional, Dict, Any
+import time
+import pytz
+
+from storage.connection import ConnectionManager
+from storage.migrations import Migration, apply_migrations
+from storage.leaderboard import LeaderboardService
+from storage.mutes import MuteRegistry
+from storage.repository import ChatRepository
+from storage.rollup import DEFAULT_TIMEZONE, PeriodClock, period_keys, previous_month
+from storage.usernames import UsernameDirectory, username_migration
+
+def current_periods(timezone: str = DEFAULT_TIMEZONE) -> Dict[str, str]:
+    """Ключи текущих периодов в часовом поясе timezone: день, неделя (понедельник) и месяц"""
+    return period_keys(datetime.datetime.now(pytz.timezone(timezone)).date())
+
+def rebuild_user_summary(conn: sqlite3.Connection, periods: Optional[Dict[str, str]] = None) -> int:
+    """Пересчет сводки пользователей по истории начислений
+    
+    Возвращает количество пересчитанных пользователей
+    """
+    periods = periods or current_periods()
+    conn.execute('DELETE FROM user_summary')
+    cursor = conn.execute('''
+        INSERT INTO user_summary (user_id, total_points, today_points, day,
+                                  week_points, week_start, month_points, month_start)
+        SELECT u.user_id,
+               COALESCE(SUM(d.points), 0),
+               COALESCE(SUM(CASE WHEN d.date = :day THEN d.points END), 0),
+               :day,
+               COALESCE(SUM(CASE WHEN d.date >= :week THEN d.points END), 0),
+               :week,
+               COALESCE(SUM(CASE WHEN d.date >= :month THEN d.points END), 0),
+               :month
+        FROM users u
+        LEFT JOIN daily_points d ON d.user_id = u.user_id
+        GROUP BY u.user_id
+    ''', periods)
+    return cursor.rowcount
+
+def compact_rollups(conn: sqlite3.Connection, before_day: str) -> int:
+    """Перенос закрытых дней из daily_points в недельные и месячные агрегаты
+    
+    Переносятся дни с последней компактификации до before_day (не включая его).
+    Граница хранится в rollup_state и обновляется в той же транзакции,
+    поэтому каждый день учитывается в агрегатах ровно один раз.
+    Возвращает количество перенесенных дневных записей.
+    """
+    row = conn.execute(
+        "SELECT value FROM rollup_state WHERE name = 'daily_compacted_until'"
+    ).fetchone()
+    since = row[0] if row else ''
+    if before_day <= since:
+        return 0
+    
+    params = {'since': since, 'before': before_day}
+    count = conn.execute(
+        'SELECT COUNT(*) FROM daily_points WHERE date >= :since AND date < :before', params
+    ).fetchone()[0]
+    
+    # Понедельник недели: %w дает 0 для воскресенья
+    conn.execute('''
+        INSERT INTO weekly_points (user_id, points, week_start)
+        SELECT user_id, SUM(points),
+               date(date, '-' || ((CAST(strftime('%w', date) AS INTEGER) + 6) % 7) || ' days')
+        FROM daily_points
+        WHERE date >= :since AND date < :before
+        GROUP BY 1, 3
+        ON CONFLICT(user_id, week_start) DO UPDATE SET points = points + excluded.points
+    ''', params)
+    conn.execute('''
+        INSERT INTO monthly_points (user_id, points, month_start)
+        SELECT user_id, SUM(points), date(date, 'start of month')
+        FROM daily_points
+        WHERE date >= :since AND date < :before
+        GROUP BY 1, 3
+        ON CONFLICT(user_id, month_start) DO UPDATE SET points = points + excluded.points
+    ''', params)
+    conn.execute('''
+        INSERT INTO rollup_state (name, value) VALUES ('daily_compacted_until', :before)
+        ON CONFLICT(name) DO UPDATE SET value = excluded.value
+    ''', params)
+    return count
+
+# Прибавление :points к сводке со сбросом сумм устаревших периодов
+_ADD_TO_SUMMARY = '''
+    total_points = total_points + :points,
+    today_points = CASE WHEN day = :day THEN today_points + :points ELSE :points END,
+    week_points = CASE WHEN week_start = :week THEN week_points + :points ELSE :points END,
+    month_points = CASE WHEN month_start = :month THEN month_points + :points ELSE :points END,
+    day = :day,
+    week_start = :week,
+    month_start = :month,
+    updated_at = CURRENT_TIMESTAMP
+'''
+
+def schema_migrations(clock: Optional[PeriodClock] = None) -> List[Migration]:
+    """Миграции схемы; сводка пересчитывается по текущим периодам часового пояса clock"""
+    clock = clock or PeriodClock()
+    
+    def rebuild(conn: sqlite3.Connection):
+        rebuild_user_summary(conn, clock.current()[0])
+    
+    return [
+        Migration(1, 'Начальная схема', [
+            # Таблица пользователей
+            '''
+                CREATE TABLE IF NOT EXISTS users (
+                    user_id INTEGER PRIMARY KEY,
+                    username TEXT,
+                    first_name TEXT,
+                    last_name TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''',
+            # Таблица очков за день
+            '''
+                CREATE TABLE IF NOT EXISTS daily_points (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id INTEGER,
+                    points INTEGER,
+                    date DATE DEFAULT CURRENT_DATE,
+                    FOREIGN KEY (user_id) REFERENCES users (user_id),
+                    UNIQUE(user_id, date)
+                )
+            ''',
+            # Таблица очков за неделю
+            '''
+                CREATE TABLE IF NOT EXISTS weekly_points (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id INTEGER,
+                    points INTEGER,
+                    week_start DATE,
+                    FOREIGN KEY (user_id) REFERENCES users (user_id),
+                    UNIQUE(user_id, week_start)
+                )
+            ''',
+            # Таблица очков за месяц
+            '''
+                CREATE TABLE IF NOT EXISTS monthly_points (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id INTEGER,
+                    points INTEGER,
+                    month_start DATE,
+                    FOREIGN KEY (user_id) REFERENCES users (user_id),
+                    UNIQUE(user_id, month_start)
+                )
+            ''',
+            # Таблица победителей месяцев
+            '''
+                CREATE TABLE IF NOT EXISTS monthly_winners (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id INTEGER,
+                    username TEXT,
+                    points INTEGER,
+                    month_start DATE,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (user_id) REFERENCES users (user_id)
+                )
+            ''',
+            # Таблица мутов
+            '''
+                CREATE TABLE IF NOT EXISTS mutes (
+                    user_id INTEGER PRIMARY KEY,
+                    until_timestamp INTEGER
+                )
+            ''',
+        ]),
+        Migration(2, 'Индексы для топов и поиска по username', [
+            'CREATE INDEX IF NOT EXISTS idx_daily_points_date ON daily_points (date, points)',
+            'CREATE INDEX IF NOT EXISTS idx_weekly_points_week ON weekly_points (week_start, points)',
+            'CREATE INDEX IF NOT EXISTS idx_monthly_points_month ON monthly_points (month_start, points)',
+            'CREATE INDEX IF NOT EXISTS idx_monthly_winners_month ON monthly_winners (month_start, points)',
+            'CREATE INDEX IF NOT EXISTS idx_users_username ON users (username)',
+        ]),
+        Migration(3, 'Сводка очков пользователя', [
+            '''
+                CREATE TABLE IF NOT EXISTS user_summary (
+                    user_id INTEGER PRIMARY KEY,
+                    total_points INTEGER NOT NULL DEFAULT 0,
+                    today_points INTEGER NOT NULL DEFAULT 0,
+                    day DATE,
+                    week_points INTEGER NOT NULL DEFAULT 0,
+                    week_start DATE,
+                    month_points INTEGER NOT NULL DEFAULT 0,
+                    month_start DATE,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (user_id) REFERENCES users (user_id)
+                )
+            ''',
+            rebuild,
+        ]),
+        # Недельные и месячные очки теперь выводятся из дневных при закрытии дня.
+        # Агрегаты периодов, для которых есть дневные записи, пересобираются из них
+        # при первой свертке; старые агрегаты без дневных записей остаются как есть
+        Migration(4, 'Свертка недельных и месячных очков из дневных', [
+            '''
+                CREATE TABLE IF NOT EXISTS rollup_state (
+                    name TEXT PRIMARY KEY,
+                    value TEXT
+                )
+            ''',
+            '''
+                DELETE FROM weekly_points WHERE EXISTS (
+                    SELECT 1 FROM daily_points d
+                    WHERE d.user_id = weekly_points.user_id
+                      AND d.date >= weekly_points.week_start
+                      AND d.date < date(weekly_points.week_start, '+7 days')
+                )
+            ''',
+            '''
+                DELETE FROM monthly_points WHERE EXISTS (
+                    SELECT 1 FROM daily_points d
+                    WHERE d.user_id = monthly_points.user_id
+                      AND d.date >= monthly_points.month_start
+                      AND d.date < date(monthly_points.month_start, '+1 month')
+                )
+            ''',
+            rebuild,
+        ]),
+        Migration(5, 'История username и индекс без учета регистра', username_migration('created_at')),
+    ]
+
+MIGRATIONS = schema_migrations()
+
+class ChatDatabase(ChatRepository):
+    """Хранилище чат-бота в SQLite
+
+    Рейтинги, справочник username и активные муты держатся в памяти и
+    обновляются после каждой фиксации записи, поэтому топы, поиск по
+    username и проверка мута не обращаются к базе.
+    """
+
+    def __init__(self, db_path: str = "chat_bot.db", timezone: str = DEFAULT_TIMEZONE,
+                 clock: Optional[PeriodClock] = None):
+        """Инициализация базы данных"""
+        self.db_path = db_path
+        self.pool = ConnectionManager(self.db_path)
+        self.clock = clock or PeriodClock(timezone)
+        self.leaderboards = LeaderboardService()
+        self.usernames = UsernameDirectory()
+        self.mutes = MuteRegistry()
+        self.init_database()
+        self.load_leaderboards()
+        with self.pool.read() as conn:
+            self.usernames.load(conn)
+            self.mutes.load(conn)
+    
+    def init_database(self):
+        """Применение миграций схемы и свертка дней, закрытых до запуска"""
+        apply_migrations(self.pool, schema_migrations(self.clock))
+        self.compact_rollups()
+    
+    def compact_rollups(self) -> int:
+        """Перенос закрытых дней в недельные и месячные агрегаты"""
+        periods, _ = self.clock.current()
+        with self.pool.write() as conn:
+            conn.execute('BEGIN')
+            return compact_rollups(conn, periods['day'])
+    
+    def load_leaderboards(self):
+        """Загрузка рейтингов текущих периодов в память"""
+        periods = self.current_periods()
+        with self.pool.read() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT user_id, username FROM users')
+            usernames = dict(cursor.fetchall())
+            cursor.execute('SELECT user_id, today_points FROM user_summary WHERE day = ? AND today_points != 0', (periods['day'],))
+            daily = cursor.fetchall()
+            cursor.execute('SELECT user_id, week_points FROM user_summary WHERE week_start = ? AND week_points != 0', (periods['week'],))
+            weekly = cursor.fetchall()
+            cursor.execute('SELECT user_id, month_points FROM user_summary WHERE month_start = ? AND month_points != 0', (periods['month'],))
+            monthly = cursor.fetchall()
+        self.leaderboards.load(usernames, periods, {'day': daily, 'week': weekly, 'month': monthly})
+    
+    def add_user(self, user_id: int, username: str, first_name: str, last_name: str):
+        """Добавление пользователя или обновление его имени"""
+        with self.pool.write() as conn:
+            # Смена username (освобождение имени у прежнего владельца и история)
+            # пишется до вставки, чтобы не нарушить уникальный индекс
+            self.usernames.record(conn, user_id, username)
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO users (user_id, username, first_name, last_name)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(user_id) DO UPDATE SET
+                    username = excluded.username,
+                    first_name = excluded.first_name,
+                    last_name = excluded.last_name
+            ''', (user_id, username, first_name, last_name))
+            conn.commit()
+            self.usernames.set(user_id, username)
+        self.leaderboards.set_username(user_id, username)
+    
+    def add_points(self, user_id: int, points: int) -> Dict[str, int]:
+        """Добавление очков пользователю
+        
+        Записывается только дневная корзина и сводка пользователя; недельные
+        и месячные агрегаты собираются из дневных при закрытии дня.
+        Возвращает новые суммы (всего, за день, неделю, месяц) и ключи периодов
+        """
+        with self.pool.write() as conn:
+            # Ключи периодов берутся под блокировкой записи, чтобы свертка
+            # при смене дня не разминулась с начислением за прошедший день
+            periods = self.current_periods()
+            totals = self._apply_points(conn.cursor(), user_id, points, periods)
+            
+            # Рейтинги обновляются под той же блокировкой записи, что и база
+            conn.commit()
+            self.leaderboards.record(user_id, totals)
+            return totals
+    
+    def transfer_points_many(self, transfers: List[Tuple[int, int, int]]) -> Optional[Dict[int, Dict[str, Any]]]:
+        """Пакет переводов (from_user_id, to_user_id, количество) одной транзакцией
+        
+        Списание выполняется условным UPDATE (total_points >= количество), поэтому
+        проверка баланса и перевод не разделены во времени. Если хотя бы одному
+        отправителю не хватает очков, не применяется ни один перевод и возвращается None.
+        """
+        with self.pool.write() as conn:
+            periods = self.current_periods()
+            cursor = conn.cursor()
+            totals = {}
+            for from_user_id, to_user_id, amount in transfers:
+                if amount <= 0:
+                    raise ValueError("Transfer amount must be positive")
+                sender_totals = self._apply_points(cursor, from_user_id, -amount, periods, required=amount)
+                if sender_totals is None:
+                    conn.rollback()
+                    return None
+                totals[from_user_id] = sender_totals
+                totals[to_user_id] = self._apply_points(cursor, to_user_id, amount, periods)
+            
+            conn.commit()
+            for user_id, user_totals in totals.items():
+                self.leaderboards.record(user_id, user_totals)
+            return totals
+    
+    def _apply_points(self, cursor: sqlite3.Cursor, user_id: int, points: int, periods: Dict[str, str],
+                      required: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """Изменение дневной корзины и сводки пользователя в текущей транзакции
+        
+        При заданном required сводка меняется, только если total_points >= required;
+        иначе ничего не записывается и возвращается None.
+        """
+        params = dict(periods, user_id=user_id, points=points, required=required)
+        
+        # Суммы за неделю и месяц ведутся в сводке и сбрасываются при смене периода
+        if required is None:
+            cursor.execute(f'''
+                INSERT INTO user_summary (user_id, total_points, today_points, day,
+                                          week_points, week_start, month_points, month_start)
+                VALUES (:user_id, :points, :points, :day, :points, :week, :points, :month)
+                ON CONFLICT(user_id) DO UPDATE SET {_ADD_TO_SUMMARY}
+                RETURNING total_points, today_points, week_points, month_points
+            ''', params)
+        else:
+            cursor.execute(f'''
+                UPDATE user_summary SET {_ADD_TO_SUMMARY}
+                WHERE user_id = :user_id AND total_points >= :required
+                RETURNING total_points, today_points, week_points, month_points
+            ''', params)
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        total_points, today_points, week_points, month_points = row
+        
+        # Добавляем очки за день
+        cursor.execute('''
+            INSERT INTO daily_points (user_id, points, date)
+            VALUES (:user_id, :points, :day)
+            ON CONFLICT(user_id, date) DO UPDATE SET points = points + excluded.points
+        ''', params)
+        
+        return {
+            'total_points': total_points,
+            'today_points': today_points,
+            'week_points': week_points,
+            'month_points': month_points,
+            'date': periods['day'],
+            'week_start': periods['week'],
+            'month_start': periods['month']
+        }
+    
+    def get_user_id_by_username(self, username: str) -> Optional[int]:
+        """Поиск user_id по текущему или прежнему username без учета регистра (в памяти)"""
+        return self.usernames.resolve(username)
+    
+    def get_user_stats(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """Получение статистики пользователя"""
+        periods = self.current_periods()
+        with self.pool.read() as conn:
+            cursor = conn.cursor()
+            
+            # Суммы берутся из сводки; устаревший период означает 0 очков за текущий
+            cursor.execute('''
+                SELECT u.username, u.first_name, u.last_name, u.created_at,
+                       COALESCE(s.total_points, 0) as total_points,
+                       CASE WHEN s.day = ? THEN s.today_points ELSE 0 END as today_points,
+                       CASE WHEN s.week_start = ? THEN s.week_points ELSE 0 END as week_points,
+                       CASE WHEN s.month_start = ? THEN s.month_points ELSE 0 END as month_points
+                FROM users u
+                LEFT JOIN user_summary s ON s.user_id = u.user_id
+                WHERE u.user_id = ?
+            ''', (periods['day'], periods['week'], periods['month'], user_id))
+            
+            result = cursor.fetchone()
+            if result:
+                return {
+                    'username': result[0],
+                    'first_name': result[1],
+                    'last_name': result[2],
+                    'created_at': result[3],
+                    'total_points': result[4],
+                    'today_points': result[5],
+                    'week_points': result[6],
+                    'month_points': result[7]
+                }
+            return None
+    
+    def rebuild_user_summary(self) -> int:
+        """Пересчет сводки пользователей по истории начислений"""
+        with self.pool.write() as conn:
+            conn.execute('BEGIN')
+            return rebuild_user_summary(conn, self.current_periods())
+    
+    def get_daily_top(self, limit: int = 10) -> List[Tuple[str, int]]:
+        """Получение топ пользователей за день"""
+        return self.leaderboards.top('day', self.current_periods()['day'], limit)
+    
+    def get_weekly_top(self, limit: int = 10) -> List[Tuple[str, int]]:
+        """Получение топ пользователей за неделю"""
+        return self.leaderboards.top('week', self._get_week_start(), limit)
+    
+    def get_monthly_top(self, limit: int = 10) -> List[Tuple[str, int]]:
+        """Получение топ пользователей за месяц"""
+        return self.leaderboards.top('month', self._get_month_start(), limit)
+    
+    def get_user_rank(self, user_id: int, period: str) -> Optional[int]:
+        """Место пользователя в рейтинге за период ('day', 'week' или 'month')"""
+        return self.leaderboards.rank(period, self.current_periods()[period], user_id)
+    
+    def save_monthly_winner(self, user_id: int, username: str, points: int, month_start: str):
+        """Сохранение победителя месяца"""
+        with self.pool.write() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT OR REPLACE INTO monthly_winners (user_id, username, points, month_start)
+                VALUES (?, ?, ?, ?)
+            ''', (user_id, username, points, month_start))
+    
+    def get_monthly_winners(self) -> List[Tuple[str, int, str]]:
+        """Получение истории победителей месяцев"""
+        with self.pool.read() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT username, points, month_start
+                FROM monthly_winners
+                ORDER BY month_start DESC
+                LIMIT 10
+            ''')
+            return cursor.fetchall()
+    
+    def get_previous_month_winner(self) -> Optional[Tuple[int, str, int]]:
+        """Получение победителя предыдущего месяца"""
+        with self.pool.read() as conn:
+            cursor = conn.cursor()
+            
+            # Получаем начало предыдущего месяца
+            prev_month = self._get_previous_month_start()
+            
+            cursor.execute('''
+                SELECT user_id, username, points
+                FROM monthly_winners
+                WHERE month_start = ?
+                ORDER BY points DESC
+                LIMIT 1
+            ''', (prev_month,))
+            
+            result = cursor.fetchone()
+            return result if result else None
+    
+    def current_periods(self) -> Dict[str, str]:
+        """Ключи текущих периодов: день, неделя и месяц
+        
+        При первом обращении после полуночи закрытые дни сворачиваются в агрегаты
+        """
+        periods, rolled_over = self.clock.current()
+        if rolled_over:
+            self.compact_rollups()
+        return periods
+    
+    def _get_week_start(self) -> str:
+        """Получение начала текущей недели (понедельник)"""
+        return self.current_periods()['week']
+    
+    def _get_month_start(self) -> str:
+        """Получение начала текущего месяца"""
+        return self.current_periods()['month']
+    
+    def _get_previous_month_start(self) -> str:
+        """Получение начала предыдущего месяца"""
+        return previous_month(self._get_month_start())
+
+    def set_mute(self, user_id: int, until_timestamp: int):
+        """Мут пользователя до until_timestamp: запись в базу и в реестр в памяти"""
+        with self.pool.write() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT OR REPLACE INTO mutes (user_id, until_timestamp)
+                VALUES (?, ?)
+            ''', (user_id, until_timestamp))
+            conn.commit()
+            self.mutes.set(user_id, until_timestamp)
+
+    def get_mute(self, user_id: int) -> int:
+        with self.pool.read() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT until_timestamp FROM mutes WHERE user_id = ?', (user_id,))
+            row = cursor.fetchone()
+            return row[0] if row else 0
+
+    def clear_expired_mutes(self) -> int:
+        """Удаление истекших мутов из реестра и базы, возвращает число удаленных строк"""
+        self.mutes.sweep()
+        now = int(time.time())
+        with self.pool.write() as conn:
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM mutes WHERE until_timestamp <= ?', (now,))
+            return cursor.rowcount
+
+    def is_muted(self, user_id: int) -> int:
+        """Оставшееся время мута в секундах, если есть, иначе 0
+        
+        Проверяется реестр в памяти, без обращения к базе
+        """
+        return self.mutes.remaining(user_id)
+
+    def backup_sources(self) -> List[Tuple[str, ConnectionManager]]:
+        return [('chat_bot', self.pool)]
+
+    def close(self):
+        """Закрытие соединений с базой данных"""
+        self.pool.close()
@@ -0,0 +1,91 @@
+import sqlite3
+import threading
+import logging
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Union
+
+# Настройки соединений по умолчанию (WAL + быстрые записи без потери целостности)
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -16000,        # ~16 МБ страничного кэша
+    'mmap_size': 268435456,      # 256 МБ отображения файла в память
+    'busy_timeout': 5000,        # мс ожидания блокировки вместо ошибки
+    'temp_store': 'MEMORY',
+}
+
+
+class ConnectionManager:
+    """Менеджер долгоживущих соединений SQLite
+
+    Один писатель, защищенный блокировкой, и по одному читателю на поток.
+    В режиме WAL читатели не блокируют писателя и наоборот.
+    """
+
+    def __init__(self, db_path: str, pragmas: Optional[Dict[str, Union[str, int]]] = None):
+        self.db_path = db_path
+        self.pragmas = dict(DEFAULT_PRAGMAS)
+        if pragmas:
+            self.pragmas.update(pragmas)
+
+        self.in_memory = db_path == ':memory:'
+        self._write_lock = threading.RLock()
+        self._local = threading.local()
+        self._readers = []
+        self._readers_lock = threading.Lock()
+        self._writer = self._connect()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Открытие нового соединения с настроенными pragma"""
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        for name, value in self.pragmas.items():
+            # WAL и mmap не имеют смысла для базы в памяти
+            if self.in_memory and name in ('journal_mode', 'mmap_size'):
+                continue
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _reader(self) -> sqlite3.Connection:
+        """Соединение для чтения, закрепленное за текущим потоком"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._connect()
+            conn.execute('PRAGMA query_only = ON')
+            self._local.conn = conn
+            with self._readers_lock:
+                self._readers.append(conn)
+        return conn
+
+    @contextmanager
+    def read(self) -> Iterator[sqlite3.Connection]:
+        """Соединение для запросов на чтение"""
+        if self.in_memory:
+            # База в памяти существует только внутри одного соединения
+            with self._write_lock:
+                yield self._writer
+            return
+        yield self._reader()
+
+    @contextmanager
+    def write(self) -> Iterator[sqlite3.Connection]:
+        """Соединение для записи: коммит при успехе, откат при ошибке"""
+        with self._write_lock:
+            try:
+                yield self._writer
+                self._writer.commit()
+            except Exception:
+                self._writer.rollback()
+                raise
+
+    def close(self):
+        """Закрытие всех соединений"""
+        with self._readers_lock:
+            for conn in self._readers:
+                try:
+                    conn.close()
+                except sqlite3.Error as e:
+                    logging.error(f"Error closing reader connection: {e}")
+            self._readers.clear()
+        self._local = threading.local()
+        with self._write_lock:
+            self._writer.close()
@@ -0,0 +1,208 @@
+import random
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+class _Node:
+    __slots__ = ('key', 'next', 'width')
+
+    def __init__(self, key: Any, height: int):
+        self.key = key
+        self.next: List[Optional['_Node']] = [None] * height
+        self.width: List[int] = [1] * height
+
+
+class RankedSet:
+    """Упорядоченное множество с доступом по позиции (индексируемый skip list)
+
+    Вставка, удаление и вычисление позиции элемента выполняются за O(log n).
+    """
+
+    MAX_LEVEL = 24
+
+    def __init__(self):
+        self._head = _Node(None, self.MAX_LEVEL)
+        self._level = 1
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _random_level(self) -> int:
+        level = 1
+        while level < self.MAX_LEVEL and random.random() < 0.5:
+            level += 1
+        return level
+
+    def _find(self, key: Any) -> Tuple[List[_Node], List[int], int]:
+        """Последние узлы с ключом меньше key на каждом уровне и их позиции"""
+        chain = [self._head] * self.MAX_LEVEL
+        steps = [0] * self.MAX_LEVEL
+        node = self._head
+        position = 0
+        for level in reversed(range(self._level)):
+            nxt = node.next[level]
+            while nxt is not None and nxt.key < key:
+                position += node.width[level]
+                node = nxt
+                nxt = node.next[level]
+            chain[level] = node
+            steps[level] = position
+        return chain, steps, position
+
+    def add(self, key: Any):
+        height = self._random_level()
+        if height > self._level:
+            for level in range(self._level, height):
+                self._head.next[level] = None
+                self._head.width[level] = self._size + 1
+            self._level = height
+
+        chain, steps, position = self._find(key)
+        node = _Node(key, height)
+        for level in range(height):
+            prev = chain[level]
+            distance = position - steps[level]
+            node.next[level] = prev.next[level]
+            prev.next[level] = node
+            node.width[level] = prev.width[level] - distance
+            prev.width[level] = distance + 1
+        for level in range(height, self._level):
+            chain[level].width[level] += 1
+        self._size += 1
+
+    def remove(self, key: Any):
+        chain, _, _ = self._find(key)
+        target = chain[0].next[0]
+        if target is None or target.key != key:
+            raise KeyError(key)
+        for level in range(self._level):
+            prev = chain[level]
+            if prev.next[level] is target:
+                prev.width[level] += target.width[level] - 1
+                prev.next[level] = target.next[level]
+            else:
+                prev.width[level] -= 1
+        self._size -= 1
+
+    def index(self, key: Any) -> int:
+        """Позиция элемента (с нуля)"""
+        chain, _, position = self._find(key)
+        target = chain[0].next[0]
+        if target is None or target.key != key:
+            raise KeyError(key)
+        return position
+
+    def __iter__(self) -> Iterator[Any]:
+        node = self._head.next[0]
+        while node is not None:
+            yield node.key
+            node = node.next[0]
+
+
+class Leaderboard:
+    """Рейтинг пользователей за один период"""
+
+    def __init__(self, period: Optional[str] = None):
+        self.period = period
+        self.scores: Dict[int, int] = {}
+        self._ranked = RankedSet()
+
+    def set(self, user_id: int, points: int):
+        """Установка суммы очков пользователя за период"""
+        old = self.scores.get(user_id)
+        if old == points:
+            return
+        if old is not None:
+            self._ranked.remove((-old, user_id))
+        self.scores[user_id] = points
+        self._ranked.add((-points, user_id))
+
+    def rank(self, user_id: int) -> Optional[int]:
+        """Место пользователя в рейтинге (с единицы)"""
+        points = self.scores.get(user_id)
+        if points is None:
+            return None
+        return self._ranked.index((-points, user_id)) + 1
+
+    def top(self) -> Iterator[Tuple[int, int]]:
+        """Пользователи по убыванию очков: (user_id, очки)"""
+        for neg_points, user_id in self._ranked:
+            yield user_id, -neg_points
+
+
+class LeaderboardService:
+    """Рейтинги за день, неделю и месяц в памяти
+
+    Загружаются из базы при старте и обновляются при каждом начислении очков.
+    При смене периода рейтинг начинается заново.
+    """
+
+    # Период -> (ключ периода, сумма очков) в результате Database.add_points
+    PERIODS = {
+        'day': ('date', 'today_points'),
+        'week': ('week_start', 'week_points'),
+        'month': ('month_start', 'month_points'),
+    }
+
+    def __init__(self):
+        self.boards = {period: Leaderboard() for period in self.PERIODS}
+        self.usernames: Dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    def load(self, usernames: Dict[int, str], periods: Dict[str, str],
+             rows: Dict[str, List[Tuple[int, int]]]):
+        """Заполнение рейтингов данными из базы"""
+        with self._lock:
+            self.usernames = dict(usernames)
+            for period, board_rows in rows.items():
+                board = Leaderboard(periods[period])
+                for user_id, points in board_rows:
+                    board.set(user_id, points)
+                self.boards[period] = board
+
+    def set_username(self, user_id: int, username: str):
+        with self._lock:
+            self.usernames[user_id] = username
+
+    def record(self, user_id: int, totals: Dict[str, Any]):
+        """Обновление рейтингов новыми суммами пользователя из add_points"""
+        with self._lock:
+            for period, (key_field, points_field) in self.PERIODS.items():
+                board = self._current(period, totals[key_field])
+                if board is not None:
+                    board.set(user_id, totals[points_field])
+
+    def _current(self, period: str, period_key: str) -> Optional[Leaderboard]:
+        """Рейтинг за указанный период, с обнулением при смене периода
+
+        Ключи периодов - даты ISO, поэтому сравниваются как строки.
+        Для уже закрытого периода возвращается None.
+        """
+        board = self.boards[period]
+        if board.period is None or period_key > board.period:
+            board = Leaderboard(period_key)
+            self.boards[period] = board
+        elif period_key < board.period:
+            return None
+        return board
+
+    def top(self, period: str, period_key: str, limit: int) -> List[Tuple[str, int]]:
+        """Топ пользователей за период: [(username, очки)]"""
+        with self._lock:
+            board = self._current(period, period_key)
+            result = []
+            if board is None:
+                return result
+            for user_id, points in board.top():
+                if len(result) >= limit:
+                    break
+                if user_id in self.usernames:
+                    result.append((self.usernames[user_id], points))
+            return result
+
+    def rank(self, period: str, period_key: str, user_id: int) -> Optional[int]:
+        """Место пользователя за период"""
+        with self._lock:
+            board = self._current(period, period_key)
+            return board.rank(user_id) if board is not None else None
@@ -0,0 +1,585 @@
+import datetime
+import logging
+import threading
+from collections import ChainMap
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from storage.leaderboard import LeaderboardService
+from storage.models import Ad, Booking, DiceGame, Model, Nft, Transaction, User
+from storage.mutes import MuteRegistry
+from storage.repository import SYSTEM_USER_ID, ChatRepository, Repository, TransferError
+from storage.rollup import DEFAULT_TIMEZONE, PeriodClock, previous_month
+from storage.usernames import UsernameDirectory, normalize_username
+
+
+def _now() -> str:
+    """Текущее время UTC в формате CURRENT_TIMESTAMP SQLite"""
+    return datetime.datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _copy(model: Model, **changes) -> Model:
+    values = model.to_dict()
+    values.update(changes)
+    return type(model)(**values)
+
+
+def _newest_first(rows: List[Model]) -> List[Model]:
+    return sorted(rows, key=lambda row: (row.created_at, row.id), reverse=True)
+
+
+class InMemoryRepository(Repository):
+    """Хранилище GasJK-бота в словарях процесса
+
+    Повторяет поведение SQLite-реализации (значения по умолчанию, порядок
+    сортировки, атомарность пакетных операций), но ничего не сохраняет на
+    диск. Предназначено для тестов и бенчмарков бизнес-логики. Хранимые
+    объекты не изменяются на месте: каждая запись заменяет строку новой
+    моделью, а наружу отдаются копии, поэтому вызывающий может их менять.
+    """
+
+    def __init__(self, timezone: str = DEFAULT_TIMEZONE, clock: Optional[PeriodClock] = None):
+        self.clock = clock or PeriodClock(timezone)
+        self.users: Dict[int, User] = {}
+        self.transactions: Dict[int, Transaction] = {}
+        self.nfts: Dict[int, Nft] = {}
+        self.ads: Dict[int, Ad] = {}
+        self.bookings: Dict[int, Booking] = {}
+        self.dice_games: Dict[str, DiceGame] = {}
+        self.usernames = UsernameDirectory()
+        self.activity: Dict[str, Dict[str, Any]] = {}
+        self._active_day: Optional[str] = None
+        self._active_users: Set[int] = set()
+        self._ids: Dict[str, int] = {}
+        self._lock = threading.RLock()
+
+    def _next_id(self, table: str) -> int:
+        self._ids[table] = self._ids.get(table, 0) + 1
+        return self._ids[table]
+
+    def _record_activity(self, active_users: Iterable[int] = (), messages: int = 0,
+                         rewards: float = 0.0, nfts: int = 0):
+        day = self.clock.current()[0]['day']
+        if day != self._active_day:
+            self._active_day = day
+            self._active_users = set()
+        counters = self.activity.setdefault(day, {'active_users': 0, 'messages': 0,
+                                                             'rewards': 0.0, 'nfts': 0})
+        for user_id in active_users:
+            if user_id not in self._active_users:
+                self._active_users.add(user_id)
+                counters['active_users'] += 1
+        counters['messages'] += messages
+        counters['rewards'] += rewards
+        counters['nfts'] += nfts
+
+    # Пользователи
+
+    def add_user(self, user_id: int, username: Optional[str] = None, first_name: Optional[str] = None,
+                 last_name: Optional[str] = None) -> bool:
+        with self._lock:
+            added = user_id not in self.users
+            if added:
+                now = _now()
+                self.users[user_id] = User(user_id, None, first_name, last_name, None, 0.0, 0, 0, now, now)
+            if self.usernames.is_changed(user_id, username):
+                # Имя освобождается у другого пользователя, как в SQLite-реализации
+                key = normalize_username(username)
+                for other_id, other in list(self.users.items()):
+                    if other_id != user_id and key and normalize_username(other.username) == key:
+                        self.users[other_id] = _copy(other, username=None)
+                self.users[user_id] = _copy(self.users[user_id], username=username)
+                self.usernames.set(user_id, username)
+            return added
+
+    def get_user(self, user_id: int) -> Optional[User]:
+        with self._lock:
+            user = self.users.get(user_id)
+            return _copy(user) if user is not None else None
+
+    def get_user_id_by_username(self, username: str) -> Optional[int]:
+        return self.usernames.resolve(username)
+
+    def _update_user(self, user_id: int, **changes) -> bool:
+        user = self.users.get(user_id)
+        if user is None:
+            return False
+        self.users[user_id] = _copy(user, **changes)
+        return True
+
+    def update_user_balance(self, user_id: int, amount: float) -> bool:
+        with self._lock:
+            user = self.users.get(user_id)
+            if user is None:
+                return False
+            self._record_activity(active_users=(user_id,))
+            self._update_user(user_id, gasjk_balance=user.gasjk_balance + amount, last_activity=_now())
+        self._balances_changed((user_id,))
+        return True
+
+    def increment_messages(self, user_id: int) -> bool:
+        with self._lock:
+            user = self.users.get(user_id)
+            if user is None:
+                return False
+            self._record_activity(active_users=(user_id,), messages=1)
+            return self._update_user(user_id, messages_count=user.messages_count + 1, last_activity=_now())
+
+    # Транзакции
+
+    def _insert_transaction(self, from_user_id: int, to_user_id: int, amount: float, transaction_type: str,
+                            status: str = 'pending', created_at: Optional[str] = None) -> int:
+        transaction_id = self._next_id('transactions')
+        self.transactions[transaction_id] = Transaction(
+            transaction_id, from_user_id, to_user_id, amount, transaction_type, status, created_at or _now())
+        return transaction_id
+
+    def add_transaction(self, from_user_id: int, to_user_id: int, amount: float, transaction_type: str) -> int:
+        with self._lock:
+            return self._insert_transaction(from_user_id, to_user_id, amount, transaction_type)
+
+    def apply_message_rewards(self, rewards: List[Tuple[int, float, int]],
+                              transactions: List[Tuple[int, float, str]]) -> Optional[Dict[int, float]]:
+        with self._lock:
+            balances = {}
+            now = _now()
+            for user_id, amount, messages in rewards:
+                user = self.users.get(user_id)
+                if user is not None:
+                    balances[user_id] = user.gasjk_balance + amount
+                    self._update_user(user_id, gasjk_balance=balances[user_id],
+                                      messages_count=user.messages_count + messages, last_activity=now)
+                    self._record_activity(active_users=(user_id,), messages=messages, rewards=amount)
+            for user_id, amount, created_at in transactions:
+                self._insert_transaction(SYSTEM_USER_ID, user_id, amount, 'message_reward', created_at=created_at)
+        self._balances_changed(balances)
+        return balances
+
+    def transfer_many(self, transfers: List[Tuple[int, int, float]],
+                      transaction_type: str = 'transfer') -> Optional[Dict[int, float]]:
+        with self._lock:
+            # Балансы считаются на копии и применяются, только если прошли все переводы
+            balances: Dict[int, float] = {}
+            try:
+                for from_user_id, to_user_id, amount in transfers:
+                    if amount <= 0 or from_user_id == to_user_id:
+                        raise TransferError(f"invalid transfer {from_user_id} -> {to_user_id} of {amount}")
+                    if from_user_id != SYSTEM_USER_ID:
+                        sender = self.users.get(from_user_id)
+                        balance = balances.get(from_user_id, sender.gasjk_balance if sender else None)
+                        if balance is None or balance < amount:
+                            raise TransferError(f"insufficient balance of user {from_user_id}")
+                        balances[from_user_id] = balance - amount
+                    recipient = self.users.get(to_user_id)
+                    if recipient is None:
+                        raise TransferError(f"unknown recipient {to_user_id}")
+                    balances[to_user_id] = balances.get(to_user_id, recipient.gasjk_balance) + amount
+            except TransferError as e:
+                logging.warning(f"Transfer rejected: {e}")
+                return None
+
+            now = _now()
+            senders = {from_user_id for from_user_id, _, _ in transfers}
+            for user_id, balance in balances.items():
+                changes = {'gasjk_balance': balance}
+                if user_id in senders:
+                    changes['last_activity'] = now
+                self._update_user(user_id, **changes)
+            self._record_activity(active_users=senders - {SYSTEM_USER_ID})
+            for from_user_id, to_user_id, amount in transfers:
+                self._insert_transaction(from_user_id, to_user_id, amount, transaction_type, 'completed', now)
+        self._balances_changed(balances)
+        return balances
+
+    def get_user_transactions(self, user_id: int, limit: int = 10) -> List[Transaction]:
+        with self._lock:
+            rows = [tx for tx in self.transactions.values() if user_id in (tx.from_user_id, tx.to_user_id)]
+            return [_copy(tx) for tx in _newest_first(rows)[:limit]]
+
+    def archive_transactions(self, before: Optional[str] = None, batch_size: int = 5000) -> int:
+        # Отдельного холодного хранилища в памяти нет: история остается в self.transactions
+        return 0
+
+    # NFT
+
+    def add_nft(self, user_id: int, nft_address: str, collection_name: str, token_id: str, metadata: str) -> bool:
+        with self._lock:
+            nft_id = self._next_id('nfts')
+            self.nfts[nft_id] = Nft(nft_id, user_id, nft_address, collection_name, token_id, metadata, _now())
+            user = self.users.get(user_id)
+            if user is not None:
+                self._update_user(user_id, nft_count=user.nft_count + 1)
+            self._record_activity(nfts=1)
+            return True
+
+    def get_user_nfts(self, user_id: int) -> List[Nft]:
+        with self._lock:
+            return [_copy(nft) for nft in self.nfts.values() if nft.user_id == user_id]
+
+    # Каучсёрфинг
+
+    def add_couchsurfing_ad(self, user_id: int, country: str, city: str, settlement: str,
+                            start_date: str, end_date: str, description: str) -> int:
+        with self._lock:
+            ad_id = self._next_id('couchsurfing_ads')
+            self.ads[ad_id] = Ad(ad_id, user_id, country, city, settlement, start_date, end_date,
+                                 description, 0.0, 'active', _now())
+            return ad_id
+
+    def get_couchsurfing_ad(self, ad_id: int) -> Optional[Ad]:
+        with self._lock:
+            ad = self.ads.get(ad_id)
+            return _copy(ad) if ad is not None else None
+
+    def get_couchsurfing_ads(self, country: Optional[str] = None, city: Optional[str] = None,
+                             settlement: Optional[str] = None, status: str = 'active') -> List[Ad]:
+        with self._lock:
+            rows = [ad for ad in self.ads.values()
+                    if ad.status == status
+                    and (not country or ad.country == country)
+                    and (not city or ad.city == city)
+                    and (not settlement or ad.settlement == settlement)]
+            return [_copy(ad) for ad in _newest_first(rows)]
+
+    def search_couchsurfing_ads(self, query: str) -> List[Ad]:
+        # LIKE в SQLite не учитывает регистр только для ASCII, casefold() - для всех букв
+        needle = query.casefold()
+        with self._lock:
+            rows = [ad for ad in self.ads.values()
+                    if ad.status == 'active'
+                    and any(needle in (value or '').casefold()
+                            for value in (ad.country, ad.city, ad.settlement, ad.description))]
+            return [_copy(ad) for ad in _newest_first(rows)]
+
+    def get_popular_destinations(self, limit: int = 10) -> List[Dict[str, Any]]:
+        with self._lock:
+            groups: Dict[Tuple[str, str], List[float]] = {}
+            for ad in self.ads.values():
+                if ad.status == 'active':
+                    groups.setdefault((ad.country, ad.city), []).append(ad.rating)
+        destinations = [{'country': country, 'city': city, 'ads_count': len(ratings),
+                         'avg_rating': sum(ratings) / len(ratings)}
+                        for (country, city), ratings in groups.items()]
+        destinations.sort(key=lambda d: (d['ads_count'], d['avg_rating']), reverse=True)
+        return destinations[:limit]
+
+    def get_couchsurfing_stats(self, user_id: int) -> Dict[str, Any]:
+        with self._lock:
+            ads = [ad for ad in self.ads.values() if ad.user_id == user_id]
+            guest_bookings = sum(1 for booking in self.bookings.values() if booking.guest_id == user_id)
+        return {
+            'host_ads_count': len(ads),
+            'host_avg_rating': sum(ad.rating for ad in ads) / len(ads) if ads else 0.0,
+            'host_active_ads': sum(1 for ad in ads if ad.status == 'active'),
+            'guest_bookings_count': guest_bookings,
+        }
+
+    def add_booking(self, guest_id: int, host_id: int, ad_id: int, start_date: str, end_date: str) -> int:
+        with self._lock:
+            booking_id = self._next_id('bookings')
+            self.bookings[booking_id] = Booking(booking_id, guest_id, host_id, ad_id, start_date, end_date,
+                                               'pending', _now())
+            return booking_id
+
+    def count_active_bookings(self, ad_id: int) -> int:
+        with self._lock:
+            return sum(1 for booking in self.bookings.values()
+                       if booking.ad_id == ad_id and booking.status in ('pending', 'confirmed'))
+
+    def get_user_bookings(self, user_id: int, as_guest: bool = True) -> List[Booking]:
+        result = []
+        with self._lock:
+            for booking in _newest_first(list(self.bookings.values())):
+                own, other = (booking.guest_id, booking.host_id) if as_guest else (booking.host_id, booking.guest_id)
+                ad = self.ads.get(booking.ad_id)
+                user = self.users.get(other)
+                # Как JOIN: бронирования без объявления или второго участника не попадают в выборку
+                if own != user_id or ad is None or user is None:
+                    continue
+                result.append(_copy(booking, country=ad.country, city=ad.city, settlement=ad.settlement,
+                                    description=ad.description, first_name=user.first_name,
+                                    last_name=user.last_name, username=user.username))
+        return result
+
+    def update_booking_status(self, booking_id: int, status: str) -> bool:
+        with self._lock:
+            booking = self.bookings.get(booking_id)
+            if booking is None:
+                return False
+            self.bookings[booking_id] = _copy(booking, status=status)
+            return True
+
+    def rate_booking_host(self, booking_id: int, rating: float) -> bool:
+        with self._lock:
+            booking = self.bookings.get(booking_id)
+            ad = self.ads.get(booking.ad_id) if booking is not None else None
+            if ad is None:
+                return False
+            self.ads[ad.id] = _copy(ad, rating=(ad.rating + rating) / 2)
+            return True
+
+    # Игра в кости
+
+    def add_dice_game(self, game_id: str, player1_id: int, player2_id: int, bet_amount: float) -> bool:
+        with self._lock:
+            if game_id in self.dice_games:
+                logging.error(f"Error adding dice game: duplicate game_id {game_id}")
+                return False
+            self.dice_games[game_id] = DiceGame(self._next_id('dice_games'), game_id, player1_id, player2_id,
+                                                bet_amount, None, None, None, 'active', _now())
+            return True
+
+    def update_dice_game_result(self, game_id: str, player1_dice: int, player2_dice: int,
+                                winner_id: Optional[int]) -> bool:
+        with self._lock:
+            game = self.dice_games.get(game_id)
+            if game is None:
+                return False
+            self.dice_games[game_id] = _copy(game, player1_dice=player1_dice, player2_dice=player2_dice,
+                                             winner_id=winner_id, status='completed')
+            return True
+
+    def get_player_dice_games(self, player_id: int, limit: int = 10) -> List[DiceGame]:
+        with self._lock:
+            rows = [game for game in self.dice_games.values() if player_id in (game.player1_id, game.player2_id)]
+            return [_copy(game) for game in _newest_first(rows)[:limit]]
+
+    def get_dice_leaderboard(self, limit: int = 10) -> List[Dict[str, Any]]:
+        with self._lock:
+            players: Dict[int, Dict[str, Any]] = {}
+            for game in self.dice_games.values():
+                if game.status != 'completed':
+                    continue
+                for player_id in {game.player1_id, game.player2_id}:
+                    user = self.users.get(player_id)
+                    if user is None:
+                        continue
+                    entry = players.setdefault(player_id, {
+                        'user_id': player_id, 'username': user.username, 'first_name': user.first_name,
+                        'last_name': user.last_name, 'wins': 0, 'losses': 0, 'total_winnings': 0,
+                    })
+                    if game.winner_id == player_id:
+                        entry['wins'] += 1
+                        entry['total_winnings'] += game.bet_amount
+                    elif game.winner_id is not None:
+                        entry['losses'] += 1
+        leaderboard = sorted(players.values(), key=lambda p: (p['total_winnings'], p['wins']), reverse=True)
+        return leaderboard[:limit]
+
+    def get_dice_statistics(self) -> Dict[str, Any]:
+        week_ago = (datetime.datetime.utcnow().date() - datetime.timedelta(days=7)).isoformat()
+        with self._lock:
+            games = list(self.dice_games.values())
+        daily: Dict[str, List[float]] = {}
+        for game in games:
+            if game.created_at >= week_ago:
+                daily.setdefault(game.created_at[:10], []).append(game.bet_amount)
+        return {
+            'total_games': len(games),
+            'completed_games': sum(1 for game in games if game.status == 'completed'),
+            'draw_games': sum(1 for game in games if game.status == 'draw'),
+            'total_bets': sum(game.bet_amount for game in games),
+            'daily_stats': [(day, len(bets), sum(bets)) for day, bets in sorted(daily.items(), reverse=True)],
+        }
+
+    # Обслуживание
+
+    def get_daily_stats(self) -> Dict[str, Any]:
+        day = self.clock.current()[0]['day']
+        with self._lock:
+            counters = self.activity.get(day, {'active_users': 0, 'messages': 0, 'rewards': 0.0, 'nfts': 0})
+            return dict(counters, day=day)
+
+
+class InMemoryChatRepository(ChatRepository):
+    """Хранилище чат-бота в словарях процесса
+
+    Повторяет поведение ChatDatabase (сброс сумм при смене периода, перевод
+    по принципу все или ничего, освобождение username), но ничего не
+    сохраняет на диск. Рейтинги, справочник username и муты - те же
+    структуры в памяти, что и у SQLite-реализации.
+    """
+
+    def __init__(self, timezone: str = DEFAULT_TIMEZONE, clock: Optional[PeriodClock] = None):
+        self.clock = clock or PeriodClock(timezone)
+        self.users: Dict[int, Dict[str, Any]] = {}
+        self.summary: Dict[int, Dict[str, Any]] = {}      # user_id -> суммы и ключи их периодов
+        self.daily: Dict[Tuple[int, str], int] = {}        # (user_id, день) -> очки
+        self.winners: List[Tuple[int, str, int, str]] = []
+        self.mute_until: Dict[int, int] = {}
+        self.leaderboards = LeaderboardService()
+        self.usernames = UsernameDirectory()
+        self.mutes = MuteRegistry()
+        self._lock = threading.RLock()
+
+    # Пользователи
+
+    def add_user(self, user_id: int, username: str, first_name: str, last_name: str):
+        with self._lock:
+            if self.usernames.is_changed(user_id, username):
+                # Имя освобождается у другого пользователя, как в SQLite-реализации
+                key = normalize_username(username)
+                for other_id, other in self.users.items():
+                    if other_id != user_id and key and normalize_username(other['username']) == key:
+                        self.users[other_id] = dict(other, username=None)
+            user = self.users.get(user_id, {'created_at': _now()})
+            self.users[user_id] = dict(user, username=username, first_name=first_name, last_name=last_name)
+            self.usernames.set(user_id, username)
+        self.leaderboards.set_username(user_id, username)
+
+    def get_user_id_by_username(self, username: str) -> Optional[int]:
+        return self.usernames.resolve(username)
+
+    def get_user_stats(self, user_id: int) -> Optional[Dict[str, Any]]:
+        periods = self.current_periods()
+        with self._lock:
+            user = self.users.get(user_id)
+            if user is None:
+                return None
+            summary = self.summary.get(user_id)
+        stats = {
+            'username': user['username'],
+            'first_name': user['first_name'],
+            'last_name': user['last_name'],
+            'created_at': user['created_at'],
+            'total_points': 0,
+            'today_points': 0,
+            'week_points': 0,
+            'month_points': 0
+        }
+        if summary is not None:
+            # Устаревший период означает 0 очков за текущий
+            stats['total_points'] = summary['total_points']
+            for points_field, key_field, period in (('today_points', 'date', 'day'),
+                                                    ('week_points', 'week_start', 'week'),
+                                                    ('month_points', 'month_start', 'month')):
+                if summary[key_field] == periods[period]:
+                    stats[points_field] = summary[points_field]
+        return stats
+
+    # Очки
+
+    def _apply_points(self, summary: Dict[int, Dict[str, Any]], daily: Dict[Tuple[int, str], int],
+                      user_id: int, points: int, periods: Dict[str, str],
+                      required: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """Изменение сумм и дневной корзины пользователя в переданных словарях"""
+        old = summary.get(user_id)
+        if required is not None and (old is None or old['total_points'] < required):
+            return None
+        old = old or {'total_points': 0, 'date': None, 'week_start': None, 'month_start': None}
+        totals = {
+            'total_points': old['total_points'] + points,
+            'today_points': old['today_points'] + points if old['date'] == periods['day'] else points,
+            'week_points': old['week_points'] + points if old['week_start'] == periods['week'] else points,
+            'month_points': old['month_points'] + points if old['month_start'] == periods['month'] else points,
+            'date': periods['day'],
+            'week_start': periods['week'],
+            'month_start': periods['month']
+        }
+        summary[user_id] = totals
+        daily[(user_id, periods['day'])] = daily.get((user_id, periods['day']), 0) + points
+        return dict(totals)
+
+    def add_points(self, user_id: int, points: int) -> Dict[str, Any]:
+        with self._lock:
+            totals = self._apply_points(self.summary, self.daily, user_id, points, self.current_periods())
+            self.leaderboards.record(user_id, totals)
+            return totals
+
+    def transfer_points_many(self, transfers: List[Tuple[int, int, int]]) -> Optional[Dict[int, Dict[str, Any]]]:
+        with self._lock:
+            periods = self.current_periods()
+            # Изменения пишутся поверх текущих словарей и применяются, только если прошли все переводы
+            summary, daily = ChainMap({}, self.summary), ChainMap({}, self.daily)
+            totals = {}
+            for from_user_id, to_user_id, amount in transfers:
+                if amount <= 0:
+                    raise ValueError("Transfer amount must be positive")
+                sender_totals = self._apply_points(summary, daily, from_user_id, -amount, periods, required=amount)
+                if sender_totals is None:
+                    return None
+                totals[from_user_id] = sender_totals
+                totals[to_user_id] = self._apply_points(summary, daily, to_user_id, amount, periods)
+
+            self.summary.update(summary.maps[0])
+            self.daily.update(daily.maps[0])
+            for user_id, user_totals in totals.items():
+                self.leaderboards.record(user_id, user_totals)
+            return totals
+
+    def rebuild_user_summary(self) -> int:
+        periods = self.current_periods()
+        with self._lock:
+            summary = {user_id: {'total_points': 0, 'today_points': 0, 'date': periods['day'],
+                                 'week_points': 0, 'week_start': periods['week'],
+                                 'month_points': 0, 'month_start': periods['month']}
+                       for user_id in self.users}
+            for (user_id, day), points in self.daily.items():
+                totals = summary.get(user_id)
+                if totals is None:
+                    continue
+                totals['total_points'] += points
+                if day == periods['day']:
+                    totals['today_points'] += points
+                if day >= periods['week']:
+                    totals['week_points'] += points
+                if day >= periods['month']:
+                    totals['month_points'] += points
+            self.summary = summary
+            return len(summary)
+
+    def current_periods(self) -> Dict[str, str]:
+        return self.clock.current()[0]
+
+    def get_daily_top(self, limit: int = 10) -> List[Tuple[str, int]]:
+        return self.leaderboards.top('day', self.current_periods()['day'], limit)
+
+    def get_weekly_top(self, limit: int = 10) -> List[Tuple[str, int]]:
+        return self.leaderboards.top('week', self.current_periods()['week'], limit)
+
+    def get_monthly_top(self, limit: int = 10) -> List[Tuple[str, int]]:
+        return self.leaderboards.top('month', self.current_periods()['month'], limit)
+
+    def get_user_rank(self, user_id: int, period: str) -> Optional[int]:
+        return self.leaderboards.rank(period, self.current_periods()[period], user_id)
+
+    # Победители месяцев
+
+    def save_monthly_winner(self, user_id: int, username: str, points: int, month_start: str):
+        with self._lock:
+            self.winners.append((user_id, username, points, month_start))
+
+    def get_monthly_winners(self) -> List[Tuple[str, int, str]]:
+        with self._lock:
+            winners = sorted(self.winners, key=lambda winner: winner[3], reverse=True)
+        return [(username, points, month_start) for _, username, points, month_start in winners[:10]]
+
+    def get_previous_month_winner(self) -> Optional[Tuple[int, str, int]]:
+        month_start = previous_month(self.current_periods()['month'])
+        with self._lock:
+            winners = [winner for winner in self.winners if winner[3] == month_start]
+        if not winners:
+            return None
+        user_id, username, points, _ = max(winners, key=lambda winner: winner[2])
+        return user_id, username, points
+
+    # Муты
+
+    def set_mute(self, user_id: int, until_timestamp: int):
+        with self._lock:
+            self.mute_until[user_id] = until_timestamp
+            self.mutes.set(user_id, until_timestamp)
+
+    def get_mute(self, user_id: int) -> int:
+        return self.mute_until.get(user_id, 0)
+
+    def clear_expired_mutes(self) -> int:
+        self.mutes.sweep()
+        now = int(self.mutes.time_func())
+        with self._lock:
+            expired = [user_id for user_id, until in self.mute_until.items() if until <= now]
+            for user_id in expired:
+                del self.mute_until[user_id]
+        return len(expired)
+
+    def is_muted(self, user_id: int) -> int:
+        return self.mutes.remaining(user_id)
@@ -0,0 +1,59 @@
+import logging
+import sqlite3
+from typing import Callable, List, Sequence, Tuple, Union
+
+# SQL-команда или функция, получающая соединение (для заполнения данных)
+Statement = Union[str, Callable[[sqlite3.Connection], None]]
+
+
+class Migration:
+    """Шаг миграции схемы: номер версии, описание и SQL-команды"""
+
+    def __init__(self, version: int, description: str, statements: Sequence[Statement]):
+        self.version = version
+        self.description = description
+        self.statements = list(statements)
+
+    def __repr__(self):
+        return f"Migration({self.version}, {self.description!r})"
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """Текущая версия схемы (хранится в PRAGMA user_version)"""
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def apply_migrations(pool, migrations: List[Migration]) -> int:
+    """Применение еще не выполненных миграций по порядку
+
+    Каждая миграция выполняется в своей транзакции вместе с повышением
+    user_version, поэтому прерванный запуск не оставляет схему в промежуточном
+    состоянии. Возвращает итоговую версию схемы.
+    """
+    versions = [m.version for m in migrations]
+    if versions != sorted(set(versions)):
+        raise ValueError("Migration versions must be unique and ascending")
+
+    with pool.write() as conn:
+        current = get_schema_version(conn)
+
+    for migration in migrations:
+        if migration.version <= current:
+            continue
+        with pool.write() as conn:
+            conn.execute('BEGIN')
+            for statement in migration.statements:
+                if callable(statement):
+                    statement(conn)
+                else:
+                    conn.execute(statement)
+            conn.execute(f'PRAGMA user_version = {int(migration.version)}')
+        logging.info(f"Applied migration {migration.version}: {migration.description}")
+        current = migration.version
+
+    return current
+
+
+def explain_query_plan(conn: sqlite3.Connection, query: str, params: Tuple = ()) -> List[str]:
+    """Строки EXPLAIN QUERY PLAN для проверки использования индексов"""
+    return [row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN {query}', params)]
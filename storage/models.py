@@ -0,0 +1,113 @@
+import sqlite3
+import threading
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Type, TypeVar
+
+M = TypeVar('M', bound='Model')
+
+
+class Model:
+    """Базовый класс строк таблиц с фиксированным набором полей (__slots__)
+
+    Поля перечисляются в подклассах в порядке столбцов таблицы, тогда строка
+    результата `SELECT *` передается в конструктор без перестановок.
+    Для совместимости со старым кодом поддерживается доступ по ключу
+    (`user['gasjk_balance']`, `user.get('username')`).
+    """
+
+    __slots__ = ()
+
+    # (класс, столбцы запроса) -> функция построения объекта из кортежа
+    _builders: Dict[Tuple[type, Tuple[str, ...]], Callable[[Sequence[Any]], 'Model']] = {}
+    _builders_lock = threading.Lock()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Конструктор с явным присваиванием полей (как в dataclasses): так объект
+        # создается быстрее, чем dict(zip(columns, row)), и занимает меньше памяти
+        args = ', '.join(f'{name}=None' for name in cls.__slots__)
+        body = ''.join(f'\n    self.{name} = {name}' for name in cls.__slots__) or '\n    pass'
+        namespace: Dict[str, Any] = {}
+        exec(f'def __init__(self, {args}):{body}', namespace)
+        cls.__init__ = namespace['__init__']
+
+    @classmethod
+    def builder(cls: Type[M], columns: Tuple[str, ...]) -> Callable[[Sequence[Any]], M]:
+        """Функция построения объекта для строк запроса с данными столбцами (кэшируется)"""
+        key = (cls, columns)
+        build = Model._builders.get(key)
+        if build is None:
+            if columns == cls.__slots__[:len(columns)]:
+                build = lambda row: cls(*row)
+            else:
+                # Лишние столбцы отбрасываются, отсутствующие поля остаются None
+                positions = [columns.index(name) if name in columns else None for name in cls.__slots__]
+                build = lambda row: cls(*[row[i] if i is not None else None for i in positions])
+            with Model._builders_lock:
+                Model._builders[key] = build
+        return build
+
+    @classmethod
+    def from_cursor(cls: Type[M], cursor: sqlite3.Cursor) -> List[M]:
+        """Все строки результата запроса в виде объектов модели"""
+        build = cls.builder(tuple(d[0] for d in cursor.description))
+        return [build(row) for row in cursor.fetchall()]
+
+    @classmethod
+    def one_from_cursor(cls: Type[M], cursor: sqlite3.Cursor) -> Optional[M]:
+        """Следующая строка результата запроса или None"""
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        return cls.builder(tuple(d[0] for d in cursor.description))(row)
+
+    def __getitem__(self, key: str) -> Any:
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = getattr(self, key, None)
+        return default if value is None else value
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self):
+        fields = ', '.join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+
+class User(Model):
+    __slots__ = ('user_id', 'username', 'first_name', 'last_name', 'ton_wallet', 'gasjk_balance',
+                 'messages_count', 'nft_count', 'registration_date', 'last_activity')
+
+
+class Transaction(Model):
+    __slots__ = ('id', 'from_user_id', 'to_user_id', 'amount', 'transaction_type', 'status', 'created_at')
+
+
+class Nft(Model):
+    __slots__ = ('id', 'user_id', 'nft_address', 'collection_name', 'token_id', 'metadata', 'created_at')
+
+
+class Ad(Model):
+    # host_name и host_username заполняются сервисом каучсёрфинга, в таблице их нет
+    __slots__ = ('id', 'user_id', 'country', 'city', 'settlement', 'start_date', 'end_date',
+                 'description', 'rating', 'status', 'created_at', 'host_name', 'host_username')
+
+
+class Booking(Model):
+    # После полей таблицы - данные объявления и второго участника из JOIN
+    __slots__ = ('id', 'guest_id', 'host_id', 'ad_id', 'start_date', 'end_date', 'status', 'created_at',
+                 'country', 'city', 'settlement', 'description', 'first_name', 'last_name', 'username')
+
+
+class DiceGame(Model):
+    __slots__ = ('id', 'game_id', 'player1_id', 'player2_id', 'bet_amount', 'player1_dice',
+                 'player2_dice', 'winner_id', 'status', 'created_at')
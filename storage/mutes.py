@@ -0,0 +1,71 @@
+import heapq
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Tuple
+
+
+class MuteRegistry:
+    """Активные муты в памяти: словарь user_id -> окончание и min-куча окончаний
+
+    Проверка мута - поиск в словаре без обращения к базе. Истекшие записи
+    удаляются лениво: при проверке конкретного пользователя и при sweep(),
+    который снимает с вершины кучи все истекшие окончания. Записи кучи,
+    устаревшие после повторного мута, пропускаются по несовпадению со словарем.
+    """
+
+    def __init__(self, time_func: Callable[[], float] = time.time):
+        self.time_func = time_func
+        self._until: Dict[int, int] = {}
+        self._heap: List[Tuple[int, int]] = []
+        self._lock = threading.Lock()
+
+    def load(self, conn: sqlite3.Connection):
+        """Заполнение реестра действующими мутами из таблицы mutes"""
+        now = int(self.time_func())
+        until = dict(conn.execute('SELECT user_id, until_timestamp FROM mutes WHERE until_timestamp > ?', (now,)))
+        heap = [(until_timestamp, user_id) for user_id, until_timestamp in until.items()]
+        heapq.heapify(heap)
+        with self._lock:
+            self._until, self._heap = until, heap
+
+    def set(self, user_id: int, until_timestamp: int):
+        """Применение мута в памяти (после записи в базу)"""
+        with self._lock:
+            self._until[user_id] = until_timestamp
+            heapq.heappush(self._heap, (until_timestamp, user_id))
+            self._sweep(int(self.time_func()))
+
+    def remaining(self, user_id: int) -> int:
+        """Оставшееся время мута в секундах, 0 если мута нет"""
+        until = self._until.get(user_id)
+        if until is None:
+            return 0
+        left = until - int(self.time_func())
+        if left > 0:
+            return left
+        with self._lock:
+            if self._until.get(user_id) == until:
+                del self._until[user_id]
+        return 0
+
+    def sweep(self) -> List[int]:
+        """Удаление истекших мутов, возвращает user_id снятых"""
+        with self._lock:
+            return self._sweep(int(self.time_func()))
+
+    def _sweep(self, now: int) -> List[int]:
+        expired = []
+        while self._heap and self._heap[0][0] <= now:
+            until, user_id = heapq.heappop(self._heap)
+            if self._until.get(user_id) == until:
+                del self._until[user_id]
+                expired.append(user_id)
+        # Куча не должна разрастаться за счет устаревших записей повторных мутов
+        if len(self._heap) > 2 * len(self._until) + 64:
+            self._heap = [(until, user_id) for user_id, until in self._until.items()]
+            heapq.heapify(self._heap)
+        return expired
+
+    def __len__(self) -> int:
+        return len(self._until)
@@ -0,0 +1,290 @@
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from storage.models import Ad, Booking, DiceGame, Nft, Transaction, User
+
+# Отправитель системных начислений (награды за сообщения, раздачи)
+SYSTEM_USER_ID = 0
+
+
+class TransferError(Exception):
+    """Перевод невозможен: неверные параметры, недостаточно средств или нет получателя"""
+
+
+class Repository(ABC):
+    """Доступ к данным GasJK-бота
+
+    Бизнес-логика (бот, игра в кости, каучсёрфинг) работает только через эти
+    методы и не знает, где хранятся данные. Реализации: Database (SQLite) в
+    database/database.py и InMemoryRepository (словари в памяти) для тестов и
+    бенчмарков. Методы возвращают модели из storage.models, которые вызывающий
+    не должен изменять. Хранилище чат-бота (bot.py) описывает ChatRepository.
+    """
+
+    # Пользователи
+
+    @abstractmethod
+    def add_user(self, user_id: int, username: Optional[str] = None, first_name: Optional[str] = None,
+                 last_name: Optional[str] = None) -> bool:
+        """Добавление пользователя или обновление его username, True если пользователь новый"""
+
+    @abstractmethod
+    def get_user(self, user_id: int) -> Optional[User]:
+        """Пользователь по user_id"""
+
+    @abstractmethod
+    def get_user_id_by_username(self, username: str) -> Optional[int]:
+        """user_id по текущему или прежнему username без учета регистра"""
+
+    @abstractmethod
+    def update_user_balance(self, user_id: int, amount: float) -> bool:
+        """Изменение баланса на amount"""
+
+    @abstractmethod
+    def increment_messages(self, user_id: int) -> bool:
+        """Увеличение счетчика сообщений"""
+
+    def add_balance_listener(self, callback: Callable[[int], Any]):
+        """Подписка на изменения балансов: callback(user_id) после каждой записи баланса
+
+        Реализации вызывают подписчиков из всех методов, меняющих gasjk_balance,
+        после фиксации изменения и в потоке, выполнившем запись, поэтому
+        callback должен быть потокобезопасным и быстрым (например, сброс кэша).
+        """
+        self._balance_listeners = getattr(self, '_balance_listeners', ()) + (callback,)
+
+    def _balances_changed(self, user_ids: Iterable[int]):
+        for callback in getattr(self, '_balance_listeners', ()):
+            for user_id in user_ids:
+                callback(user_id)
+
+    # Транзакции
+
+    @abstractmethod
+    def add_transaction(self, from_user_id: int, to_user_id: int, amount: float, transaction_type: str) -> int:
+        """Запись транзакции, возвращает ее id или -1"""
+
+    @abstractmethod
+    def apply_message_rewards(self, rewards: List[Tuple[int, float, int]],
+                              transactions: List[Tuple[int, float, str]]) -> Optional[Dict[int, float]]:
+        """Пакетное начисление наград за сообщения, возвращает новые балансы или None, если ничего не записано"""
+
+    def transfer(self, from_user_id: int, to_user_id: int, amount: float,
+                 transaction_type: str = 'transfer') -> Optional[Dict[int, float]]:
+        """Перевод между пользователями, возвращает новые балансы или None"""
+        return self.transfer_many([(from_user_id, to_user_id, amount)], transaction_type)
+
+    @abstractmethod
+    def transfer_many(self, transfers: List[Tuple[int, int, float]],
+                      transaction_type: str = 'transfer') -> Optional[Dict[int, float]]:
+        """Пакет переводов по принципу все или ничего, возвращает новые балансы или None"""
+
+    @abstractmethod
+    def get_user_transactions(self, user_id: int, limit: int = 10) -> List[Transaction]:
+        """Последние транзакции пользователя"""
+
+    @abstractmethod
+    def archive_transactions(self, before: Optional[str] = None, batch_size: int = 5000) -> int:
+        """Перенос старых транзакций в архив, возвращает число перенесенных"""
+
+    # NFT
+
+    @abstractmethod
+    def add_nft(self, user_id: int, nft_address: str, collection_name: str, token_id: str, metadata: str) -> bool:
+        """Добавление NFT пользователю"""
+
+    @abstractmethod
+    def get_user_nfts(self, user_id: int) -> List[Nft]:
+        """NFT пользователя"""
+
+    # Каучсёрфинг
+
+    @abstractmethod
+    def add_couchsurfing_ad(self, user_id: int, country: str, city: str, settlement: str,
+                            start_date: str, end_date: str, description: str) -> int:
+        """Создание объявления, возвращает его id или -1"""
+
+    @abstractmethod
+    def get_couchsurfing_ad(self, ad_id: int) -> Optional[Ad]:
+        """Объявление по id"""
+
+    @abstractmethod
+    def get_couchsurfing_ads(self, country: Optional[str] = None, city: Optional[str] = None,
+                             settlement: Optional[str] = None, status: str = 'active') -> List[Ad]:
+        """Объявления с фильтрацией по месту, от новых к старым"""
+
+    @abstractmethod
+    def search_couchsurfing_ads(self, query: str) -> List[Ad]:
+        """Активные объявления, где query встречается в месте или описании"""
+
+    @abstractmethod
+    def get_popular_destinations(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """Города с наибольшим числом активных объявлений"""
+
+    @abstractmethod
+    def get_couchsurfing_stats(self, user_id: int) -> Dict[str, Any]:
+        """Статистика пользователя как хоста и как гостя"""
+
+    @abstractmethod
+    def add_booking(self, guest_id: int, host_id: int, ad_id: int, start_date: str, end_date: str) -> int:
+        """Создание бронирования, возвращает его id или -1"""
+
+    @abstractmethod
+    def count_active_bookings(self, ad_id: int) -> int:
+        """Число ожидающих и подтвержденных бронирований объявления"""
+
+    @abstractmethod
+    def get_user_bookings(self, user_id: int, as_guest: bool = True) -> List[Booking]:
+        """Бронирования пользователя с данными объявления и второго участника"""
+
+    @abstractmethod
+    def update_booking_status(self, booking_id: int, status: str) -> bool:
+        """Изменение статуса бронирования"""
+
+    @abstractmethod
+    def rate_booking_host(self, booking_id: int, rating: float) -> bool:
+        """Учет оценки хоста в рейтинге объявления бронирования"""
+
+    # Игра в кости
+
+    @abstractmethod
+    def add_dice_game(self, game_id: str, player1_id: int, player2_id: int, bet_amount: float) -> bool:
+        """Создание игры в кости"""
+
+    @abstractmethod
+    def update_dice_game_result(self, game_id: str, player1_dice: int, player2_dice: int,
+                                winner_id: Optional[int]) -> bool:
+        """Запись результата игры"""
+
+    @abstractmethod
+    def get_player_dice_games(self, player_id: int, limit: int = 10) -> List[DiceGame]:
+        """Последние игры игрока"""
+
+    @abstractmethod
+    def get_dice_leaderboard(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """Игроки с наибольшим выигрышем в завершенных играх"""
+
+    @abstractmethod
+    def get_dice_statistics(self) -> Dict[str, Any]:
+        """Общая статистика игр и статистика по дням за неделю"""
+
+    # Обслуживание
+
+    @abstractmethod
+    def get_daily_stats(self) -> Dict[str, Any]:
+        """Счетчики текущего дня: day, active_users, messages, rewards, nfts"""
+
+    def cache_stats(self) -> Optional[Dict[str, Any]]:
+        """Счетчики кэша пользователей, если реализация его использует"""
+        return None
+
+    def backup_sources(self) -> List[Tuple[str, Any]]:
+        """Базы для резервного копирования: (имя, ConnectionManager)"""
+        return []
+
+    def close(self):
+        """Освобождение ресурсов хранилища"""
+
+
+class ChatRepository(ABC):
+    """Доступ к данным чат-бота: очки за сообщения, рейтинги, победители месяцев и муты
+
+    Бот работает только через эти методы. Реализации: ChatDatabase (SQLite) в
+    storage/chat_database.py и InMemoryChatRepository (словари в памяти) для
+    тестов и локальной отладки. Суммы очков возвращаются словарями с ключами
+    total_points, today_points, week_points, month_points и ключами периодов
+    date, week_start, month_start.
+    """
+
+    # Пользователи
+
+    @abstractmethod
+    def add_user(self, user_id: int, username: str, first_name: str, last_name: str):
+        """Добавление пользователя или обновление его имени"""
+
+    @abstractmethod
+    def get_user_id_by_username(self, username: str) -> Optional[int]:
+        """user_id по текущему или прежнему username без учета регистра"""
+
+    @abstractmethod
+    def get_user_stats(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """Имя пользователя и суммы очков за все время и текущие периоды"""
+
+    # Очки
+
+    @abstractmethod
+    def add_points(self, user_id: int, points: int) -> Dict[str, Any]:
+        """Начисление очков (отрицательные - списание), возвращает новые суммы"""
+
+    def transfer_points(self, from_user_id: int, to_user_id: int, amount: int) -> Optional[Dict[int, Dict[str, Any]]]:
+        """Перевод очков, возвращает новые суммы обоих участников или None"""
+        return self.transfer_points_many([(from_user_id, to_user_id, amount)])
+
+    @abstractmethod
+    def transfer_points_many(self, transfers: List[Tuple[int, int, int]]) -> Optional[Dict[int, Dict[str, Any]]]:
+        """Пакет переводов по принципу все или ничего, None если кому-то не хватает очков"""
+
+    @abstractmethod
+    def rebuild_user_summary(self) -> int:
+        """Пересчет сумм пользователей по дневной истории, возвращает число пользователей"""
+
+    @abstractmethod
+    def current_periods(self) -> Dict[str, str]:
+        """Ключи текущих периодов: day, week, month"""
+
+    @abstractmethod
+    def get_daily_top(self, limit: int = 10) -> List[Tuple[str, int]]:
+        """Топ пользователей за день: [(username, очки)]"""
+
+    @abstractmethod
+    def get_weekly_top(self, limit: int = 10) -> List[Tuple[str, int]]:
+        """Топ пользователей за неделю"""
+
+    @abstractmethod
+    def get_monthly_top(self, limit: int = 10) -> List[Tuple[str, int]]:
+        """Топ пользователей за месяц"""
+
+    @abstractmethod
+    def get_user_rank(self, user_id: int, period: str) -> Optional[int]:
+        """Место пользователя в рейтинге за период ('day', 'week' или 'month')"""
+
+    # Победители месяцев
+
+    @abstractmethod
+    def save_monthly_winner(self, user_id: int, username: str, points: int, month_start: str):
+        """Сохранение победителя месяца"""
+
+    @abstractmethod
+    def get_monthly_winners(self) -> List[Tuple[str, int, str]]:
+        """Последние победители: [(username, очки, month_start)] от новых к старым"""
+
+    @abstractmethod
+    def get_previous_month_winner(self) -> Optional[Tuple[int, str, int]]:
+        """Победитель предыдущего месяца: (user_id, username, очки)"""
+
+    # Муты
+
+    @abstractmethod
+    def set_mute(self, user_id: int, until_timestamp: int):
+        """Мут пользователя до until_timestamp"""
+
+    @abstractmethod
+    def get_mute(self, user_id: int) -> int:
+        """Сохраненное окончание мута (0, если мута нет)"""
+
+    @abstractmethod
+    def clear_expired_mutes(self) -> int:
+        """Удаление истекших мутов, возвращает число удаленных"""
+
+    @abstractmethod
+    def is_muted(self, user_id: int) -> int:
+        """Оставшееся время мута в секундах, 0 если мута нет"""
+
+    # Обслуживание
+
+    def backup_sources(self) -> List[Tuple[str, Any]]:
+        """Базы для резервного копирования: (имя, ConnectionManager)"""
+        return []
+
+    def close(self):
+        """Освобождение ресурсов хранилища"""
@@ -0,0 +1,113 @@
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from storage.cache import LRUCache
+
+
+class RewardAccumulator:
+    """Отложенная пакетная запись наград за сообщения
+
+    Награды копятся в памяти и записываются одной транзакцией по таймеру
+    (flush вызывается из job_queue) или при накоплении max_events событий.
+    Для ответов пользователю хранится представление балансов в памяти:
+    последний баланс из базы плюс еще не записанные начисления. Кэш балансов
+    ограничен max_balances записями и подписан на изменения балансов в
+    хранилище (add_balance_listener), поэтому любая запись баланса в обход
+    накопителя - игра в кости, перевод, сам сброс наград - сбрасывает
+    кэшированное значение, и следующая награда перечитывает его из базы.
+    """
+
+    def __init__(self, adb, max_events: int = 100, max_balances: int = 10000):
+        self.adb = adb
+        self.max_events = max_events
+
+        self._pending: Dict[int, List] = {}      # user_id -> [сумма, сообщений]
+        self._in_flight: Dict[int, List] = {}    # то же, но уже отправлено в базу
+        self._transactions: List[Tuple[int, float, str]] = []
+        self._balances = LRUCache(max_balances, ttl=None)  # последний известный баланс в базе
+        self._lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+        adb.db.add_balance_listener(self.forget)
+
+    async def add_reward(self, user_id: int, amount: float) -> float:
+        """Учет награды за сообщение, возвращает актуальный баланс пользователя"""
+        balance = self._balances.get(user_id)
+        if balance is None:
+            # Чтение под блокировкой сброса: в базе нет ни одной отправленной, но
+            # не учтенной награды, поэтому баланс = прочитанное + ожидающие
+            async with self._lock:
+                generation = self._balances.generation()
+                user = await self.adb.get_user(user_id)
+                balance = user.gasjk_balance if user else 0.0
+                self._balances.put(user_id, balance, generation)
+
+        pending = self._pending.setdefault(user_id, [0.0, 0])
+        pending[0] += amount
+        pending[1] += 1
+        created_at = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        self._transactions.append((user_id, amount, created_at))
+
+        if len(self._transactions) >= self.max_events:
+            self._schedule_flush()
+
+        return balance + self._unsaved(user_id)
+
+    def _unsaved(self, user_id: int) -> float:
+        return sum(buffer[user_id][0] for buffer in (self._in_flight, self._pending) if user_id in buffer)
+
+    def balance(self, user_id: int) -> Optional[float]:
+        """Баланс с учетом незаписанных наград (None, если баланса нет в кэше)"""
+        balance = self._balances.get(user_id)
+        if balance is None:
+            return None
+        return balance + self._unsaved(user_id)
+
+    def forget(self, user_id: int):
+        """Сброс кэшированного баланса (подписчик на изменения балансов хранилища)"""
+        self._balances.invalidate(user_id)
+
+    @property
+    def pending_events(self) -> int:
+        return len(self._transactions)
+
+    def _schedule_flush(self):
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.get_running_loop().create_task(self.flush())
+
+    async def flush(self, context=None) -> bool:
+        """Запись накопленных наград одной транзакцией (подходит как задача job_queue)"""
+        async with self._lock:
+            if not self._transactions:
+                return True
+
+            self._in_flight, self._pending = self._pending, {}
+            transactions, self._transactions = self._transactions, []
+            rewards = [(user_id, amount, messages) for user_id, (amount, messages) in self._in_flight.items()]
+
+            # Без таймаута: запись, брошенная по таймауту, все равно может быть
+            # зафиксирована, и повторная отправка пакета начислила бы его дважды
+            try:
+                balances = await self.adb.apply_message_rewards(rewards, transactions, timeout=None)
+            except BaseException as e:
+                # Неизвестно, зафиксирована ли запись, поэтому пакет не повторяется
+                logging.error(f"Error flushing rewards, {len(transactions)} events may be lost: {e!r}")
+                self._in_flight = {}
+                if isinstance(e, Exception):
+                    return False
+                raise
+
+            if balances is None:
+                # Транзакция откатилась: возвращаем награды в очередь, чтобы не потерять их
+                for user_id, (amount, messages) in self._in_flight.items():
+                    pending = self._pending.setdefault(user_id, [0.0, 0])
+                    pending[0] += amount
+                    pending[1] += messages
+                self._transactions[:0] = transactions
+                self._in_flight = {}
+                return False
+
+            # Балансы записанных пользователей уже сброшены подпиской на изменения
+            self._in_flight = {}
+            return True
@@ -0,0 +1,55 @@
+import datetime
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+import pytz
+
+# Часовой пояс, в котором начинаются новые сутки, неделя и месяц
+DEFAULT_TIMEZONE = 'Europe/Moscow'
+
+
+def period_keys(day: datetime.date) -> Dict[str, str]:
+    """Ключи периодов для даты: день, неделя (понедельник) и месяц (первое число)"""
+    return {
+        'day': day.isoformat(),
+        'week': (day - datetime.timedelta(days=day.weekday())).isoformat(),
+        'month': day.replace(day=1).isoformat()
+    }
+
+
+def previous_month(month_start: str) -> str:
+    """Первое число месяца, предшествующего месяцу month_start (даты ISO)"""
+    day = datetime.date.fromisoformat(month_start) - datetime.timedelta(days=1)
+    return day.replace(day=1).isoformat()
+
+
+class PeriodClock:
+    """Границы текущих периодов в заданном часовом поясе
+
+    Ключи периодов и момент следующей полуночи вычисляются один раз за сутки;
+    до этого момента current() только сравнивает отметку времени.
+    """
+
+    def __init__(self, timezone: str = DEFAULT_TIMEZONE, time_func: Callable[[], float] = time.time):
+        self.tz = pytz.timezone(timezone)
+        self.time_func = time_func
+        self._periods: Optional[Dict[str, str]] = None
+        self._next_rollover = 0.0
+        self._lock = threading.Lock()
+
+    def current(self) -> Tuple[Dict[str, str], bool]:
+        """Ключи текущих периодов и признак того, что с прошлого вызова наступили новые сутки"""
+        now = self.time_func()
+        with self._lock:
+            if self._periods is not None and now < self._next_rollover:
+                return self._periods, False
+
+            day = datetime.datetime.fromtimestamp(now, self.tz).date()
+            next_midnight = datetime.datetime.combine(day + datetime.timedelta(days=1), datetime.time())
+            self._next_rollover = self.tz.localize(next_midnight).timestamp()
+
+            periods = period_keys(day)
+            rolled_over = self._periods is not None and periods != self._periods
+            self._periods = periods
+            return periods, rolled_over
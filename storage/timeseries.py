@@ -0,0 +1,187 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from array import array
+from typing import Callable, Dict, List, Optional, Sequence
+
+SPARK_CHARS = '▁▂▃▄▅▆▇█'
+
+_MAGIC = b'TSR1'
+
+
+class RingSeries:
+    """Последние size интервалов длиной resolution секунд в кольцевом буфере array('d')
+
+    head - номер самого нового интервала (время // resolution); интервалы,
+    через которые прошло время без событий, обнуляются при сдвиге.
+    """
+
+    __slots__ = ('resolution', 'values', 'head')
+
+    def __init__(self, size: int, resolution: int, head: int = 0, values: Optional[array] = None):
+        self.resolution = resolution
+        self.values = values if values is not None else array('d', bytes(8 * size))
+        self.head = head
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def _advance(self, bucket: int):
+        size = len(self.values)
+        if bucket - self.head >= size:
+            for i in range(size):
+                self.values[i] = 0.0
+        else:
+            for b in range(self.head + 1, bucket + 1):
+                self.values[b % size] = 0.0
+        self.head = bucket
+
+    def add(self, timestamp: float, value: float = 1.0) -> bool:
+        """Добавление value в интервал timestamp, True если начался новый интервал"""
+        bucket = int(timestamp // self.resolution)
+        rolled = bucket > self.head
+        if rolled:
+            self._advance(bucket)
+        elif self.head - bucket >= len(self.values):
+            return False  # слишком старое событие
+        self.values[bucket % len(self.values)] += value
+        return rolled
+
+    def last(self, count: int, now: float) -> List[float]:
+        """Значения последних count интервалов до now, от старых к новым"""
+        bucket = int(now // self.resolution)
+        size = len(self.values)
+        count = min(count, size)
+        result = []
+        for b in range(bucket - count + 1, bucket + 1):
+            if b > self.head or self.head - b >= size:
+                result.append(0.0)
+            else:
+                result.append(self.values[b % size])
+        return result
+
+
+def sparkline(values: Sequence[float], width: Optional[int] = None) -> str:
+    """Строка из блоков ▁..█, при заданной width значения суммируются по группам"""
+    values = list(values)
+    if width and len(values) > width:
+        step = len(values) / width
+        values = [sum(values[int(i * step):int((i + 1) * step)]) for i in range(width)]
+    top = max(values, default=0)
+    if top <= 0:
+        return SPARK_CHARS[0] * len(values)
+    scale = len(SPARK_CHARS) - 1
+    return ''.join(SPARK_CHARS[round(value / top * scale)] for value in values)
+
+
+class TimeSeriesStore:
+    """Счетчики событий по минутам и по часам в памяти процесса
+
+    Для каждой метрики - два кольцевых буфера: минутный (по умолчанию сутки)
+    и часовой (две недели). Запись - сложение в массиве, чтение не обращается
+    ни к базе, ни к диску. При смене часа буферы сохраняются в файл path
+    (заголовок JSON и сырые массивы double), при запуске загружаются обратно.
+    Внутри цикла событий это сохранение выполняется в пуле потоков, чтобы
+    запись файла не задерживала обработку сообщений; при остановке владелец
+    вызывает save() сам.
+    """
+
+    def __init__(self, metrics: Sequence[str], path: Optional[str] = None, minutes: int = 24 * 60,
+                 hours: int = 14 * 24, time_func: Callable[[], float] = time.time):
+        self.metrics = list(metrics)
+        self.path = path
+        self.time_func = time_func
+        self.minute: Dict[str, RingSeries] = {name: RingSeries(minutes, 60) for name in self.metrics}
+        self.hour: Dict[str, RingSeries] = {name: RingSeries(hours, 3600) for name in self.metrics}
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        if path and os.path.exists(path):
+            try:
+                self.load()
+            except (OSError, ValueError) as e:
+                logging.error(f"Failed to load time series from {path}: {e}")
+
+    def record(self, metric: str, value: float = 1.0):
+        """Учет события метрики в текущей минуте и текущем часе"""
+        now = self.time_func()
+        with self._lock:
+            self.minute[metric].add(now, value)
+            rolled = self.hour[metric].add(now, value)
+        if rolled and self.path:
+            try:
+                asyncio.get_running_loop().run_in_executor(None, self.save)
+            except RuntimeError:
+                # Вне цикла событий (скрипты, тесты) сохраняем сразу
+                self.save()
+
+    def minutes(self, metric: str, count: int = 60) -> List[float]:
+        with self._lock:
+            return self.minute[metric].last(count, self.time_func())
+
+    def hours(self, metric: str, count: int = 24) -> List[float]:
+        with self._lock:
+            return self.hour[metric].last(count, self.time_func())
+
+    def summary(self, labels: Optional[Dict[str, str]] = None, width: int = 30) -> str:
+        """Текстовая сводка: спарклайны за час (по минутам) и за сутки (по часам)"""
+        lines = []
+        for metric in self.metrics:
+            last_hour = self.minutes(metric, 60)
+            last_day = self.hours(metric, 24)
+            lines.append(f"{(labels or {}).get(metric, metric)}: {sum(last_hour):g} за час, "
+                         f"{sum(last_day):g} за сутки, {sum(last_hour[-5:]) / 5:.1f}/мин за 5 мин")
+            lines.append(f"  60 мин {sparkline(last_hour, width)}")
+            lines.append(f"  24 ч   {sparkline(last_day)}")
+        return '\n'.join(lines)
+
+    def save(self):
+        """Сохранение буферов в файл (атомарно через временный файл, потокобезопасно)"""
+        if not self.path:
+            return
+        with self._lock:
+            header = {
+                'metrics': self.metrics,
+                'minute': [len(self.minute[m]) for m in self.metrics],
+                'hour': [len(self.hour[m]) for m in self.metrics],
+                'heads': [[self.minute[m].head, self.hour[m].head] for m in self.metrics],
+            }
+            payload = [series.values.tobytes() for m in self.metrics for series in (self.minute[m], self.hour[m])]
+        tmp_path = self.path + '.tmp'
+        # Сохранения из пула потоков и при остановке не пишут временный файл одновременно
+        with self._save_lock:
+            try:
+                with open(tmp_path, 'wb') as f:
+                    encoded = json.dumps(header).encode('utf-8')
+                    f.write(_MAGIC + len(encoded).to_bytes(4, 'little') + encoded)
+                    for chunk in payload:
+                        f.write(chunk)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                logging.error(f"Failed to save time series to {self.path}: {e}")
+
+    def load(self):
+        """Загрузка буферов из файла; метрики с другим размером буфера пропускаются"""
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        if data[:4] != _MAGIC:
+            raise ValueError("not a time series file")
+        length = int.from_bytes(data[4:8], 'little')
+        header = json.loads(data[8:8 + length].decode('utf-8'))
+        offset = 8 + length
+        with self._lock:
+            for metric, minute_size, hour_size, (minute_head, hour_head) in zip(
+                    header['metrics'], header['minute'], header['hour'], header['heads']):
+                arrays = []
+                for size in (minute_size, hour_size):
+                    values = array('d')
+                    values.frombytes(data[offset:offset + 8 * size])
+                    offset += 8 * size
+                    arrays.append(values)
+                if metric not in self.minute or len(self.minute[metric]) != minute_size \
+                        or len(self.hour[metric]) != hour_size:
+                    continue
+                self.minute[metric] = RingSeries(minute_size, 60, minute_head, arrays[0])
+                self.hour[metric] = RingSeries(hour_size, 3600, hour_head, arrays[1])
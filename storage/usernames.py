@@ -0,0 +1,141 @@
+import sqlite3
+import threading
+from typing import Dict, List, Optional
+
+from storage.migrations import Statement
+
+
+def normalize_username(username: Optional[str]) -> Optional[str]:
+    """Ключ поиска: без '@' и без учета регистра (так сравнивает Telegram)"""
+    if not username:
+        return None
+    key = username.strip().lstrip('@').lower()
+    return key or None
+
+
+def username_migration(recency_column: str) -> List[Statement]:
+    """Шаги миграции: история username и уникальный индекс без учета регистра
+
+    Перед созданием индекса повторяющиеся username (пользователь сменил имя,
+    а старое занял другой) остаются только у записи с наибольшим recency_column,
+    у остальных они переносятся в историю.
+    """
+    def release_duplicates(conn: sqlite3.Connection):
+        conn.execute(f'''
+            INSERT OR REPLACE INTO username_history (username, user_id)
+            SELECT username, user_id FROM users u
+            WHERE username IS NOT NULL AND EXISTS (
+                SELECT 1 FROM users o
+                WHERE o.username = u.username COLLATE NOCASE AND o.user_id != u.user_id
+                  AND (o.{recency_column}, o.user_id) > (u.{recency_column}, u.user_id)
+            )
+        ''')
+        conn.execute('''
+            UPDATE users SET username = NULL
+            WHERE user_id IN (SELECT h.user_id FROM username_history h
+                              WHERE h.username = users.username COLLATE NOCASE)
+        ''')
+
+    return [
+        '''
+            CREATE TABLE IF NOT EXISTS username_history (
+                username TEXT NOT NULL COLLATE NOCASE,
+                user_id INTEGER NOT NULL,
+                changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (username, user_id)
+            )
+        ''',
+        release_duplicates,
+        'DROP INDEX IF EXISTS idx_users_username',
+        'CREATE UNIQUE INDEX IF NOT EXISTS idx_users_username_nocase ON users (username COLLATE NOCASE)',
+    ]
+
+
+class UsernameDirectory:
+    """Справочник username -> user_id в памяти
+
+    Поиск по текущему username, а для переименованных пользователей - по
+    прежним именам из username_history. Изменения пишутся в базу через
+    record() в транзакции вызывающего и применяются в памяти через set().
+    """
+
+    def __init__(self):
+        self._current: Dict[str, int] = {}
+        self._previous: Dict[str, int] = {}
+        self._usernames: Dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    def load(self, conn: sqlite3.Connection):
+        """Заполнение справочника из users и username_history"""
+        current, previous, usernames = {}, {}, {}
+        for user_id, username in conn.execute('SELECT user_id, username FROM username_history ORDER BY changed_at'):
+            previous[normalize_username(username)] = user_id
+        for user_id, username in conn.execute('SELECT user_id, username FROM users WHERE username IS NOT NULL'):
+            key = normalize_username(username)
+            if key:
+                current[key] = user_id
+                usernames[user_id] = username
+        with self._lock:
+            self._current, self._previous, self._usernames = current, previous, usernames
+
+    def resolve(self, username: str) -> Optional[int]:
+        """user_id по текущему или прежнему username"""
+        key = normalize_username(username)
+        if key is None:
+            return None
+        user_id = self._current.get(key)
+        if user_id is None:
+            user_id = self._previous.get(key)
+        return user_id
+
+    def username(self, user_id: int) -> Optional[str]:
+        return self._usernames.get(user_id)
+
+    def is_changed(self, user_id: int, username: Optional[str]) -> bool:
+        return normalize_username(username) != normalize_username(self._usernames.get(user_id))
+
+    def record(self, conn: sqlite3.Connection, user_id: int, username: Optional[str]) -> bool:
+        """Запись смены username в базу (в текущей транзакции), True если имя изменилось
+
+        Имя освобождается у другого пользователя, если он держал его раньше,
+        а старое имя пользователя сохраняется в истории.
+        """
+        if not self.is_changed(user_id, username):
+            return False
+        history = []
+        if normalize_username(username):
+            displaced = conn.execute('''
+                UPDATE users SET username = NULL
+                WHERE username = ? COLLATE NOCASE AND user_id != ?
+                RETURNING user_id
+            ''', (username, user_id)).fetchall()
+            history = [(username, other_id) for (other_id,) in displaced]
+        old = self._usernames.get(user_id)
+        if old:
+            history.append((old, user_id))
+        conn.executemany('''
+            INSERT OR REPLACE INTO username_history (username, user_id, changed_at)
+            VALUES (?, ?, CURRENT_TIMESTAMP)
+        ''', history)
+        conn.execute('UPDATE users SET username = ? WHERE user_id = ?', (username, user_id))
+        return True
+
+    def set(self, user_id: int, username: Optional[str]):
+        """Применение смены username в памяти после коммита"""
+        if not self.is_changed(user_id, username):
+            return
+        key = normalize_username(username)
+        with self._lock:
+            old = self._usernames.pop(user_id, None)
+            if old:
+                old_key = normalize_username(old)
+                self._current.pop(old_key, None)
+                self._previous[old_key] = user_id
+            if key is None:
+                return
+            other_id = self._current.get(key)
+            if other_id is not None and other_id != user_id:
+                self._usernames.pop(other_id, None)
+                self._previous[key] = other_id
+            self._current[key] = user_id
+            self._usernames[user_id] = username
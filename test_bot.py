@@ -8,6 +8,7 @@ import sys
 import os
 import sqlite3
 import datetime
+import time
 import pytz
 
 # Добавляем текущую директорию в путь для импорта
@@ -165,6 +166,13 @@ def test_database():
         assert stats['total_points'] >= 100, "Очки не сохранились"
         print("✅ Получение статистики работает")
         
+        # Повторное начисление обновляет строку и сразу возвращает новые суммы
+        totals = db.add_points(user_id, 50)
+        assert totals['today_points'] == 150, "add_points должен вернуть сумму за день"
+        assert totals['week_points'] == 150, "add_points должен вернуть сумму за неделю"
+        assert totals['month_points'] == 150, "add_points должен вернуть сумму за месяц"
+        print("✅ Суммы после начисления возвращаются сразу")
+        
         # Тестируем топы
         daily_top = db.get_daily_top(5)
         weekly_top = db.get_weekly_top(5)
@@ -189,6 +197,1358 @@ def test_database():
         print(f"❌ Ошибка базы данных: {e}")
         return False
 
+def test_async_database():
+    """Тест неблокирующей обертки над базой данных"""
+    print("\n⚡ Тестирование асинхронной базы данных...")
+    
+    try:
+        import asyncio
+        import time
+        from database import Database
+        from storage.async_database import AsyncDatabase
+        
+        async def scenario():
+            adb = AsyncDatabase(Database(":memory:"), timeout=1.0)
+            
+            await adb.add_user(777, "async_user", "Async", "User")
+            await adb.add_points(777, 50)
+            stats = await adb.get_user_stats(777)
+            assert stats['total_points'] == 50, "Очки не сохранились через AsyncDatabase"
+            
+            # Медленный запрос прерывается по таймауту и не блокирует цикл событий
+            try:
+                await adb.run(time.sleep, 0.5, timeout=0.05)
+                assert False, "Ожидался таймаут"
+            except asyncio.TimeoutError:
+                pass
+            
+            await adb.close()
+            
+            # Таймаут по умолчанию только у чтения: запись после таймаута все равно
+            # зафиксировалась бы, поэтому ее дожидаемся
+            class SlowDatabase:
+                def get_value(self):
+                    time.sleep(0.2)
+                    return 1
+                
+                def set_value(self):
+                    time.sleep(0.2)
+                    return True
+                
+                def close(self):
+                    pass
+            
+            slow = AsyncDatabase(SlowDatabase(), timeout=0.05)
+            try:
+                await slow.get_value()
+                assert False, "Ожидался таймаут чтения"
+            except asyncio.TimeoutError:
+                pass
+            assert await slow.set_value(), "Запись не должна прерываться таймаутом по умолчанию"
+            await slow.close()
+        
+        asyncio.run(scenario())
+        print("✅ Асинхронная база данных работает")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Ошибка асинхронной базы данных: {e}")
+        return False
+
+def load_gasjk_database():
+    """Загрузка database/database.py (database.py в корне перекрывает пакет)"""
+    import importlib.util
+    spec = importlib.util.spec_from_file_location("gasjk_database", os.path.join("database", "database.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def test_reward_accumulator():
+    """Тест пакетного начисления наград за сообщения"""
+    print("\n💰 Тестирование пакетного начисления наград...")
+    
+    try:
+        import asyncio
+        import time
+        from storage.async_database import AsyncDatabase
+        from storage.reward_accumulator import RewardAccumulator
+        
+        async def scenario():
+            db = load_gasjk_database().Database(":memory:")
+            adb = AsyncDatabase(db)
+            rewards = RewardAccumulator(adb, max_events=1000)
+            db.add_user(555, "reward_user", "Reward", "User")
+            
+            for _ in range(5):
+                balance = await rewards.add_reward(555, 0.1)
+            assert abs(balance - 0.5) < 1e-9, "Баланс в памяти должен учитывать незаписанные награды"
+            assert db.get_user(555)['gasjk_balance'] == 0, "До сброса база не должна меняться"
+            
+            assert await rewards.flush(), "Сброс наград не удался"
+            user = db.get_user(555)
+            assert abs(user['gasjk_balance'] - 0.5) < 1e-9, "Баланс не записан в базу"
+            assert user['messages_count'] == 5, "Счетчик сообщений не записан в базу"
+            assert len(db.get_user_transactions(555, 10)) == 5, "Транзакции не записаны в базу"
+            
+            # Изменение баланса в обход накопителя (игра, перевод) сбрасывает его кэш
+            await rewards.add_reward(555, 0.1)
+            await adb.update_user_balance(555, -0.5)
+            assert rewards.balance(555) is None, "Кэш баланса не сброшен после записи в обход накопителя"
+            balance = await rewards.add_reward(555, 0.1)
+            assert abs(balance - 0.2) < 1e-9, f"Баланс после сброса кэша неверен: {balance}"
+            await rewards.flush()
+            assert abs(db.get_user(555)['gasjk_balance'] - 0.2) < 1e-9, "Баланс в базе неверен"
+            
+            # Кэш балансов ограничен
+            small = RewardAccumulator(adb, max_events=1000, max_balances=2)
+            for user_id in (555, 556, 557):
+                await small.add_reward(user_id, 0.0)
+            assert small.balance(555) is None and small.balance(557) == 0.0, "Кэш балансов не ограничен"
+            
+            await adb.close()
+            
+            # Медленная запись дольше таймаута чтения не должна начисляться дважды
+            class SlowRewards:
+                def __init__(self, db):
+                    self.db = db
+                    self.failures = 1
+                
+                def get_user(self, user_id):
+                    return self.db.get_user(user_id)
+                
+                def add_balance_listener(self, callback):
+                    self.db.add_balance_listener(callback)
+                
+                def apply_message_rewards(self, rewards, transactions):
+                    time.sleep(0.2)
+                    if self.failures:
+                        # Первая попытка откатывается
+                        self.failures -= 1
+                        return None
+                    return self.db.apply_message_rewards(rewards, transactions)
+                
+                def close(self):
+                    pass
+            
+            db = load_gasjk_database().Database(":memory:")
+            db.add_user(556, "slow_reward_user", "Slow", "User")
+            adb = AsyncDatabase(SlowRewards(db), timeout=0.05)
+            rewards = RewardAccumulator(adb, max_events=1000)
+            for _ in range(3):
+                await rewards.add_reward(556, 0.1)
+            assert not await rewards.flush(), "Откат записи должен вернуть награды в очередь"
+            assert rewards.pending_events == 3, "Награды после отката должны остаться в очереди"
+            assert await rewards.flush(), "Запись не должна прерываться таймаутом"
+            assert await rewards.flush(), "Пустой сброс должен быть успешным"
+            user = db.get_user(556)
+            assert abs(user['gasjk_balance'] - 0.3) < 1e-9, f"Награды начислены неверно: {user['gasjk_balance']}"
+            assert len(db.get_user_transactions(556, 10)) == 3, "Транзакции наград задвоились"
+            await adb.close()
+        
+        asyncio.run(scenario())
+        print("✅ Пакетное начисление наград работает")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Ошибка пакетного начисления наград: {e}")
+        return False
+
+def test_row_models():
+    """Тест моделей строк"""
+    print("\n🧱 Тестирование моделей строк...")
+    
+    try:
+        from storage.models import Ad, Transaction, User
+        
+        db = load_gasjk_database().Database(":memory:")
+        db.add_user(777, "model_user", "Test", "User")
+        db.add_transaction(0, 777, 1.5, 'message_reward')
+        db.add_couchsurfing_ad(777, "Россия", "Москва", "", "2030-01-01", "2030-01-10", "Диван")
+        
+        user = db.get_user(777)
+        assert isinstance(user, User) and user.username == "model_user", f"Неверная модель пользователя: {user!r}"
+        assert user['gasjk_balance'] == user.gasjk_balance == 0, "Доступ по ключу должен совпадать с атрибутом"
+        assert not hasattr(user, '__dict__'), "Модель не должна хранить __dict__"
+        
+        transactions = db.get_user_transactions(777)
+        assert [type(tx) for tx in transactions] == [Transaction], "Транзакции должны быть моделями"
+        assert transactions[0].amount == 1.5 and transactions[0].to_user_id == 777, "Неверные поля транзакции"
+        
+        ads = db.get_couchsurfing_ads(country="Россия")
+        assert len(ads) == 1 and ads[0].description == "Диван" and ads[0].host_name is None, "Неверная модель объявления"
+        
+        # Столбцы в другом порядке раскладываются по именам, построитель кэшируется
+        build = Ad.builder(('city', 'id', 'extra'))
+        assert Ad.builder(('city', 'id', 'extra')) is build, "Построитель должен кэшироваться"
+        ad = build(("Казань", 5, "x"))
+        assert ad.id == 5 and ad.city == "Казань" and ad.country is None, f"Неверная раскладка столбцов: {ad!r}"
+        print("✅ Модели строк работают")
+        
+        db.close()
+        return True
+        
+    except Exception as e:
+        print(f"❌ Ошибка моделей строк: {e}")
+        return False
+
+def test_migrations():
+    """Тест миграций схемы и индексов для частых запросов"""
+    print("\n🧱 Тестирование миграций и индексов...")
+    
+    try:
+        import database
+        from storage.migrations import apply_migrations, get_schema_version, explain_query_plan
+        
+        chat_db = database.Database(":memory:")
+        gasjk_module = load_gasjk_database()
+        gasjk_db = gasjk_module.Database(":memory:")
+        
+        # Повторный запуск не выполняет уже примененные миграции
+        for db, migrations in ((chat_db, database.MIGRATIONS), (gasjk_db, gasjk_module.MIGRATIONS)):
+            with db.pool.read() as conn:
+                version = get_schema_version(conn)
+            assert version == migrations[-1].version, f"Ожидалась версия {migrations[-1].version}, получена {version}"
+            assert apply_migrations(db.pool, migrations) == version, "Миграции не должны применяться повторно"
+        print("✅ Версия схемы сохраняется, миграции применяются один раз")
+        
+        hot_queries = [
+            (chat_db, "SELECT u.username, dp.points FROM daily_points dp JOIN users u ON dp.user_id = u.user_id "
+                      "WHERE dp.date = CURRENT_DATE ORDER BY dp.points DESC LIMIT ?", (10,)),
+            (chat_db, "SELECT u.username, wp.points FROM weekly_points wp JOIN users u ON wp.user_id = u.user_id "
+                      "WHERE wp.week_start = ? ORDER BY wp.points DESC LIMIT ?", ('2024-01-01', 10)),
+            (chat_db, "SELECT u.username, mp.points FROM monthly_points mp JOIN users u ON mp.user_id = u.user_id "
+                      "WHERE mp.month_start = ? ORDER BY mp.points DESC LIMIT ?", ('2024-01-01', 10)),
+            (chat_db, "SELECT user_id FROM users WHERE username = ? COLLATE NOCASE", ('test_user',)),
+            (gasjk_db, "SELECT * FROM (SELECT * FROM transactions WHERE from_user_id = :user_id "
+                       "ORDER BY created_at DESC LIMIT :limit) UNION ALL "
+                       "SELECT * FROM (SELECT * FROM transactions WHERE to_user_id = :user_id "
+                       "AND from_user_id != :user_id ORDER BY created_at DESC LIMIT :limit) "
+                       "ORDER BY created_at DESC LIMIT :limit", {'user_id': 1, 'limit': 10}),
+            (gasjk_db, "SELECT * FROM couchsurfing_ads WHERE status = ? AND country = ? AND city = ? "
+                       "ORDER BY created_at DESC", ('active', 'Россия', 'Москва')),
+            (gasjk_db, "SELECT * FROM users WHERE username = ? COLLATE NOCASE", ('test_user',)),
+            (gasjk_db, "SELECT * FROM bookings WHERE guest_id = ? ORDER BY created_at DESC", (1,)),
+            (gasjk_db, "SELECT * FROM bookings WHERE host_id = ? ORDER BY created_at DESC", (1,)),
+            (gasjk_db, "SELECT COUNT(*) FROM bookings WHERE ad_id = ? AND status IN ('pending', 'confirmed')", (1,)),
+        ]
+        
+        for db, query, params in hot_queries:
+            with db.pool.read() as conn:
+                plan = explain_query_plan(conn, query, params)
+            scans = [step for step in plan if step.startswith('SCAN') and 'subquery' not in step]
+            assert not scans, f"Полный просмотр таблицы в запросе {query!r}: {plan}"
+            assert any('USING' in step and 'INDEX' in step for step in plan), f"Индекс не используется: {query!r}: {plan}"
+        
+        print("✅ Все частые запросы используют индексы")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Ошибка миграций: {e}")
+        return False
+
+def test_leaderboards():
+    """Тест рейтингов в памяти"""
+    print("\n🏆 Тестирование рейтингов в памяти...")
+    
+    try:
+        import random
+        from database import Database
+        from storage.leaderboard import Leaderboard, LeaderboardService
+        
+        # Рейтинг совпадает с полной сортировкой после случайных обновлений
+        board = Leaderboard('2024-01-01')
+        scores = {}
+        for _ in range(2000):
+            user_id = random.randint(1, 200)
+            scores[user_id] = random.randint(-50, 500)
+            board.set(user_id, scores[user_id])
+        expected = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        assert list(board.top()) == expected, "Порядок рейтинга не совпадает с сортировкой"
+        for position, (user_id, _) in enumerate(expected, 1):
+            assert board.rank(user_id) == position, f"Неверное место пользователя {user_id}"
+        print("✅ Порядок и места в рейтинге корректны")
+        
+        # Смена периода начинает рейтинг заново, запоздавшие записи старого периода игнорируются
+        service = LeaderboardService()
+        service.set_username(1, "first")
+        service.set_username(2, "second")
+        totals = {'today_points': 10, 'week_points': 10, 'month_points': 10,
+                  'date': '2024-01-07', 'week_start': '2024-01-01', 'month_start': '2024-01-01'}
+        service.record(1, totals)
+        service.record(2, dict(totals, date='2024-01-08', week_start='2024-01-08'))
+        assert service.top('week', '2024-01-08', 10) == [("second", 10)], "Неделя не сброшена при смене периода"
+        service.record(1, totals)
+        assert service.top('week', '2024-01-08', 10) == [("second", 10)], "Старый период не должен попадать в новый"
+        assert service.top('month', '2024-01-01', 10) == [("first", 10), ("second", 10)], "Месяц не должен сбрасываться"
+        print("✅ Смена периода обрабатывается корректно")
+        
+        # Топы из базы совпадают с рейтингом, загруженным при старте
+        db = Database(":memory:")
+        for user_id in range(1, 6):
+            db.add_user(user_id, f"user_{user_id}", "Test", "User")
+            db.add_points(user_id, user_id * 10)
+        top = db.get_weekly_top(3)
+        assert top == [("user_5", 50), ("user_4", 40), ("user_3", 30)], f"Неверный топ недели: {top}"
+        assert db.get_user_rank(4, 'month') == 2, "Неверное место за месяц"
+        db.load_leaderboards()
+        assert db.get_weekly_top(3) == top, "Рейтинг после загрузки из базы отличается"
+        print("✅ Топы за период работают без запросов к базе")
+        
+        return True
+        
+    except Exception as e:
+        print(f"❌ Ошибка рейтингов: {e}")
+        return False
+
+def test_user_summary():
+    """Тест сводки очков пользователя"""
+    print("\n📊 Тестирование сводки очков...")
+    
+    try:
+        from database import Database
+        
+        db = Database(":memory:")
+        for user_id in range(1, 4):
+            db.add_user(user_id, f"user_{user_id}", "Test", "User")
+        totals = None
+        for points in (5, 7, 11):
+            totals = db.add_points(1, points)
+        db.add_points(2, 3)
+        assert totals['total_points'] == 23, f"Неверная общая сумма: {totals}"
+        
+        # Исторические очки попадают в общую сумму, но не в текущие периоды
+        with db.pool.write() as conn:
+            conn.execute("INSERT INTO daily_points (user_id, date, points) VALUES (1, '2000-01-01', 100)")
+        assert db.rebuild_user_summary() == 3, "Сводка должна быть пересчитана для всех пользователей"
+        assert db.rebuild_user_summary() == 3, "Повторный пересчет должен давать тот же результат"
+        
+        with db.pool.read() as conn:
+            expected = dict(conn.execute('SELECT user_id, SUM(points) FROM daily_points GROUP BY user_id').fetchall())
+        for user_id in range(1, 4):
+            stats = db.get_user_stats(user_id)
+            assert stats['total_points'] == expected.get(user_id, 0), f"Сводка расходится с историей: {stats}"
+        stats = db.get_user_stats(1)
+        assert stats['today_points'] == 23 and stats['month_points'] == 23, f"Неверные суммы за период: {stats}"
+        print("✅ Сводка совпадает с историей начислений")
+        
+        return True
+        
+    except Exception as e:
+        print(f"❌ Ошибка сводки очков: {e}")
+        return False
+
+def test_period_rollup():
+    """Тест свертки дневных очков в недельные и месячные"""
+    print("\n🗓 Тестирование свертки периодов...")
+    
+    try:
+        import pytz
+        from database import Database
+        from storage.rollup import PeriodClock
+        
+        tz = pytz.timezone('Europe/Moscow')
+        now = [tz.localize(datetime.datetime(2024, 1, 30, 23, 30)).timestamp()]
+        
+        db = Database(":memory:", clock=PeriodClock('Europe/Moscow', time_func=lambda: now[0]))
+        db.add_user(1, "user_1", "Test", "User")
+        
+        # 23:30 по Москве - это еще 30 января, хотя в UTC уже 20:30 того же дня
+        totals = db.add_points(1, 10)
+        assert totals['date'] == '2024-01-30', f"Неверный ключ дня: {totals}"
+        
+        # Полночь по Москве закрывает день и сворачивает его в агрегаты
+        now[0] += 3600
+        totals = db.add_points(1, 5)
+        assert totals['date'] == '2024-01-31' and totals['today_points'] == 5, f"День не сменился: {totals}"
+        assert totals['week_points'] == 15 and totals['month_points'] == 15, f"Неверные суммы: {totals}"
+        with db.pool.read() as conn:
+            weekly = conn.execute('SELECT week_start, points FROM weekly_points').fetchall()
+            monthly = conn.execute('SELECT month_start, points FROM monthly_points').fetchall()
+        assert weekly == [('2024-01-29', 10)], f"Неверная недельная свертка: {weekly}"
+        assert monthly == [('2024-01-01', 10)], f"Неверная месячная свертка: {monthly}"
+        
+        # Новый месяц сбрасывает месячную сумму, но не недельную
+        now[0] += 86400
+        totals = db.add_points(1, 1)
+        assert totals['month_start'] == '2024-02-01' and totals['month_points'] == 1, f"Месяц не сменился: {totals}"
+        assert totals['week_points'] == 16, f"Неделя не должна сбрасываться: {totals}"
+        assert db.compact_rollups() == 0, "Повторная свертка не должна ничего переносить"
+        with db.pool.read() as conn:
+            monthly = conn.execute('SELECT month_start, points FROM monthly_points ORDER BY 1').fetchall()
+        assert monthly == [('2024-01-01', 15)], f"Неверная месячная свертка: {monthly}"
+        print("✅ Границы периодов и свертка корректны")
+        
+        # Миграция старой базы пересчитывает сводку в часовом поясе часов базы:
+        # 1 февраля 01:00 по Москве в UTC еще 31 января
+        import tempfile
+        import database
+        from storage.connection import ConnectionManager
+        from storage.migrations import apply_migrations
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "old.db")
+            pool = ConnectionManager(path)
+            apply_migrations(pool, database.MIGRATIONS[:2])
+            with pool.write() as conn:
+                conn.execute("INSERT INTO users (user_id, username) VALUES (1, 'user_1')")
+                conn.execute("INSERT INTO daily_points (user_id, date, points) VALUES (1, '2024-02-01', 7)")
+            pool.close()
+            moment = tz.localize(datetime.datetime(2024, 2, 1, 1, 0)).timestamp()
+            migrated = Database(path, clock=PeriodClock('UTC', time_func=lambda: moment))
+            with migrated.pool.read() as conn:
+                summary = conn.execute('SELECT day, today_points, month_start FROM user_summary').fetchall()
+            migrated.close()
+        assert summary == [('2024-01-31', 0, '2024-01-01')], f"Сводка пересчитана не в часовом поясе базы: {summary}"
+        print("✅ Миграция сводки учитывает часовой пояс")
+        
+        # Миграция 4 пересобирает из дневных записей только периоды, где они есть;
+        # старые агрегаты без дневной истории сохраняются
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "aggregates.db")
+            pool = ConnectionManager(path)
+            apply_migrations(pool, database.MIGRATIONS[:3])
+            with pool.write() as conn:
+                conn.execute("INSERT INTO users (user_id, username) VALUES (1, 'user_1')")
+                conn.executemany("INSERT INTO daily_points (user_id, date, points) VALUES (1, ?, ?)",
+                                 [('2024-01-29', 4), ('2024-01-30', 6)])
+                conn.executemany("INSERT INTO weekly_points (user_id, week_start, points) VALUES (1, ?, ?)",
+                                 [('2024-01-29', 99), ('2023-06-05', 30)])
+                conn.executemany("INSERT INTO monthly_points (user_id, month_start, points) VALUES (1, ?, ?)",
+                                 [('2024-01-01', 99), ('2023-06-01', 120)])
+            pool.close()
+            migrated = Database(path, clock=PeriodClock('Europe/Moscow', time_func=lambda: moment))
+            with migrated.pool.read() as conn:
+                weekly = conn.execute('SELECT week_start, points FROM weekly_points ORDER BY 1').fetchall()
+                monthly = conn.execute('SELECT month_start, points FROM monthly_points ORDER BY 1').fetchall()
+            migrated.close()
+        assert weekly == [('2023-06-05', 30), ('2024-01-29', 10)], f"Неверные недельные агрегаты после миграции: {weekly}"
+        assert monthly == [('2023-06-01', 120), ('2024-01-01', 10)], f"Неверные месячные агрегаты после миграции: {monthly}"
+        print("✅ Миграция сохраняет агрегаты без дневной истории")
+        
+        return True
+        
+    except Exception as e:
+        print(f"❌ Ошибка свертки периодов: {e}")
+        return False
+
+def test_transfers():
+    """Тест атомарных переводов"""
+    print("\n💸 Тестирование переводов...")
+    
+    try:
+        from database import Database
+        
+        # Очки активности: списание условное, пакет применяется целиком или никак
+        db = Database(":memory:")
+        for user_id in (1, 2, 3):
+            db.add_user(user_id, f"user_{user_id}", "Test", "User")
+        db.add_points(1, 100)
+        totals = db.transfer_points(1, 2, 30)
+        assert totals[1]['total_points'] == 70 and totals[2]['total_points'] == 30, f"Неверные суммы: {totals}"
+        assert db.transfer_points(3, 1, 1) is None, "Перевод без очков должен быть отклонен"
+        assert db.transfer_points_many([(1, 3, 50), (2, 3, 31)]) is None, "Пакет с нехваткой очков должен быть отклонен"
+        assert db.get_user_stats(1)['total_points'] == 70, "Отклоненный пакет не должен менять суммы"
+        assert db.get_user_stats(3)['total_points'] == 0, "Отклоненный пакет не должен начислять очки"
+        assert db.get_weekly_top(3) == [("user_1", 70), ("user_2", 30)], "Рейтинг не обновлен после перевода"
+        print("✅ Переводы очков атомарны")
+        
+        # $gasJK: перевод, раздача от системы и откат пакета
+        gasjk_module = load_gasjk_database()
+        gdb = gasjk_module.Database(":memory:")
+        for user_id in (10, 11, 12):
+            gdb.add_user(user_id, f"g_{user_id}", "Test", "User")
+        airdrop = gdb.transfer_many([(gasjk_module.SYSTEM_USER_ID, user_id, 5.0) for user_id in (10, 11)], 'airdrop')
+        assert airdrop == {10: 5.0, 11: 5.0}, f"Неверная раздача: {airdrop}"
+        assert gdb.transfer(10, 12, 2.0) == {10: 3.0, 12: 2.0}, "Неверные балансы после перевода"
+        assert gdb.transfer_many([(11, 12, 5.0), (10, 12, 4.0)]) is None, "Пакет с нехваткой средств должен быть отклонен"
+        assert gdb.transfer(10, 999, 1.0) is None, "Перевод несуществующему пользователю должен быть отклонен"
+        assert gdb.get_user(11).gasjk_balance == 5.0 and gdb.get_user(12).gasjk_balance == 2.0, "Откат пакета не выполнен"
+        assert gdb.get_user_id_by_username("g_12") == 12, "Поиск по username не работает"
+        with gdb.pool.read() as conn:
+            count = conn.execute("SELECT COUNT(*) FROM transactions WHERE status = 'completed'").fetchone()[0]
+        assert count == 3, f"Неверное число записей о переводах: {count}"
+        gdb.close()
+        print("✅ Переводы $gasJK атомарны")
+        
+        return True
+        
+    except Exception as e:
+        print(f"❌ Ошибка переводов: {e}")
+        return False
+
+def test_transaction_archive():
+    """Тест архива транзакций прошлых месяцев"""
+    print("\n🗄 Тестирование архива транзакций...")
+    
+    try:
+        import tempfile
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            db = load_gasjk_database().Database(os.path.join(tmp, "gasjk.db"))
+            for user_id in (1, 2):
+                db.add_user(user_id, f"user_{user_id}", "Test", "User")
+            
+            rows = [(1, 2, 1.0, 'transfer', '2024-01-15 10:00:00'),
+                    (2, 1, 2.0, 'transfer', '2024-02-10 10:00:00'),
+                    (0, 1, 0.1, 'message_reward', '2024-02-11 10:00:00'),
+                    (0, 0, 0.5, 'burn', '2024-02-12 10:00:00'),
+                    (1, 2, 3.0, 'transfer', '2024-03-05 10:00:00')]
+            with db.pool.write() as conn:
+                conn.executemany('''
+                    INSERT INTO transactions (from_user_id, to_user_id, amount, transaction_type, created_at)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', rows)
+            
+            # Пачки по две строки: месяцы и пачки не совпадают по границам
+            assert db.archive_transactions('2024-03-01', batch_size=2) == 4, "В архив должны уйти два прошлых месяца"
+            assert db.archive_transactions('2024-03-01') == 0, "Повторный перенос не должен ничего делать"
+            assert db.archive.months() == ['2024-01', '2024-02'], f"Неверные месяцы архива: {db.archive.months()}"
+            with db.pool.read() as conn:
+                hot = conn.execute('SELECT COUNT(*) FROM transactions').fetchone()[0]
+            assert hot == 1, f"В основной базе должен остаться текущий месяц: {hot}"
+            
+            # Строка без участников-пользователей не теряется при удалении из основной базы
+            from storage.archive import SYSTEM_SEGMENT
+            system_rows = db.archive.user_history(SYSTEM_SEGMENT, 10)
+            assert [row[4] for row in system_rows] == ['burn'], f"Системная строка потеряна: {system_rows}"
+            
+            # История прозрачно объединяет основную таблицу и архив
+            history = db.get_user_transactions(1, 10)
+            assert [tx.amount for tx in history] == [3.0, 0.1, 2.0, 1.0], f"Неверная история: {history}"
+            assert [tx.amount for tx in db.get_user_transactions(2, 2)] == [3.0, 2.0], "Неверный лимит истории"
+            
+            # Запоздавшая строка архивного месяца дописывается в сегмент без дублей
+            with db.pool.write() as conn:
+                conn.execute('''
+                    INSERT INTO transactions (from_user_id, to_user_id, amount, transaction_type, created_at)
+                    VALUES (2, 1, 5.0, 'transfer', '2024-02-28 23:59:59')
+                ''')
+            assert db.archive_transactions('2024-03-01') == 1, "Запоздавшая строка не перенесена"
+            assert [tx.amount for tx in db.get_user_transactions(1, 10)] == [3.0, 5.0, 0.1, 2.0, 1.0], \
+                "Запоздавшая строка потеряна или продублирована"
+            db.close()
+            assert os.path.exists(os.path.join(tmp, "gasjk_archive.db")), "Архив должен лежать в отдельном файле"
+        
+        print("✅ Архив транзакций работает")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Ошибка архива транзакций: {e}")
+        return False
+
+def test_user_cache():
+    """Тест кэша пользователей"""
+    print("\n🗃 Тестирование кэша пользователей...")
+    
+    try:
+        from storage.cache import LRUCache
+        
+        # Вытеснение давно не использованных, срок жизни и устаревший маркер
+        now = [0.0]
+        cache = LRUCache(max_size=2, ttl=10, time_func=lambda: now[0])
+        cache.put('a', 1)
+        cache.put('b', 2)
+        assert cache.get('a') == 1, "Запись должна читаться из кэша"
+        cache.put('c', 3)
+        assert cache.get('b') is None and cache.get('a') == 1, "Вытеснена должна быть самая старая запись"
+        now[0] = 11
+        assert cache.get('a') is None, "Запись должна устаревать по сроку жизни"
+        generation = cache.generation()
+        cache.invalidate('c')
+        cache.put('c', 'stale', generation)
+        assert cache.get('c') is None, "Значение, прочитанное до инвалидации, не должно попадать в кэш"
+        stats = cache.stats()
+        assert stats['evictions'] == 1 and stats['expirations'] == 1, f"Неверные счетчики: {stats}"
+        
+        # Запись в базу сбрасывает закэшированного пользователя
+        db = load_gasjk_database().Database(":memory:")
+        db.add_user(42, "cached", "Test", "User")
+        assert db.get_user(42) is db.get_user(42), "Повторное чтение должно идти из кэша"
+        hits = db.user_cache.hits
+        db.update_user_balance(42, 5.0)
+        assert db.get_user(42).gasjk_balance == 5.0, "Баланс не обновлен после записи"
+        db.increment_messages(42)
+        assert db.get_user(42).messages_count == 1, "Счетчик сообщений не обновлен после записи"
+        db.add_nft(42, "addr", "Коллекция", "1", "{}")
+        assert db.get_user(42).nft_count == 1, "Счетчик NFT не обновлен после записи"
+        assert db.user_cache.hits == hits, "После каждой записи должен быть промах"
+        db.close()
+        print("✅ Кэш пользователей работает")
+        
+        return True
+        
+    except Exception as e:
+        print(f"❌ Ошибка кэша пользователей: {e}")
+        return False
+
+def test_username_directory():
+    """Тест справочника username"""
+    print("\n📇 Тестирование справочника username...")
+    
+    try:
+        import tempfile
+        from database import Database
+        from storage.connection import ConnectionManager
+        from storage.migrations import Migration, apply_migrations
+        from storage.usernames import username_migration
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "chat.db")
+            db = Database(path)
+            db.add_user(1, "Alice", "Alice", "")
+            db.add_user(2, "bob", "Bob", "")
+            assert db.get_user_id_by_username("@ALICE") == 1, "Поиск должен быть без учета регистра"
+            
+            # Переименованный пользователь находится и по старому имени
+            db.add_user(1, "alice_new", "Alice", "")
+            assert db.get_user_id_by_username("alice_new") == 1, "Новое имя не найдено"
+            assert db.get_user_id_by_username("alice") == 1, "Старое имя должно находить пользователя"
+            
+            # Освободившееся имя занимает другой пользователь
+            db.add_user(3, "ALICE", "Other", "")
+            assert db.get_user_id_by_username("alice") == 3, "Текущий владелец имени важнее истории"
+            db.add_user(2, "alice_new", "Bob", "")
+            assert db.get_user_id_by_username("alice_new") == 2, "Имя должно перейти новому владельцу"
+            db.close()
+            
+            # После перезапуска справочник совпадает с тем, что был в памяти
+            db = Database(path)
+            assert db.get_user_id_by_username("Alice") == 3, "Справочник не восстановлен из базы"
+            assert db.get_user_id_by_username("bob") == 2, "История не восстановлена из базы"
+            assert db.get_user_id_by_username("alice_new") == 2, "Текущее имя не восстановлено"
+            with db.pool.read() as conn:
+                owner = conn.execute("SELECT user_id FROM users WHERE username = 'alice_new' COLLATE NOCASE").fetchall()
+            assert owner == [(2,)], f"Имя должно остаться только у одного пользователя: {owner}"
+            db.close()
+        
+        # Миграция оставляет повторяющийся username только у самой свежей записи
+        pool = ConnectionManager(":memory:")
+        with pool.write() as conn:
+            conn.execute('CREATE TABLE users (user_id INTEGER PRIMARY KEY, username TEXT, created_at TEXT)')
+            conn.executemany('INSERT INTO users VALUES (?, ?, ?)',
+                             [(1, 'Dup', '2024-01-01'), (2, 'dup', '2024-02-01'), (3, 'solo', '2024-01-01')])
+        apply_migrations(pool, [Migration(1, 'username', username_migration('created_at'))])
+        with pool.read() as conn:
+            users = conn.execute('SELECT user_id, username FROM users ORDER BY user_id').fetchall()
+            history = conn.execute('SELECT username, user_id FROM username_history').fetchall()
+        assert users == [(1, None), (2, 'dup'), (3, 'solo')], f"Неверная дедупликация: {users}"
+        assert history == [('Dup', 1)], f"Старое имя должно попасть в историю: {history}"
+        print("✅ Справочник username работает")
+        
+        return True
+        
+    except Exception as e:
+        print(f"❌ Ошибка справочника username: {e}")
+        return False
+
+def test_mute_registry():
+    """Тест реестра мутов в памяти"""
+    print("\n🔇 Тестирование реестра мутов...")
+    
+    try:
+        import tempfile
+        from database import Database
+        from storage.mutes import MuteRegistry
+        
+        now = [1000.0]
+        registry = MuteRegistry(time_func=lambda: now[0])
+        registry.set(1, 1100)
+        registry.set(2, 1050)
+        registry.set(2, 1200)  # повторный мут продлевает срок
+        assert registry.remaining(1) == 100, "Неверный остаток мута"
+        assert registry.remaining(3) == 0, "Пользователь без мута не должен быть в муте"
+        now[0] = 1100
+        assert registry.remaining(1) == 0, "Мут должен истечь"
+        assert registry.sweep() == [], "Устаревшая запись кучи не должна снимать продленный мут"
+        assert registry.remaining(2) == 100, "Продленный мут потерян"
+        now[0] = 1300
+        assert registry.sweep() == [2], "Истекший мут должен сниматься при очистке"
+        assert len(registry) == 0, "Реестр должен быть пуст"
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "chat.db")
+            db = Database(path)
+            until = int(time.time()) + 600
+            db.set_mute(1, until)
+            db.set_mute(2, int(time.time()) - 1)
+            assert 590 < db.is_muted(1) <= 600, "Мут не виден сразу после установки"
+            assert db.is_muted(2) == 0, "Истекший мут не должен действовать"
+            db.close()
+            
+            # После перезапуска действующие муты загружаются из базы
+            db = Database(path)
+            assert len(db.mutes) == 1 and db.is_muted(1) > 0, "Мут не загружен из базы"
+            assert db.clear_expired_mutes() == 1, "Истекший мут должен удаляться из базы"
+            assert db.get_mute(1) == until, "Действующий мут не должен удаляться"
+            db.close()
+        print("✅ Реестр мутов работает")
+        
+        return True
+        
+    except Exception as e:
+        print(f"❌ Ошибка реестра мутов: {e}")
+        return False
+
+def test_bulk_export_import():
+    """Тест потоковой выгрузки и загрузки таблиц"""
+    print("\n📦 Тестирование выгрузки и загрузки данных...")
+    
+    try:
+        import tempfile
+        import importlib.util
+        from database import Database
+        from storage.bulk import export_database, import_database
+        from storage.connection import ConnectionManager
+        
+        spec = importlib.util.spec_from_file_location("gasjk_database", os.path.join("database", "database.py"))
+        gasjk_database = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(gasjk_database)
+        
+        def dump(path, tables):
+            conn = sqlite3.connect(path)
+            try:
+                return {t: conn.execute(f'SELECT * FROM {t} ORDER BY 1, 2').fetchall() for t in tables}
+            finally:
+                conn.close()
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            chat_path = os.path.join(tmp, "chat.db")
+            db = Database(chat_path)
+            db.add_user(1, "alice", "Алиса", "")
+            db.add_user(2, "bob", "Bob", "")
+            db.add_points(1, 5)
+            db.add_points(2, 3)
+            db.close()
+            
+            gasjk_path = os.path.join(tmp, "gasjk.db")
+            gdb = gasjk_database.Database(gasjk_path, archive_path=":memory:")
+            gdb.add_user(1, "alice", "Алиса", "")
+            gdb.update_user_balance(1, 2.5)
+            gdb.add_couchsurfing_ad(1, "Россия", "Москва", "", "2030-01-01", "2030-01-10", 'Диван, "уютный"\nрядом с метро')
+            gdb.close()
+            
+            # Сжатые сегменты архива - BLOB, их нельзя записать в JSON или CSV как есть
+            from storage.archive import TransactionArchive
+            archive_path = os.path.join(tmp, "archive.db")
+            archive = TransactionArchive(archive_path)
+            archive.store('2024-01', [(1, 1, 2, 1.5, 'transfer', 'completed', '2024-01-15 10:00:00')])
+            archive.close()
+            
+            cases = [(chat_path, ['users', 'daily_points', 'user_summary']),
+                     (gasjk_path, ['users', 'transactions', 'couchsurfing_ads']),
+                     (archive_path, ['transaction_segments'])]
+            for source, tables in cases:
+                for fmt in ('jsonl', 'csv'):
+                    out = os.path.join(tmp, f"export_{os.path.basename(source)}_{fmt}")
+                    target = os.path.join(tmp, f"copy_{os.path.basename(source)}_{fmt}")
+                    
+                    pool = ConnectionManager(source)
+                    exported = export_database(pool, out, fmt)
+                    pool.close()
+                    pool = ConnectionManager(target)
+                    imported = import_database(pool, out, batch_size=2)
+                    pool.close()
+                    
+                    assert exported == imported, f"Число строк не совпадает: {exported} != {imported}"
+                    assert dump(source, tables) == dump(target, tables), f"Данные {fmt} не совпадают"
+            
+            copy = TransactionArchive(os.path.join(tmp, "copy_archive.db_csv"))
+            assert copy.user_history(2, 10)[0][3] == 1.5, "Сегмент архива не восстановлен из CSV"
+            copy.close()
+            
+            # Импортированная база открывается без повторных миграций
+            db = Database(os.path.join(tmp, "copy_chat.db_csv"))
+            assert db.get_daily_top()[0] == ("alice", 5), "Очки не перенесены"
+            db.close()
+        print("✅ Выгрузка и загрузка данных работают")
+        
+        return True
+        
+    except Exception as e:
+        print(f"❌ Ошибка выгрузки и загрузки данных: {e}")
+        return False
+
+def test_database_backup():
+    """Тест онлайн-резервного копирования базы"""
+    print("\n💾 Тестирование резервного копирования...")
+    
+    try:
+        import tempfile
+        from database import Database
+        from storage.backup import DatabaseBackup
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            db = Database(os.path.join(tmp, "chat.db"))
+            for user_id in range(1, 201):
+                db.add_user(user_id, f"user{user_id}", "Test", "")
+            db.add_points(1, 7)
+            
+            backup_dir = os.path.join(tmp, "backups")
+            backup = DatabaseBackup(db.pool, backup_dir, "chat_bot", keep=2, pages=4)
+            results = [backup.run() for _ in range(3)]
+            
+            assert backup.snapshots() == [results[1].path, results[2].path], "Ротация должна оставить 2 последних снимка"
+            assert not os.path.exists(results[0].path), "Старый снимок не удален"
+            assert results[2].removed == [results[0].path], "Неверный список удаленных снимков"
+            assert results[2].size == os.path.getsize(results[2].path) and results[2].pages > 4, "Неверный отчет о копии"
+            assert sorted(os.listdir(backup_dir)) == sorted(os.path.basename(p) for p in backup.snapshots()), \
+                "В каталоге не должно оставаться временных файлов"
+            
+            conn = sqlite3.connect(results[2].path)
+            try:
+                assert conn.execute('SELECT COUNT(*) FROM users').fetchone()[0] == 200, "Снимок неполный"
+                assert conn.execute('SELECT total_points FROM user_summary WHERE user_id = 1').fetchone()[0] == 7, \
+                    "Очки не попали в снимок"
+                assert conn.execute('PRAGMA integrity_check').fetchone()[0] == 'ok', "Снимок поврежден"
+            finally:
+                conn.close()
+            db.close()
+        print("✅ Резервное копирование работает")
+        
+        return True
+        
+    except Exception as e:
+        print(f"❌ Ошибка резервного копирования: {e}")
+        return False
+
+def test_storage_backends():
+    """Тест бизнес-логики на SQLite и на хранилище в памяти"""
+    print("\n🗄 Тестирование хранилищ данных...")
+    
+    try:
+        import random
+        import importlib.util
+        from storage.memory import InMemoryRepository
+        from games.dice_game import DiceGame
+        from couchsurfing.couchsurfing_service import CouchsurfingService
+        
+        spec = importlib.util.spec_from_file_location("gasjk_database", os.path.join("database", "database.py"))
+        gasjk_database = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(gasjk_database)
+        
+        def scenario(repo):
+            changed = []
+            repo.add_balance_listener(changed.append)
+            repo.add_user(1, "host", "Анна", "Хост")
+            repo.add_user(2, "guest", "Борис", "Гость")
+            repo.update_user_balance(1, 100)
+            repo.update_user_balance(2, 100)
+            
+            random.seed(7)
+            dice = DiceGame(repo)
+            game_id = dice.create_game(1, 2, 10)
+            dice.roll_dice(game_id, 1)
+            finished = dice.roll_dice(game_id, 2)
+            games = dice.get_player_games(1)
+            
+            service = CouchsurfingService(repo)
+            ad_id = service.create_ad(1, "Россия", "Казань", "", "2030-05-01", "2030-05-20", "Диван у Кремля")
+            service.create_ad(1, "Россия", "Москва", "", "2030-06-01", "2030-06-10", "Комната")
+            booking_id = service.create_booking(2, ad_id, "2030-05-02", "2030-05-05")
+            assert booking_id > 0, "Бронирование не создано"
+            assert service.create_booking(2, ad_id, "2030-05-06", "2030-05-07") == -1, "Занятое объявление доступно"
+            assert service.rate_host(booking_id, 5.0), "Оценка не сохранена"
+            
+            bookings = service.get_user_bookings(2, as_guest=True)
+            return {
+                'finished': finished['status'],
+                'balances': (repo.get_user(1).gasjk_balance, repo.get_user(2).gasjk_balance),
+                'games': [(g.bet_amount, g.status, g.winner_id) for g in games],
+                'leaderboard': [(p['user_id'], p['wins'], p['losses'], p['total_winnings'])
+                                for p in dice.get_leaderboard()],
+                'dice_stats': {k: v for k, v in dice.get_game_statistics().items() if k != 'daily_stats'},
+                # Объявления созданы в одну секунду, порядок при равном created_at не задан
+                'ads': sorted((a.id, a.city, a.host_name) for a in service.get_ads()),
+                'search': [a.id for a in service.search_ads("кремл")] + [a.id for a in service.search_ads("Комн")],
+                'bookings': [(b.ad_id, b.city, b.first_name, b.status) for b in bookings],
+                'host_bookings': [(b.guest_id, b.username) for b in service.get_user_bookings(1, as_guest=False)],
+                'destinations': service.get_popular_destinations(),
+                'cs_stats': (service.get_user_stats(1), service.get_user_stats(2)),
+                'lookup': repo.get_user_id_by_username("@HOST"),
+                # Пополнения, ставки и выигрыш игры в кости
+                'balance_changes': sorted(changed),
+            }
+        
+        sqlite_repo = gasjk_database.Database(":memory:")
+        memory_repo = InMemoryRepository()
+        sqlite_result = scenario(sqlite_repo)
+        memory_result = scenario(memory_repo)
+        sqlite_repo.close()
+        
+        for key in sqlite_result:
+            if key == 'search':
+                continue
+            assert sqlite_result[key] == memory_result[key], \
+                f"Хранилища расходятся в {key}: {sqlite_result[key]} != {memory_result[key]}"
+        # LIKE в SQLite не сворачивает регистр кириллицы, поэтому здесь только хранилище в памяти
+        assert memory_result['search'] == [1, 2], f"Неверный поиск: {memory_result['search']}"
+        assert sqlite_result['games'] and sqlite_result['games'][0][1] == 'completed', "Игра не найдена"
+        
+        # Хранилище чат-бота: тот же сценарий на SQLite и в памяти, с переходом через сутки
+        from storage.chat_database import ChatDatabase
+        from storage.memory import InMemoryChatRepository
+        from storage.rollup import PeriodClock
+        
+        def chat_scenario(repo, now):
+            for user_id, username in ((1, "alice"), (2, "bob"), (3, "carol")):
+                repo.add_user(user_id, username, "Test", "")
+            points = [repo.add_points(1, 50), repo.add_points(2, 30), repo.add_points(3, 10)]
+            transfers = [repo.transfer_points(1, 2, 20), repo.transfer_points(3, 1, 11),
+                         repo.transfer_points_many([(2, 3, 5), (3, 1, 100)])]
+            try:
+                repo.transfer_points(1, 2, 0)
+                transfers.append('accepted')
+            except ValueError:
+                transfers.append('rejected')
+            repo.add_user(3, "Bob", "Test", "")
+            repo.save_monthly_winner(1, "alice", 300, "2025-02-01")
+            repo.save_monthly_winner(2, "bob", 200, "2025-01-01")
+            repo.set_mute(1, int(time.time()) + 600)
+            repo.set_mute(3, int(time.time()) - 1)
+            
+            # Понедельник: новый день и новая неделя
+            now[0] += 86400
+            points.append(repo.add_points(2, 7))
+            users = (1, 2, 3, 404)
+            return {
+                'points': points,
+                'transfers': transfers,
+                'stats': [{k: v for k, v in stats.items() if k != 'created_at'} if stats else None
+                          for stats in map(repo.get_user_stats, users)],
+                'tops': (repo.get_daily_top(), repo.get_weekly_top(), repo.get_monthly_top(2)),
+                'ranks': [repo.get_user_rank(user_id, period) for user_id in users for period in ('day', 'week', 'month')],
+                'lookup': [repo.get_user_id_by_username(name) for name in ("@BOB", "alice", "carol", "nobody")],
+                'winners': (repo.get_monthly_winners(), repo.get_previous_month_winner()),
+                'mutes': (repo.is_muted(1) > 0, repo.is_muted(3), repo.get_mute(3) > 0,
+                          repo.clear_expired_mutes(), repo.get_mute(3)),
+                'rebuilt': (repo.rebuild_user_summary(), [repo.get_user_stats(user_id)['week_points'] for user_id in users[:3]]),
+            }
+        
+        chat_results = []
+        for make_repo in (lambda clock: ChatDatabase(":memory:", clock=clock),
+                          lambda clock: InMemoryChatRepository(clock=clock)):
+            # 2025-03-09 (воскресенье) 12:00 по Москве
+            now = [datetime.datetime(2025, 3, 9, 9, 0, tzinfo=pytz.utc).timestamp()]
+            repo = make_repo(PeriodClock(time_func=lambda: now[0]))
+            chat_results.append(chat_scenario(repo, now))
+            repo.close()
+        for key in chat_results[0]:
+            assert chat_results[0][key] == chat_results[1][key], \
+                f"Хранилища чат-бота расходятся в {key}: {chat_results[0][key]} != {chat_results[1][key]}"
+        assert chat_results[1]['transfers'][2] is None, "Пакет переводов применен частично"
+        assert chat_results[1]['stats'][1]['total_points'] == 57, f"Неверный итог: {chat_results[1]['stats'][1]}"
+        
+        # Оба бота получают хранилище только через Repository и ChatRepository;
+        # к sqlite3 обращаются только модули storage
+        for path in ("bot.py", "database.py", "main.py", "database/database.py", "games/dice_game.py",
+                     "couchsurfing/couchsurfing_service.py", "tools/rebuild_user_summary.py"):
+            with open(path, encoding="utf-8") as f:
+                source = f.read()
+            assert "sqlite3" not in source, f"{path} обращается к sqlite3 напрямую"
+            if path in ("bot.py", "games/dice_game.py", "couchsurfing/couchsurfing_service.py"):
+                assert "from database" not in source, f"{path} зависит от реализации хранилища"
+        print("✅ Хранилища SQLite и в памяти ведут себя одинаково")
+        
+        return True
+        
+    except Exception as e:
+        print(f"❌ Ошибка хранилищ данных: {e}")
+        return False
+
+def test_daily_activity():
+    """Тест счетчиков активности за день"""
+    print("\n📈 Тестирование счетчиков активности...")
+    
+    try:
+        import importlib.util
+        from storage.memory import InMemoryRepository
+        from storage.migrations import explain_query_plan
+        from storage.rollup import PeriodClock
+        
+        spec = importlib.util.spec_from_file_location("gasjk_database", os.path.join("database", "database.py"))
+        gasjk_database = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(gasjk_database)
+        
+        # 2025-03-10 12:00 по Москве
+        now = [datetime.datetime(2025, 3, 10, 9, 0, tzinfo=pytz.utc).timestamp()]
+        backends = [
+            gasjk_database.Database(":memory:", clock=PeriodClock(time_func=lambda: now[0])),
+            InMemoryRepository(clock=PeriodClock(time_func=lambda: now[0])),
+        ]
+        for repo in backends:
+            now[0] = datetime.datetime(2025, 3, 10, 9, 0, tzinfo=pytz.utc).timestamp()
+            for user_id in (1, 2, 3):
+                repo.add_user(user_id, f"user{user_id}", "Test", "")
+            repo.apply_message_rewards([(1, 0.3, 3), (2, 0.1, 1), (404, 0.1, 1)],
+                                       [(1, 0.1, '2025-03-10 09:00:00')] * 3 + [(2, 0.1, '2025-03-10 09:00:00')])
+            repo.increment_messages(1)
+            repo.add_nft(2, "EQ...", "Коллекция", "1", "{}")
+            repo.transfer(1, 3, 0.2)
+            
+            stats = repo.get_daily_stats()
+            assert stats['day'] == '2025-03-10', f"Неверный день: {stats['day']}"
+            assert (stats['active_users'], stats['messages'], stats['nfts']) == (2, 5, 1), \
+                f"{type(repo).__name__}: неверные счетчики {stats}"
+            assert abs(stats['rewards'] - 0.4) < 1e-9, f"Неверная сумма наград: {stats['rewards']}"
+            
+            # После полуночи по Москве счетчики начинаются заново
+            now[0] = datetime.datetime(2025, 3, 10, 21, 1, tzinfo=pytz.utc).timestamp()
+            assert repo.get_daily_stats()['active_users'] == 0, "Счетчики не сбросились в новый день"
+            repo.increment_messages(1)
+            stats = repo.get_daily_stats()
+            assert (stats['day'], stats['active_users'], stats['messages']) == ('2025-03-11', 1, 1), \
+                f"{type(repo).__name__}: неверные счетчики нового дня {stats}"
+        
+        db = backends[0]
+        with db.pool.read() as conn:
+            days = conn.execute('SELECT DISTINCT day FROM daily_active_users').fetchall()
+            plan = explain_query_plan(conn, 'SELECT * FROM daily_activity WHERE day = ?', ('2025-03-11',))
+        assert days == [('2025-03-11',)], f"Отметки прошлых дней не удалены: {days}"
+        assert not any(line.startswith('SCAN') for line in plan), f"Отчет не должен сканировать таблицу: {plan}"
+        db.close()
+        print("✅ Счетчики активности работают")
+        
+        return True
+        
+    except Exception as e:
+        print(f"❌ Ошибка счетчиков активности: {e}")
+        return False
+
+def test_activity_series():
+    """Тест поминутной статистики в кольцевых буферах"""
+    print("\n📉 Тестирование временных рядов активности...")
+    
+    try:
+        import tempfile
+        from storage.timeseries import RingSeries, TimeSeriesStore, sparkline
+        
+        series = RingSeries(5, 60)
+        series.add(0)
+        series.add(30, 2)
+        series.add(120)
+        assert series.last(3, 120) == [3.0, 0.0, 1.0], f"Неверные интервалы: {series.last(3, 120)}"
+        series.add(60 * 7)  # сдвиг на размер буфера и больше обнуляет все интервалы
+        assert series.last(5, 60 * 7) == [0.0, 0.0, 0.0, 0.0, 1.0], "Старые интервалы не обнулены"
+        assert series.last(2, 60 * 9) == [0.0, 0.0], "Интервалы без событий должны быть нулевыми"
+        assert sparkline([0, 1, 2, 4]) == "▁▃▅█", f"Неверный спарклайн: {sparkline([0, 1, 2, 4])}"
+        assert sparkline([1] * 60, 30) == "█" * 30, "Неверная группировка спарклайна"
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "activity.series")
+            now = [3600 * 1000 + 10]
+            store = TimeSeriesStore(['messages', 'rejected'], path, time_func=lambda: now[0])
+            for minute in range(3):
+                now[0] = 3600 * 1000 + 60 * minute
+                for _ in range(minute + 1):
+                    store.record('messages')
+            store.record('rejected')
+            assert store.minutes('messages', 3) == [1.0, 2.0, 3.0], f"Неверные минуты: {store.minutes('messages', 3)}"
+            assert store.hours('messages', 1) == [6.0], "Неверная сумма за час"
+            assert "6 за час" in store.summary(), f"Неверная сводка: {store.summary()}"
+            
+            # Смена часа сохраняет буферы в файл
+            now[0] = 3600 * 1001 + 5
+            store.record('messages')
+            restored = TimeSeriesStore(['messages', 'rejected'], path, time_func=lambda: now[0])
+            assert restored.hours('messages', 2) == [6.0, 1.0], f"Буферы не восстановлены: {restored.hours('messages', 2)}"
+            assert restored.hours('rejected', 2) == [1.0, 0.0], "Метрика rejected не восстановлена"
+            
+            # В цикле событий сохранение при смене часа уходит в пул потоков
+            import asyncio
+            import threading
+            saved_in = []
+            save = restored.save
+            restored.save = lambda: (saved_in.append(threading.current_thread()), save())
+            
+            async def rollover():
+                now[0] = 3600 * 1002 + 5
+                restored.record('messages')
+            
+            asyncio.run(rollover())
+            assert saved_in and saved_in[0] is not threading.main_thread(), "Сохранение выполнялось в цикле событий"
+            reloaded = TimeSeriesStore(['messages', 'rejected'], path, time_func=lambda: now[0])
+            assert reloaded.hours('messages', 3) == [6.0, 1.0, 1.0], f"Буферы не сохранены: {reloaded.hours('messages', 3)}"
+            
+            # Файл с другим размером буфера не ломает запуск
+            other = TimeSeriesStore(['messages'], path, minutes=10, time_func=lambda: now[0])
+            assert other.hours('messages', 2) == [0.0, 0.0], "Несовместимые буферы не должны загружаться"
+        print("✅ Временные ряды активности работают")
+        
+        return True
+        
+    except Exception as e:
+        print(f"❌ Ошибка временных рядов активности: {e}")
+        return False
+
+def test_keyword_matcher():
+    """Тест поиска ключевых слов валидатора сообщений"""
+    print("\n🔤 Тестирование поиска ключевых слов...")
+    
+    try:
+        from utils.keyword_matcher import KeywordMatcher
+        from utils.message_validator import MessageValidator
+        
+        matcher = KeywordMatcher({'spam': ['win', 'work from home'], 'greeting': ['hi', 'привет'], 'question': ['?']})
+        hits = matcher.find("Hi! This window: WORK from home, привет?")
+        assert hits['greeting'] == {'hi', 'привет'}, f"Неверные приветствия: {hits['greeting']}"
+        assert hits['spam'] == {'work from home'}, f"'win' не должен находиться в 'window': {hits['spam']}"
+        assert hits['question'] == {'?'}, "Знак вопроса должен находиться рядом с буквой"
+        assert matcher.find("this is a window") == {'spam': set(), 'greeting': set(), 'question': set()}, \
+            "Совпадения внутри слов должны отбрасываться"
+        
+        validator = MessageValidator()
+        assert validator.get_message_category("Привет всем в чате") == 'greeting', "Приветствие не распознано"
+        assert validator.get_message_category("This is my new window") == 'general', "'hi' найдено внутри 'this'"
+        assert validator.get_message_category("Спасибо за помощь") == 'thanks', "Благодарность не распознана"
+        assert validator.is_question("Где встречаемся?"), "Вопрос не распознан"
+        assert validator._check_spam_words("купить кредит казино") == 1.0, "Спам-слова не найдены"
+        score = validator._calculate_meaningful_score("Сегодня иду в кафе, как дела?")
+        assert score > 0.5, f"Низкая оценка осмысленного сообщения: {score}"
+        assert validator.validate_message("ababababab")['reason'] == 'Сообщение содержит спам-паттерн', \
+            "Повторяющийся фрагмент не отклонен спам-паттерном"
+        print("✅ Поиск ключевых слов работает")
+        
+        return True
+        
+    except Exception as e:
+        print(f"❌ Ошибка поиска ключевых слов: {e}")
+        return False
+
+def test_repeat_detector():
+    """Тест поиска повторов в сообщениях"""
+    print("\n🔁 Тестирование поиска повторов...")
+    
+    try:
+        from utils.repeat_detector import RepeatDetector
+        from utils.message_validator import MessageValidator
+        
+        detector = RepeatDetector(run_limit=4, min_repeats=3, min_coverage=0.5)
+        report = detector.scan("купи купи купи купи")
+        assert (report.ngram, report.ngram_count) == ('купи', 4), f"Неверная n-грамма: {report}"
+        assert detector.scan("Ааааа!").longest_run == 5, "Серия должна считаться без учета регистра"
+        assert detector.is_repetitive("ахахахахаха"), "Повтор фрагмента не найден"
+        assert not detector.is_repetitive("заработал 1000000 рублей"), "Нули в числе - не повтор"
+        assert not detector.is_repetitive("Сегодня иду в кафе, как дела?"), "Обычный текст отклонен"
+        assert RepeatDetector(run_limit=3).is_repetitive("ну ооочень"), "Порог серии не настраивается"
+        
+        # Длинный текст без повторов проверяется без квадратичного перебора
+        text = ''.join(chr(0x4e00 + i) for i in range(20000))
+        started = time.perf_counter()
+        assert not detector.is_repetitive(text), "Текст без повторов отклонен"
+        assert time.perf_counter() - started < 1.0, "Проверка длинного текста слишком медленная"
+        
+        # Серии "ЖЖЖЖ " из разных символов: почти каждая n-грамма повторяется
+        text = ''.join(chr(0x4e00 + i) * 4 + ' ' for i in range(4000))
+        started = time.perf_counter()
+        detector.scan(text)
+        assert time.perf_counter() - started < 1.0, "Проверка серий слишком медленная"
+        
+        # Непересекающиеся вхождения за один проход совпадают с str.count
+        import random
+        rng = random.Random(3)
+        for _ in range(50):
+            text = ''.join(rng.choice('аб ') for _ in range(rng.randint(8, 60)))
+            report = detector.scan(text)
+            if report.ngram:
+                assert report.ngram_count == text.count(report.ngram), f"Неверный подсчет: {report} в {text!r}"
+        
+        validator = MessageValidator()
+        assert validator._has_repeating_chars("да да да да да"), "Валидатор не видит повторов"
+        assert validator.validate_message("Сегодня иду в кафе, как дела?")['is_valid'], "Осмысленное сообщение отклонено"
+        print("✅ Поиск повторов работает")
+        
+        return True
+        
+    except Exception as e:
+        print(f"❌ Ошибка поиска повторов: {e}")
+        return False
+
+def test_normalized_message():
+    """Тест однократного разбора сообщения"""
+    print("\n🧾 Тестирование разбора сообщения...")
+    
+    try:
+        from utils.normalized_message import NormalizedMessage
+        from utils.message_validator import MessageValidator
+        
+        message = NormalizedMessage("  ＨＥＬＬＯ друзья 👋, как дела?  ")
+        assert message.stripped == "ＨＥＬＬＯ друзья 👋, как дела?", "Неверная обрезка пробелов"
+        assert message.words[0] == "hello", f"NFKC-нормализация не выполнена: {message.words}"
+        assert message.clean_words == ["hello", "друзья", "как", "дела"], f"Эмодзи не убраны: {message.clean_words}"
+        assert message.has_punctuation and message.has_upper and not message.all_upper, "Неверная статистика символов"
+        assert NormalizedMessage("12 345").digits_only, "Сообщение из цифр не распознано"
+        assert NormalizedMessage.of(message) is message, "Разобранное сообщение должно переиспользоваться"
+        
+        # Валидатор дает одинаковый результат для строки и разобранного сообщения
+        validator = MessageValidator()
+        for text in ["Сегодня иду в кафе, как дела?", "купить кредит казино", "ok", "Привет! Что нового?"]:
+            assert validator.validate_message(text) == validator.validate_message(NormalizedMessage(text)), \
+                f"Результаты различаются для '{text}'"
+        assert validator.get_message_category(NormalizedMessage("Спасибо за помощь")) == 'thanks', "Неверная категория"
+        print("✅ Разбор сообщения работает")
+        
+        return True
+        
+    except Exception as e:
+        print(f"❌ Ошибка разбора сообщения: {e}")
+        return False
+
+def test_validate_many():
+    """Тест пакетной валидации сообщений"""
+    print("\n📦 Тестирование пакетной валидации...")
+    
+    try:
+        import utils.message_validator as message_validator
+        from utils.normalized_message import NormalizedMessage
+        
+        validator = message_validator.MessageValidator()
+        messages = [
+            "Сегодня иду в кафе, как дела?", "ok", "1234567890", "ababababab", "купить кредит казино",
+            "Hello, how is it going today?", "x" * 1200, "Сегодня иду в кафе, как дела?",
+            NormalizedMessage("Спасибо, было очень интересно!"), "ну просто текст без ничего",
+        ]
+        expected = [validator.validate_message(message) for message in messages]
+        
+        results = validator.validate_many(messages)
+        assert results == expected, "Результаты validate_many отличаются от validate_message"
+        assert results[0] is not results[7], "Повторы должны получать отдельные словари"
+        assert validator.validate_many([]) == [], "Пустой пакет"
+        
+        # Пакет пользуется кэшем вердиктов
+        cached = message_validator.MessageValidator()
+        cached.validate_message("Сегодня иду в кафе, как дела?")
+        cached.validate_many(["Сегодня иду в кафе, как дела?", "Hello, how is it going today?"])
+        assert cached.verdicts.stats()['hits'] == 1, f"validate_many обходит кэш: {cached.verdicts.stats()}"
+        assert len(cached.verdicts) == 2, "validate_many не пополняет кэш"
+        
+        # Векторные оценки дают те же вердикты и те же числа, что validate_message
+        import random
+        rng = random.Random(23)
+        words = ["сегодня", "иду", "в", "кафе", "купить", "кредит", "казино", "как", "дела", "Hello",
+                 "how", "money", "bonus", "today", "ПРИВЕТ", "ну", "просто", "текст", "спасибо", "abab"]
+        corpus = [' '.join(rng.choice(words) for _ in range(rng.randint(1, 8))) + rng.choice(['', '?', '!', ','])
+                  for _ in range(400)]
+        corpus += [None, "", "   ", "12 34", "!!!!!!", "x" * 1001]
+        uncached = message_validator.MessageValidator(cache_size=0)
+        batch = message_validator.MessageValidator(cache_size=0)
+        assert batch.validate_many(corpus) == [uncached.validate_message(m) for m in corpus], \
+            "Векторные оценки отличаются от validate_message"
+        if message_validator.np is not None:
+            numpy, message_validator.np = message_validator.np, None
+            try:
+                assert batch.validate_many(corpus) == [uncached.validate_message(m) for m in corpus], \
+                    "Пакет без numpy отличается от validate_message"
+            finally:
+                message_validator.np = numpy
+        print("✅ Пакетная валидация работает")
+        
+        return True
+        
+    except Exception as e:
+        print(f"❌ Ошибка пакетной валидации: {e}")
+        return False
+
+def test_duplicate_detector():
+    """Тест поиска почти повторяющихся сообщений"""
+    print("\n👯 Тестирование поиска почти повторов...")
+    
+    try:
+        from utils.duplicate_detector import DuplicateDetector, hamming, simhash
+        
+        text = "сегодня вечером идем всей компанией в новое кафе на площади"
+        assert hamming(simhash(text), simhash(text + " ага")) <= 7, "Небольшая правка должна давать близкий отпечаток"
+        assert hamming(simhash(text), simhash("завтра утром еду в университет на первую пару")) > 7, \
+            "Разные сообщения должны давать далекие отпечатки"
+        
+        now = [1000.0]
+        detector = DuplicateDetector(user_window=3, chat_window=5, ttl=60, max_windows=4, time_func=lambda: now[0])
+        words = text.split()
+        assert detector.check(1, 10, words) is None, "Первое сообщение не может быть повтором"
+        assert detector.check(1, 10, words + ["ага"]) == 'user', "Повтор пользователя не найден"
+        assert detector.check(2, 10, words) == 'chat', "Повтор в чате не найден"
+        assert detector.check(3, 20, words) is None, "Другой чат не должен учитываться"
+        assert detector.check(1, 10, ["да", "ок"]) is None, "Короткие сообщения не проверяются"
+        
+        # Записи старше ttl забываются
+        now[0] += 61
+        assert detector.check(1, 10, words) is None, "Устаревшие отпечатки должны удаляться"
+        
+        # Окно пользователя ограничено user_window сообщениями
+        for other in ("кто знает хороший сервис по ремонту велосипедов",
+                      "вчера смотрел матч, наши выиграли в овертайме",
+                      "поздравляю всех с пятницей и отличных выходных"):
+            detector.check(4, None, other.split())
+        assert all(len(window.entries) <= 5 for window in detector._windows.values()), "Окно не ограничено"
+        assert detector.stats()['windows'] <= 4, "Число окон не ограничено"
+        assert detector.stats()['duplicates'] == 2, f"Неверный счетчик повторов: {detector.stats()}"
+        print("✅ Поиск почти повторов работает")
+        
+        return True
+        
+    except Exception as e:
+        print(f"❌ Ошибка поиска почти повторов: {e}")
+        return False
+
+def test_verdict_cache():
+    """Тест кэша вердиктов валидатора"""
+    print("\n🛡 Тестирование кэша вердиктов...")
+    
+    try:
+        from storage.cache import LRUCache
+        from utils.message_validator import MessageValidator
+        from utils.normalized_message import NormalizedMessage, content_key
+        
+        assert content_key("Купи!") == content_key(NormalizedMessage(" Купи!\n")), "Ключ должен зависеть только от текста"
+        assert content_key("Купи!") != content_key("купи!"), "Ключ считается по исходному тексту"
+        assert content_key("Купи!", True) != content_key("Купи!", False), "Признаки вердикта должны входить в ключ"
+        
+        # Варианты регистра и пробелов по краям: вердикт из кэша совпадает с проверкой без кэша
+        import random
+        rng = random.Random(5)
+        cached = MessageValidator()
+        uncached = MessageValidator(cache_size=0)
+        texts = ["Купи кредит в казино сейчас", "Сегодня иду в кафе, как дела?", "abababababab",
+                 "ПРИВЕТ ВСЕМ", "спасибо большое за помощь", "Hello, how is it going today?", "ab", "12345"]
+        for _ in range(300):
+            text = ''.join(c.upper() if rng.random() < 0.3 else c for c in rng.choice(texts))
+            text = rng.choice(['', ' ', '  ', '\n']) + text + rng.choice(['', ' ', '\t'])
+            expected = uncached.validate_message(text)
+            assert cached.validate_message(text) == expected, f"Неверный вердикт: {text!r}"
+            assert cached.validate_message(text) == expected, f"Неверный вердикт из кэша: {text!r}"
+        assert cached.verdicts.stats()['hits'] >= 300, "Повторный текст не попадает в кэш"
+        
+        # Попадание не разбирает сообщение и не запускает проверки
+        hit = cached.validate_message(texts[0])
+        cached._validate = None
+        assert cached.validate_message(texts[0]) == hit, "Попадание в кэш запустило проверки"
+        
+        now = [0.0]
+        validator = MessageValidator()
+        validator.verdicts = LRUCache(2, 60, time_func=lambda: now[0])
+        spam = "купить кредит казино"
+        first = validator.validate_message(spam)
+        for _ in range(5):
+            assert validator.validate_message(spam) == first, "Вердикт из кэша отличается"
+        first['is_valid'] = True
+        assert not validator.validate_message(spam)['is_valid'], "Изменение результата не должно портить кэш"
+        stats = validator.verdicts.stats()
+        assert (stats['hits'], stats['misses']) == (6, 1), f"Неверные счетчики кэша: {stats}"
+        
+        # Вердикт устаревает по сроку жизни
+        now[0] += 61
+        validator.validate_message(spam)
+        assert validator.verdicts.stats()['expirations'] == 1, "Запись не устарела"
+        
+        # Не-строки отклоняются до вычисления ключа и не кэшируются
+        assert validator.validate_message(None)['reason'] == 'Ошибка при валидации сообщения', "Ошибка не обработана"
+        assert len(validator.verdicts) == 1, "Ошибочный вердикт попал в кэш"
+        print(f"✅ Кэш вердиктов работает (попаданий: {validator.verdicts.stats()['hit_rate']:.0%})")
+        
+        return True
+        
+    except Exception as e:
+        print(f"❌ Ошибка кэша вердиктов: {e}")
+        return False
+
 def test_message_filtering():
     """Тест фильтрации сообщений"""
     print("\n🛡️ Тестирование фильтрации сообщений...")
@@ -345,6 +1705,29 @@ def main():
         ("Конфигурация", test_config),
         ("Файл настроек", test_settings_file),
         ("База данных", test_database),
+        ("Асинхронная база данных", test_async_database),
+        ("Пакетные награды", test_reward_accumulator),
+        ("Миграции и индексы", test_migrations),
+        ("Модели строк", test_row_models),
+        ("Рейтинги", test_leaderboards),
+        ("Сводка очков", test_user_summary),
+        ("Свертка периодов", test_period_rollup),
+        ("Переводы", test_transfers),
+        ("Архив транзакций", test_transaction_archive),
+        ("Кэш пользователей", test_user_cache),
+        ("Справочник username", test_username_directory),
+        ("Реестр мутов", test_mute_registry),
+        ("Выгрузка и загрузка данных", test_bulk_export_import),
+        ("Резервное копирование", test_database_backup),
+        ("Хранилища данных", test_storage_backends),
+        ("Счетчики активности", test_daily_activity),
+        ("Временные ряды активности", test_activity_series),
+        ("Поиск ключевых слов", test_keyword_matcher),
+        ("Поиск повторов", test_repeat_detector),
+        ("Разбор сообщения", test_normalized_message),
+        ("Пакетная валидация", test_validate_many),
+        ("Почти повторы", test_duplicate_detector),
+        ("Кэш вердиктов", test_verdict_cache),
         ("Фильтрация сообщений", test_message_filtering),
         ("Расчет вероятности", test_probability_calculation),
         ("Команда /JK", test_jk_command),
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Потоковая выгрузка и загрузка таблиц баз бота (chat_bot.db, gasjk_bot.db)
+Использование:
+    python tools/bulk_data.py export <база> <каталог> [--format jsonl|csv] [--tables users transactions]
+    python tools/bulk_data.py import <база> <каталог> [--batch-size 10000] [--replace] [--tables ...]
+"""
+
+import os
+import sys
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from storage.bulk import FORMATS, export_database, import_database
+from storage.connection import ConnectionManager
+
+
+def print_progress(table: str, count: int, elapsed: float, done: bool):
+    rate = count / elapsed if elapsed > 0 else 0.0
+    status = "done" if done else "..."
+    print(f"{table}: {count:,} rows, {rate:,.0f} rows/s {status}", flush=True)
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Bulk export/import of bot database tables")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    export = commands.add_parser('export', help="stream tables to JSONL or CSV files")
+    export.add_argument('database')
+    export.add_argument('directory')
+    export.add_argument('--format', choices=FORMATS, default='jsonl')
+    export.add_argument('--tables', nargs='+')
+
+    load = commands.add_parser('import', help="load an export into a database")
+    load.add_argument('database')
+    load.add_argument('directory')
+    load.add_argument('--tables', nargs='+')
+    load.add_argument('--batch-size', type=int, default=10000)
+    load.add_argument('--replace', action='store_true', help="replace rows with the same key")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    if args.command == 'export' and not os.path.exists(args.database):
+        print(f"Database not found: {args.database}")
+        return 1
+
+    pool = ConnectionManager(args.database)
+    try:
+        if args.command == 'export':
+            counts = export_database(pool, args.directory, args.format, args.tables, progress=print_progress)
+        else:
+            counts = import_database(pool, args.directory, args.tables, args.batch_size, args.replace,
+                                     progress=print_progress)
+    finally:
+        pool.close()
+    print(f"{args.command.capitalize()}ed {sum(counts.values()):,} rows from {len(counts)} tables")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
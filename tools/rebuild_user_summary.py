@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+Пересчет сводки очков пользователей (user_summary) по истории начислений
+Использование: python tools/rebuild_user_summary.py [путь к базе]
+"""
+
+import os
+import sys
+import logging
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from storage.chat_database import ChatDatabase
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    db_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(ROOT, 'chat_bot.db')
+    if not os.path.exists(db_path):
+        print(f"Database not found: {db_path}")
+        return 1
+
+    db = ChatDatabase(db_path)
+    try:
+        count = db.rebuild_user_summary()
+    finally:
+        db.close()
+    print(f"Rebuilt summary for {count} users")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
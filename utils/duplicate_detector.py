@@ -0,0 +1,154 @@
+import hashlib
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from functools import lru_cache
+from typing import Callable, Deque, Dict, Hashable, List, Optional, Sequence, Tuple
+
+FINGERPRINT_BITS = 64
+
+
+@lru_cache(maxsize=65536)
+def _feature_hash(feature: str) -> int:
+    # Свой хэш вместо hash(): отпечатки одинаковы между запусками. Короткие
+    # n-граммы чата повторяются, поэтому их хэши кэшируются
+    return int.from_bytes(hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def simhash(text: str, shingle: int = 3) -> int:
+    """64-битный SimHash по символьным n-граммам длины shingle
+
+    Похожие тексты дают отпечатки, отличающиеся в немногих битах: добавленное
+    или замененное слово меняет лишь часть n-грамм, а каждый бит отпечатка -
+    голосование всех n-грамм.
+    """
+    if not text:
+        return 0
+    features = {text[i:i + shingle] for i in range(max(len(text) - shingle + 1, 1))}
+    # Столбцы битовых строк: в каждом столбце считаются единицы
+    rows = [format(_feature_hash(feature), '064b') for feature in features]
+    half = len(rows) / 2
+    fingerprint = 0
+    for column in zip(*rows):
+        fingerprint = (fingerprint << 1) | (column.count('1') > half)
+    return fingerprint
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count('1')
+
+
+class _Window:
+    """Последние отпечатки одной области (пользователь или чат) с индексом по полосам"""
+
+    __slots__ = ('entries', 'bands')
+
+    def __init__(self):
+        self.entries: Deque[Tuple[int, float]] = deque()
+        self.bands: Dict[Tuple[int, int], Counter] = {}
+
+
+class DuplicateDetector:
+    """Поиск почти повторяющихся сообщений по SimHash-отпечаткам
+
+    Для каждого пользователя хранится скользящее окно из user_window последних
+    отпечатков, для каждого чата - из chat_window, записи старше ttl секунд
+    удаляются. Отпечаток делится на max_distance + 1 полос: если отпечатки
+    различаются не больше чем в max_distance битах, хотя бы одна полоса
+    совпадает, поэтому кандидаты ищутся по словарю полос, а расстояние
+    считается только для них. Число окон ограничено max_windows (вытесняются
+    давно не писавшие), так что память не растет с объемом чата.
+    """
+
+    def __init__(self, user_window: int = 20, chat_window: int = 200, max_distance: int = 7,
+                 ttl: float = 3600, min_tokens: int = 3, max_windows: int = 10000,
+                 time_func: Callable[[], float] = time.time):
+        if max_distance < 0 or max_distance >= FINGERPRINT_BITS:
+            raise ValueError("Invalid max_distance")
+        self.user_window = user_window
+        self.chat_window = chat_window
+        self.max_distance = max_distance
+        self.ttl = ttl
+        self.min_tokens = min_tokens
+        self.max_windows = max_windows
+        self.time_func = time_func
+        bands = max_distance + 1
+        width = FINGERPRINT_BITS // bands
+        # (сдвиг, маска) каждой полосы; последняя забирает остаток битов
+        self._bands = [(i * width, (1 << (width if i < bands - 1 else FINGERPRINT_BITS - i * width)) - 1)
+                       for i in range(bands)]
+        self._windows: 'OrderedDict[Hashable, _Window]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.checked = 0
+        self.duplicates = 0
+
+    def _keys(self, fingerprint: int) -> List[Tuple[int, int]]:
+        return [(i, (fingerprint >> shift) & mask) for i, (shift, mask) in enumerate(self._bands)]
+
+    def _window(self, scope: Hashable) -> _Window:
+        window = self._windows.get(scope)
+        if window is None:
+            window = self._windows[scope] = _Window()
+            if len(self._windows) > self.max_windows:
+                self._windows.popitem(last=False)
+        else:
+            self._windows.move_to_end(scope)
+        return window
+
+    def _expire(self, window: _Window, now: float, size: int):
+        entries = window.entries
+        while entries and (len(entries) > size or now - entries[0][1] > self.ttl):
+            fingerprint, _ = entries.popleft()
+            for key in self._keys(fingerprint):
+                counter = window.bands[key]
+                counter[fingerprint] -= 1
+                if counter[fingerprint] <= 0:
+                    del counter[fingerprint]
+                    if not counter:
+                        del window.bands[key]
+
+    def _find(self, window: _Window, fingerprint: int, keys: List[Tuple[int, int]]) -> bool:
+        for key in keys:
+            for candidate in window.bands.get(key, ()):
+                if hamming(candidate, fingerprint) <= self.max_distance:
+                    return True
+        return False
+
+    def _add(self, window: _Window, fingerprint: int, keys: List[Tuple[int, int]], now: float, size: int):
+        window.entries.append((fingerprint, now))
+        for key in keys:
+            window.bands.setdefault(key, Counter())[fingerprint] += 1
+        self._expire(window, now, size)
+
+    def check(self, user_id: int, chat_id: Optional[int], tokens: Sequence[str]) -> Optional[str]:
+        """Проверка и запоминание сообщения
+
+        Возвращает 'user', если пользователь недавно писал почти то же самое,
+        'chat', если это почти повтор недавнего сообщения в чате, иначе None.
+        Сообщения короче min_tokens слов не проверяются.
+        """
+        if len(tokens) < self.min_tokens:
+            return None
+        fingerprint = simhash(' '.join(tokens))
+        keys = self._keys(fingerprint)
+        now = self.time_func()
+        scopes = [('user', user_id, self.user_window)]
+        if chat_id is not None:
+            scopes.append(('chat', chat_id, self.chat_window))
+        with self._lock:
+            self.checked += 1
+            found = None
+            for kind, scope_id, size in scopes:
+                window = self._window((kind, scope_id))
+                self._expire(window, now, size)
+                if found is None and self._find(window, fingerprint, keys):
+                    found = kind
+                self._add(window, fingerprint, keys, now, size)
+            if found:
+                self.duplicates += 1
+            return found
+
+    def stats(self) -> Dict[str, int]:
+        """Счетчики проверок и найденных повторов, число окон"""
+        with self._lock:
+            return {'checked': self.checked, 'duplicates': self.duplicates, 'windows': len(self._windows)}
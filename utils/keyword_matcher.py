@@ -0,0 +1,78 @@
+from collections import deque
+from typing import Dict, Iterable, List, Set, Tuple
+
+
+class KeywordMatcher:
+    """Поиск всех ключевых слов из нескольких групп за один проход (Aho-Corasick)
+
+    Автомат строится один раз по всем спискам слов. Совпадение засчитывается
+    только целым словом: если ключевое слово начинается или заканчивается
+    буквой/цифрой, соседний символ текста не должен быть буквой или цифрой,
+    поэтому 'win' не находится в 'window', а 'hi' - в 'this'. Ключи из
+    знаков ('?') ищутся без этого ограничения. Сравнение без учета регистра.
+    """
+
+    def __init__(self, groups: Dict[str, Iterable[str]]):
+        # Узел автомата: переходы, ссылка неудачи и слова, оканчивающиеся в нем
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[str, Tuple[str, ...]]]] = [[]]
+
+        keywords: Dict[str, Set[str]] = {}
+        for group, words in groups.items():
+            for word in words:
+                keywords.setdefault(word.lower(), set()).add(group)
+        self.groups = tuple(groups)
+
+        for word, word_groups in keywords.items():
+            node = 0
+            for char in word:
+                next_node = self._goto[node].get(char)
+                if next_node is None:
+                    next_node = len(self._goto)
+                    self._goto[node][char] = next_node
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                node = next_node
+            self._out[node].append((word, tuple(sorted(word_groups))))
+
+        # Ссылки неудачи обходом в ширину; выходы наследуются по ссылке неудачи.
+        # Переходы по ссылкам неудачи сразу дописываются в таблицу узла, и при
+        # поиске на каждый символ приходится один поиск в словаре.
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            fail = self._fail[node]
+            for char, child in list(self._goto[node].items()):
+                queue.append(child)
+                self._fail[child] = self._goto[fail].get(char, 0) if node else 0
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+            if node:
+                for char, target in self._goto[fail].items():
+                    self._goto[node].setdefault(char, target)
+
+    def find(self, text: str, lowercase: bool = True) -> Dict[str, Set[str]]:
+        """Найденные слова по группам: {группа: множество слов}, пустые группы включены
+
+        lowercase=False - текст уже в нижнем регистре.
+        """
+        hits: Dict[str, Set[str]] = {group: set() for group in self.groups}
+        if lowercase:
+            text = text.lower()
+        length = len(text)
+        goto, out = self._goto, self._out
+        node = 0
+        for end, char in enumerate(text):
+            node = goto[node].get(char, 0)
+            if not out[node]:
+                continue
+            for word, word_groups in out[node]:
+                start = end - len(word) + 1
+                if word[0].isalnum() and start > 0 and text[start - 1].isalnum():
+                    continue
+                if word[-1].isalnum() and end + 1 < length and text[end + 1].isalnum():
+                    continue
+                for group in word_groups:
+                    hits[group].add(word)
+        return hits
@@ -1,15 +1,25 @@
 import re
 import logging
-from typing import Dict, List, Set, Optional
+from typing import Dict, Iterable, List, Set, Optional, Union
 import json
 
+try:
+    import numpy as np
+except ImportError:  # без numpy validate_many проверяет сообщения по одному
+    np = None
+
+from utils.keyword_matcher import KeywordMatcher
+from utils.repeat_detector import RepeatDetector
+from utils.normalized_message import NormalizedMessage, content_key
+from storage.cache import LRUCache
+
 class MessageValidator:
-    def __init__(self):
+    def __init__(self, cache_size: int = 4096, cache_ttl: Optional[float] = 300.0):
         self.spam_patterns = [
             r'^[0-9]+$',  # Только цифры
             r'^[a-zA-Z0-9]{20,}$',  # Длинные случайные строки
-            r'^[a-z]{2,}\1{3,}$',  # Повторяющиеся символы
-            r'^[а-яё]{2,}\1{3,}$',  # Повторяющиеся русские символы
+            r'^([a-z]{2,})\1{3,}$',  # Повторяющиеся символы
+            r'^([а-яё]{2,})\1{3,}$',  # Повторяющиеся русские символы
             r'^[a-zA-Z]{1,2}[0-9]{10,}$',  # Короткие буквы + много цифр
             r'^[а-яё]{1,2}[0-9]{10,}$',  # Короткие русские буквы + много цифр
             r'^[!@#$%^&*()_+\-=\[\]{};\':"\\|,.<>\/?]{5,}$',  # Много спецсимволов
@@ -19,6 +29,9 @@ class MessageValidator:
         self.min_length = 3
         self.max_length = 1000
         
+        # Пороги повторов: серия символов и доля текста под одной n-граммой
+        self.repeat_detector = RepeatDetector(run_limit=4, ngram_sizes=(2, 3, 4), min_repeats=3, min_coverage=0.5)
+        
         # Слова-индикаторы осмысленности
         self.meaningful_words = {
             'ru': {
@@ -52,143 +65,284 @@ class MessageValidator:
                 'work from home', 'part-time', 'income', 'profit', 'investment'
             ]
         }
+        
+        self.question_indicators = [
+            '?', 'что', 'как', 'где', 'когда', 'почему', 'зачем', 'кто', 'какой',
+            'what', 'how', 'where', 'when', 'why', 'who', 'which'
+        ]
+        
+        # Категории сообщений в порядке приоритета (вопросы проверяются раньше)
+        self.message_categories = {
+            'greeting': ['привет', 'здравствуй', 'добрый день', 'доброе утро', 'добрый вечер',
+                         'hello', 'hi', 'good morning', 'good evening', 'good afternoon'],
+            'farewell': ['пока', 'до свидания', 'до встречи', 'увидимся', 'прощай',
+                         'bye', 'goodbye', 'see you', 'farewell'],
+            'thanks': ['спасибо', 'благодарю', 'thank you', 'thanks'],
+            'emotion': ['рад', 'счастлив', 'грустно', 'злюсь', 'удивлен', 'боюсь',
+                        'happy', 'sad', 'angry', 'surprised', 'afraid'],
+        }
+        
+        # Вердикты по хэшу текста: при рейдах один и тот же текст приходит сотни раз
+        self.verdicts = LRUCache(cache_size, cache_ttl)
+        
+        # Все списки слов в одном автомате: один проход по тексту на сообщение
+        self.keywords = KeywordMatcher({
+            'spam': [word for words in self.spam_words.values() for word in words],
+            'meaningful': [word for categories in self.meaningful_words.values()
+                           for words in categories.values() for word in words],
+            'question': self.question_indicators,
+            **self.message_categories,
+        })
     
-    def validate_message(self, message: str, user_id: Optional[int] = None) -> Dict:
+    def find_keywords(self, message: Union[str, NormalizedMessage]) -> Dict[str, Set[str]]:
+        """Ключевые слова сообщения по группам (spam, meaningful, question и категории)"""
+        return self.keywords.find(NormalizedMessage.of(message).lower, lowercase=False)
+    
+    def validate_message(self, message: Union[str, NormalizedMessage], user_id: Optional[int] = None) -> Dict:
         """
         Валидация сообщения на осмысленность
         
+        message - текст или уже разобранный NormalizedMessage (разбор делается
+        один раз, все проверки используют его результаты).
+        
         Returns:
             Dict с ключами:
             - is_valid: bool - прошло ли сообщение валидацию
             - reason: str - причина отклонения (если есть)
             - score: float - оценка осмысленности (0-1)
         """
+        if not isinstance(message, (str, NormalizedMessage)):
+            logging.warning(f"Cannot validate message of type {type(message).__name__}")
+            return {
+                'is_valid': False,
+                'reason': 'Ошибка при валидации сообщения',
+                'score': 0.0
+            }
         try:
-            # Проверка длины
-            if len(message.strip()) < self.min_length:
-                return {
-                    'is_valid': False,
-                    'reason': f'Сообщение слишком короткое (минимум {self.min_length} символов)',
-                    'score': 0.0
-                }
-            
-            if len(message) > self.max_length:
-                return {
+            # Повторный текст получает готовый вердикт без разбора и проверок;
+            # шаблоны спама и остальные признаки считаются только при промахе
+            key = self._verdict_key(message)
+            cached = self.verdicts.get(key)
+            if cached is not None:
+                return dict(cached)
+            result = self._validate(NormalizedMessage.of(message))
+        except Exception as e:
+            logging.error(f"Error validating message: {e}")
+            return {
+                'is_valid': False,
+                'reason': 'Ошибка при валидации сообщения',
+                'score': 0.0
+            }
+        self.verdicts.put(key, result)
+        return dict(result)
+    
+    def _verdict_key(self, message: Union[str, NormalizedMessage]) -> bytes:
+        """Ключ кэша: исходный текст без пробелов по краям и сами пробелы по краям
+
+        Пробелы по краям входят в длину, разнообразие символов и поиск повторов,
+        поэтому тоже влияют на вердикт. Остальные признаки однозначно следуют из
+        текста и в ключ не входят.
+        """
+        text = message.text if isinstance(message, NormalizedMessage) else message
+        return content_key(text, text[:len(text) - len(text.lstrip())], text[len(text.rstrip()):])
+    
+    def _validate(self, message: NormalizedMessage) -> Dict:
+        """Полная проверка сообщения без кэша"""
+        rejection = self._check_form(message)
+        if rejection:
+            return rejection
+        
+        # Проверка на спам-слова
+        hits = self.find_keywords(message)
+        spam_score = self._check_spam_words(message, hits)
+        if spam_score > 0.7:
+            return {
+                'is_valid': False,
+                'reason': 'Сообщение содержит спам-слова',
+                'score': 0.0
+            }
+        
+        # Оценка осмысленности
+        meaningful_score = self._calculate_meaningful_score(message, hits)
+        
+        # Финальная оценка
+        final_score = meaningful_score * (1 - spam_score)
+        
+        return {
+            'is_valid': final_score > 0.3,
+            'reason': None if final_score > 0.3 else 'Сообщение недостаточно осмысленное',
+            'score': final_score
+        }
+    
+    def validate_many(self, messages: Iterable[Union[str, NormalizedMessage]]) -> List[Dict]:
+        """
+        Пакетная валидация: результаты совпадают с validate_message для каждого сообщения
+        
+        Одинаковые тексты проверяются один раз, готовые вердикты берутся из кэша.
+        Для промахов проверки формы и поиск ключевых слов идут по сообщениям, а
+        оценки спама и осмысленности считаются для всего пакета векторно (numpy);
+        без numpy промахи проверяются через validate_message.
+        """
+        messages = list(messages)
+        results: List[Optional[Dict]] = [None] * len(messages)
+        first: Dict[str, int] = {}
+        repeats = []   # (индекс повтора, индекс первого такого текста)
+        misses = []    # (индекс, ключ кэша, сообщение)
+        for i, message in enumerate(messages):
+            if not isinstance(message, (str, NormalizedMessage)):
+                results[i] = self.validate_message(message)
+                continue
+            text = message.text if isinstance(message, NormalizedMessage) else message
+            if text in first:
+                repeats.append((i, first[text]))
+                continue
+            first[text] = i
+            if np is None:
+                results[i] = self.validate_message(message)
+                continue
+            key = self._verdict_key(message)
+            cached = self.verdicts.get(key)
+            if cached is not None:
+                results[i] = dict(cached)
+            else:
+                misses.append((i, key, message))
+        
+        if misses:
+            self._validate_batch(misses, results)
+        for i, j in repeats:
+            results[i] = dict(results[j])
+        return results
+    
+    def _validate_batch(self, misses: List, results: List[Optional[Dict]]):
+        """Проверка промахов кэша пакетом: формулы те же, что в _validate"""
+        scored = []    # (индекс, ключ кэша, сообщение, найденные ключевые слова)
+        for i, key, message in misses:
+            try:
+                message = NormalizedMessage.of(message)
+                verdict = self._check_form(message)
+                if verdict is None:
+                    scored.append((i, key, message, self.find_keywords(message)))
+                    continue
+            except Exception:
+                # validate_message запишет ошибку в лог и вернет вердикт-ошибку
+                results[i] = self.validate_message(message)
+                continue
+            self.verdicts.put(key, verdict)
+            results[i] = dict(verdict)
+        if not scored:
+            return
+        
+        features = np.array([
+            (len(message.words), len(hits['spam']), len(hits['meaningful']), message.has_punctuation,
+             message.has_upper and not message.all_upper, message.unique_chars, message.length)
+            for _, _, message, hits in scored
+        ], dtype=np.float64)
+        words, spam, meaningful, punctuation, upper, unique, length = features.T
+        has_words = words > 0
+        per_word = np.maximum(words, 1)
+        
+        spam_score = np.where(has_words, np.minimum(spam / per_word, 1.0), 0.0)
+        bonus = punctuation * 0.1 + upper * 0.05
+        diversity = np.minimum(unique / length, 0.2)
+        meaningful_score = np.where(has_words, np.minimum(meaningful / per_word + bonus + diversity, 1.0), 0.0)
+        final_score = meaningful_score * (1 - spam_score)
+        
+        for (i, key, _, _), spam_value, score in zip(scored, spam_score.tolist(), final_score.tolist()):
+            if spam_value > 0.7:
+                verdict = {
                     'is_valid': False,
-                    'reason': f'Сообщение слишком длинное (максимум {self.max_length} символов)',
+                    'reason': 'Сообщение содержит спам-слова',
                     'score': 0.0
                 }
-            
-            # Проверка на спам-паттерны
-            for pattern in self.spam_patterns:
-                if re.match(pattern, message.strip()):
-                    return {
-                        'is_valid': False,
-                        'reason': 'Сообщение содержит спам-паттерн',
-                        'score': 0.0
-                    }
-            
-            # Проверка на повторяющиеся символы
-            if self._has_repeating_chars(message):
-                return {
-                    'is_valid': False,
-                    'reason': 'Сообщение содержит много повторяющихся символов',
-                    'score': 0.0
+            else:
+                verdict = {
+                    'is_valid': score > 0.3,
+                    'reason': None if score > 0.3 else 'Сообщение недостаточно осмысленное',
+                    'score': score
                 }
-            
-            # Проверка на спам-слова
-            spam_score = self._check_spam_words(message)
-            if spam_score > 0.7:
+            self.verdicts.put(key, verdict)
+            results[i] = dict(verdict)
+    
+    def _check_form(self, message: NormalizedMessage) -> Optional[Dict]:
+        """Проверки формы сообщения до подсчета слов: длина, спам-паттерны, повторы"""
+        # Проверка длины
+        if len(message.stripped) < self.min_length:
+            return {
+                'is_valid': False,
+                'reason': f'Сообщение слишком короткое (минимум {self.min_length} символов)',
+                'score': 0.0
+            }
+        
+        if message.length > self.max_length:
+            return {
+                'is_valid': False,
+                'reason': f'Сообщение слишком длинное (максимум {self.max_length} символов)',
+                'score': 0.0
+            }
+        
+        # Проверка на спам-паттерны
+        for pattern in self.spam_patterns:
+            if re.match(pattern, message.stripped):
                 return {
                     'is_valid': False,
-                    'reason': 'Сообщение содержит спам-слова',
+                    'reason': 'Сообщение содержит спам-паттерн',
                     'score': 0.0
                 }
-            
-            # Оценка осмысленности
-            meaningful_score = self._calculate_meaningful_score(message)
-            
-            # Финальная оценка
-            final_score = meaningful_score * (1 - spam_score)
-            
-            return {
-                'is_valid': final_score > 0.3,
-                'reason': None if final_score > 0.3 else 'Сообщение недостаточно осмысленное',
-                'score': final_score
-            }
-            
-        except Exception as e:
-            logging.error(f"Error validating message: {e}")
+        
+        # Проверка на повторяющиеся символы
+        if self._has_repeating_chars(message):
             return {
                 'is_valid': False,
-                'reason': 'Ошибка при валидации сообщения',
+                'reason': 'Сообщение содержит много повторяющихся символов',
                 'score': 0.0
             }
+        
+        return None
     
-    def _has_repeating_chars(self, message: str) -> bool:
-        """Проверка на повторяющиеся символы"""
-        if len(message) < 5:
-            return False
-        
-        # Проверка на повторяющиеся символы подряд
-        for i in range(len(message) - 2):
-            if message[i] == message[i+1] == message[i+2]:
-                return True
-        
-        # Проверка на повторяющиеся паттерны
-        for pattern_length in range(2, 5):
-            for i in range(len(message) - pattern_length * 2):
-                pattern = message[i:i+pattern_length]
-                if pattern in message[i+pattern_length:]:
-                    return True
-        
-        return False
+    def _has_repeating_chars(self, message: Union[str, NormalizedMessage]) -> bool:
+        """Проверка на повторяющиеся символы и фрагменты (линейное время)"""
+        return self.repeat_detector.is_repetitive(NormalizedMessage.of(message).lower, lowercase=False)
     
-    def _check_spam_words(self, message: str) -> float:
-        """Проверка на спам-слова"""
-        message_lower = message.lower()
-        total_spam_count = 0
-        
-        for lang, words in self.spam_words.items():
-            for word in words:
-                if word in message_lower:
-                    total_spam_count += 1
+    def _check_spam_words(self, message: Union[str, NormalizedMessage],
+                          hits: Optional[Dict[str, Set[str]]] = None) -> float:
+        """Проверка на спам-слова (каждое слово учитывается один раз)"""
+        message = NormalizedMessage.of(message)
+        if hits is None:
+            hits = self.find_keywords(message)
+        total_spam_count = len(hits['spam'])
         
         # Нормализация по длине сообщения
-        words_in_message = len(message.split())
+        words_in_message = len(message.words)
         if words_in_message == 0:
             return 0.0
         
         return min(total_spam_count / words_in_message, 1.0)
     
-    def _calculate_meaningful_score(self, message: str) -> float:
+    def _calculate_meaningful_score(self, message: Union[str, NormalizedMessage],
+                                    hits: Optional[Dict[str, Set[str]]] = None) -> float:
         """Расчет оценки осмысленности сообщения"""
-        message_lower = message.lower()
-        meaningful_count = 0
-        total_words = len(message.split())
+        message = NormalizedMessage.of(message)
+        total_words = len(message.words)
         
         if total_words == 0:
             return 0.0
         
         # Подсчет осмысленных слов
-        for lang, categories in self.meaningful_words.items():
-            for category, words in categories.items():
-                for word in words:
-                    if word in message_lower:
-                        meaningful_count += 1
+        if hits is None:
+            hits = self.find_keywords(message)
+        meaningful_count = len(hits['meaningful'])
         
         # Бонус за наличие знаков препинания
         punctuation_bonus = 0
-        if any(char in message for char in '.,!?;:'):
+        if message.has_punctuation:
             punctuation_bonus = 0.1
         
         # Бонус за наличие заглавных букв (но не все заглавные)
-        if message != message.upper() and any(char.isupper() for char in message):
+        if not message.all_upper and message.has_upper:
             punctuation_bonus += 0.05
         
         # Бонус за разнообразие символов
-        unique_chars = len(set(message.lower()))
-        diversity_bonus = min(unique_chars / len(message), 0.2)
+        diversity_bonus = min(message.unique_chars / message.length, 0.2)
         
         # Базовая оценка
         base_score = meaningful_count / total_words
@@ -198,45 +352,19 @@ class MessageValidator:
         
         return final_score
     
-    def is_question(self, message: str) -> bool:
+    def is_question(self, message: Union[str, NormalizedMessage]) -> bool:
         """Проверка, является ли сообщение вопросом"""
-        question_indicators = [
-            '?', 'что', 'как', 'где', 'когда', 'почему', 'зачем', 'кто', 'какой',
-            'what', 'how', 'where', 'when', 'why', 'who', 'which'
-        ]
-        
-        message_lower = message.lower()
-        return any(indicator in message_lower for indicator in question_indicators)
+        return bool(self.find_keywords(message)['question'])
     
-    def get_message_category(self, message: str) -> str:
+    def get_message_category(self, message: Union[str, NormalizedMessage]) -> str:
         """Определение категории сообщения"""
-        message_lower = message.lower()
+        hits = self.find_keywords(message)
         
-        # Вопросы
-        if self.is_question(message):
+        if hits['question']:
             return 'question'
         
-        # Приветствия
-        greetings = ['привет', 'здравствуй', 'добрый день', 'доброе утро', 'добрый вечер',
-                    'hello', 'hi', 'good morning', 'good evening', 'good afternoon']
-        if any(greeting in message_lower for greeting in greetings):
-            return 'greeting'
-        
-        # Прощания
-        farewells = ['пока', 'до свидания', 'до встречи', 'увидимся', 'прощай',
-                    'bye', 'goodbye', 'see you', 'farewell']
-        if any(farewell in message_lower for farewell in farewells):
-            return 'farewell'
-        
-        # Благодарности
-        thanks = ['спасибо', 'благодарю', 'thank you', 'thanks']
-        if any(thank in message_lower for thank in thanks):
-            return 'thanks'
-        
-        # Эмоции
-        emotions = ['рад', 'счастлив', 'грустно', 'злюсь', 'удивлен', 'боюсь',
-                   'happy', 'sad', 'angry', 'surprised', 'afraid']
-        if any(emotion in message_lower for emotion in emotions):
-            return 'emotion'
-        
-        return 'general' 
\ No newline at end of file
+        for category in self.message_categories:
+            if hits[category]:
+                return category
+        
+        return 'general'
@@ -0,0 +1,59 @@
+import hashlib
+import re
+import unicodedata
+from typing import Any, List, Union
+
+PUNCTUATION = '.,!?;:'
+
+# Все, что не буква, цифра или пробел: эмодзи, знаки препинания, символы
+_NON_WORD = re.compile(r'[^\w\s]')
+_DIGITS_ONLY = re.compile(r'^[\d\s]+$')
+
+
+def content_key(message: Union[str, 'NormalizedMessage'], *features: Any) -> bytes:
+    """128-битный ключ кэша вердиктов: хэш исходного текста без пробелов по краям и features
+
+    Ключ считается без разбора сообщения, нормализации и регулярных выражений,
+    поэтому попадание в кэш стоит одного прохода blake2b по тексту. Признаки,
+    от которых зависит вердикт, но которые теряются при обрезке пробелов,
+    вызывающий передает в features.
+    """
+    text = message.stripped if isinstance(message, NormalizedMessage) else message.strip()
+    digest = hashlib.blake2b(text.encode('utf-8', 'surrogatepass'), digest_size=16)
+    digest.update(repr(features).encode('utf-8'))
+    return digest.digest()
+
+
+class NormalizedMessage:
+    """Текст сообщения, разобранный один раз для всех проверок
+
+    text - исходный текст, stripped - без пробелов по краям, lower - после
+    NFKC-нормализации в нижнем регистре (полноширинные и составные символы
+    сводятся к обычным), words - слова lower, clean_words - слова lower без
+    эмодзи и знаков препинания. Статистика символов считается по исходному
+    тексту, чтобы длины и регистр совпадали с тем, что отправил пользователь.
+    """
+
+    __slots__ = ('text', 'stripped', 'lower', 'words', 'clean_words', 'length',
+                 'unique_chars', 'has_upper', 'all_upper', 'has_punctuation', 'digits_only')
+
+    def __init__(self, text: str):
+        self.text = text
+        self.stripped = text.strip()
+        self.lower = unicodedata.normalize('NFKC', text).lower()
+        self.words: List[str] = self.lower.split()
+        self.clean_words: List[str] = _NON_WORD.sub('', self.lower).split()
+        self.length = len(text)
+        self.unique_chars = len(set(self.lower))
+        self.has_upper = any(char.isupper() for char in text)
+        self.all_upper = text == text.upper()
+        self.has_punctuation = any(char in text for char in PUNCTUATION)
+        self.digits_only = _DIGITS_ONLY.match(text) is not None
+
+    @classmethod
+    def of(cls, message: Union[str, 'NormalizedMessage']) -> 'NormalizedMessage':
+        """Разбор строки; уже разобранное сообщение возвращается как есть"""
+        return message if isinstance(message, cls) else cls(message)
+
+    def __repr__(self):
+        return f"NormalizedMessage({self.text!r})"
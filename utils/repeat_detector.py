@@ -0,0 +1,90 @@
+import re
+from operator import itemgetter
+from typing import Dict, Optional, Sequence
+
+# Серия из двух и более одинаковых символов, кроме цифр
+_RUN = re.compile(r'(\D)\1+')
+
+
+class RepeatReport:
+    """Итог проверки на повторы: самая длинная серия символа и самая частая n-грамма"""
+
+    __slots__ = ('longest_run', 'run_char', 'ngram', 'ngram_count', 'coverage')
+
+    def __init__(self, longest_run: int = 0, run_char: Optional[str] = None, ngram: Optional[str] = None,
+                 ngram_count: int = 0, coverage: float = 0.0):
+        self.longest_run = longest_run
+        self.run_char = run_char
+        self.ngram = ngram
+        self.ngram_count = ngram_count
+        self.coverage = coverage
+
+    def __repr__(self):
+        return (f"RepeatReport(run={self.longest_run}x{self.run_char!r}, ngram={self.ngram!r}"
+                f"x{self.ngram_count}, coverage={self.coverage:.2f})")
+
+
+class RepeatDetector:
+    """Поиск повторов в сообщении за линейное время
+
+    Серии одинаковых символов ищутся одним регулярным выражением (цифры не
+    учитываются: 1000000 - обычное число). Для каждой длины n из ngram_sizes
+    непересекающиеся вхождения всех n-грамм считаются за один проход по
+    тексту. Сообщение повторяющееся, если есть серия из run_limit символов
+    или n-грамма встречается не меньше min_repeats раз и покрывает не меньше
+    min_coverage текста. Регистр не учитывается.
+    """
+
+    def __init__(self, run_limit: int = 4, ngram_sizes: Sequence[int] = (2, 3, 4), min_repeats: int = 3,
+                 min_coverage: float = 0.5, min_length: int = 5):
+        if run_limit < 2 or any(n < 1 for n in ngram_sizes):
+            raise ValueError("Invalid repeat thresholds")
+        self.run_limit = run_limit
+        self.ngram_sizes = tuple(ngram_sizes)
+        self.min_repeats = min_repeats
+        self.min_coverage = min_coverage
+        self.min_length = min_length
+
+    def scan(self, text: str, lowercase: bool = True) -> RepeatReport:
+        """Самая длинная серия символа и n-грамма из min_repeats+ вхождений с наибольшим покрытием"""
+        if lowercase:
+            text = text.lower()
+        report = RepeatReport()
+        length = len(text)
+        if not length:
+            return report
+
+        for match in _RUN.finditer(text):
+            if match.end() - match.start() > report.longest_run:
+                report.longest_run = match.end() - match.start()
+                report.run_char = match.group(1)
+
+        for n in self.ngram_sizes:
+            if n * 2 > length:
+                continue
+            # Вхождение засчитывается, если начинается не раньше конца предыдущего
+            # засчитанного вхождения той же n-граммы, - как в str.count, но для
+            # всех n-грамм сразу и без повторного просмотра текста
+            counts: Dict[str, int] = {}
+            next_start: Dict[str, int] = {}
+            for i in range(length - n + 1):
+                gram = text[i:i + n]
+                if i >= next_start.get(gram, 0):
+                    next_start[gram] = i + n
+                    counts[gram] = counts.get(gram, 0) + 1
+            ngram, count = max(counts.items(), key=itemgetter(1))
+            coverage = count * n / length
+            if count >= self.min_repeats and coverage > report.coverage:
+                report.ngram = ngram
+                report.ngram_count = count
+                report.coverage = coverage
+        return report
+
+    def is_repetitive(self, text: str, lowercase: bool = True) -> bool:
+        """Превышен ли хотя бы один порог повторов (lowercase=False - текст уже в нижнем регистре)"""
+        if len(text) < self.min_length:
+            return False
+        report = self.scan(text, lowercase)
+        if report.longest_run >= self.run_limit:
+            return True
+        return report.ngram_count >= self.min_repeats and report.coverage >= self.min_coverage